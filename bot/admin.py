@@ -0,0 +1,6 @@
+from django.contrib import admin
+
+from bot.models import FAQEntry
+
+
+admin.site.register(FAQEntry)
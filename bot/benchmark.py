@@ -0,0 +1,336 @@
+import asyncio
+import os
+import random
+import shutil
+import tempfile
+import time
+from contextvars import ContextVar
+from decimal import Decimal
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from aiogram import BaseMiddleware, Bot, Dispatcher
+from aiogram.types import TelegramObject, Update
+
+from django_app.clients.models import Client
+from django_app.products.models import Category, Product, Subcategory
+from bot.database.catalog_cache import catalog_cache
+from bot.database.executor import database_sync_to_async
+from bot.dispatcher import create_dispatcher
+from bot.excel import order_exporter
+from bot.fake_api import FakeTelegramSession
+from bot.handlers.callback import (
+    AddToCartCallback, CategoryCallback, ChangeQuantityCallback, CheckoutCallback, ConfirmAddCallback,
+    PaymentCallback, ProductCallback, SetQuantityCallback, SubcategoryCallback, parse_callback_data
+)
+from bot.logging_config import logger
+from bot.metrics import UpdateStats, current_stats, metrics, metrics_server
+from bot.rate_limit import RateLimiter, rate_limiter
+
+
+BENCH_USER_BASE = 10 ** 13  # ID синтетических пользователей начинаются с этого числа
+BENCH_PREFIX = "bench"  # Префикс названий синтетического каталога
+BENCH_CATEGORIES = 5
+BENCH_SUBCATEGORIES = 4  # Подкатегорий в каждой категории
+BENCH_PRODUCTS = 25  # Товаров в каждой подкатегории
+
+# Статистика апдейтов текущего сценария
+journey_updates: ContextVar[Optional[List[UpdateStats]]] = ContextVar("journey_updates", default=None)
+
+# Категория, подкатегория и её товары
+CatalogBranch = Tuple[int, int, List[int]]
+
+
+class JourneyStatsMiddleware(BaseMiddleware):
+    """Передаёт статистику апдейта (UpdateMetricsMiddleware) в сценарий, который его отправил"""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        updates, stats = journey_updates.get(), current_stats.get()
+        if updates is not None and stats is not None:
+            updates.append(stats)
+        return await handler(event, data)
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Квантиль по ближайшему рангу (values должны быть отсортированы)"""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, int(q * len(values) + 0.5) - 1))]
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    """Количество, среднее, квантили и максимум"""
+    values = sorted(values)
+    return {
+        "count": len(values),
+        "avg": sum(values) / len(values) if values else 0.0,
+        "p50": percentile(values, 0.5),
+        "p95": percentile(values, 0.95),
+        "p99": percentile(values, 0.99),
+        "max": values[-1] if values else 0.0,
+    }
+
+
+def load_catalog() -> Tuple[List[CatalogBranch], bool]:
+    """
+    Загружает ветки каталога, при пустом каталоге создаёт синтетический
+
+    Returns:
+        Tuple[List[CatalogBranch], bool]: ветки каталога и признак, что каталог создан
+    """
+    created = False
+    if not Product.objects.filter(category__isnull=False).exists():
+        for c in range(BENCH_CATEGORIES):
+            category = Category.objects.create(name=f"{BENCH_PREFIX} категория {c}")
+            for s in range(BENCH_SUBCATEGORIES):
+                subcategory = Subcategory.objects.create(
+                    name=f"{BENCH_PREFIX} подкатегория {c}-{s}", category=category
+                )
+                Product.objects.bulk_create(
+                    Product(
+                        name=f"{BENCH_PREFIX} товар {c}-{s}-{p}",
+                        description="Синтетический товар для нагрузочного теста",
+                        price=Decimal(100 + p),
+                        category=subcategory,
+                    )
+                    for p in range(BENCH_PRODUCTS)
+                )
+        # bulk_create не вызывает сигналы, поэтому версию каталога обновляем явно
+        catalog_cache.bump_version()
+        created = True
+
+    products: Dict[int, List[int]] = {}
+    for product_id, subcategory_id in Product.objects.filter(category__isnull=False).values_list("id", "category_id"):
+        products.setdefault(subcategory_id, []).append(product_id)
+    branches = [
+        (category_id, subcategory_id, products[subcategory_id])
+        for subcategory_id, category_id in Subcategory.objects.filter(id__in=products).values_list("id", "category_id")
+    ]
+    return branches, created
+
+
+def cleanup(remove_catalog: bool) -> None:
+    """Удаляет синтетических пользователей с их корзинами и заказами и, при необходимости, каталог"""
+    Client.objects.filter(tg_id__gte=BENCH_USER_BASE).delete()
+    if remove_catalog:
+        Category.objects.filter(name__startswith=BENCH_PREFIX).delete()
+        Product.objects.filter(name__startswith=BENCH_PREFIX).delete()
+
+
+class Benchmark:
+    """
+    Нагрузочный тест: синтетические пользователи проходят сценарий покупки
+
+    Апдейты передаются в тот же Dispatcher, что и в runbot, а запросы к
+    Bot API обрабатывает FakeTelegramSession. Сценарий пользователя:
+    /start → каталог → категория → подкатегория → товар → количество →
+    добавление в корзину (1..max_products раз) → корзина → оформление
+    заказа → оплата → pre_checkout_query → successful_payment. Кнопку оплаты
+    и payload инвойса сценарий берёт из ответов бота, как пользователь.
+
+    По умолчанию ограничитель запросов к Bot API отключён, чтобы измерять
+    сами обработчики. С flood FakeTelegramSession отвечает 429 при
+    превышении лимитов Telegram (настройки RATE_LIMIT_*), с rate_limit
+    запросы проходят через ограничитель бота.
+    """
+
+    def __init__(
+        self, users: int, concurrency: int, seed: int = 0, latency: float = 0.0, max_products: int = 3,
+        rate_limit: bool = False, flood: bool = False, flood_rate: float = 0.0
+    ):
+        """
+        Инициализация теста
+
+        Args:
+            users: количество синтетических пользователей
+            concurrency: сколько пользователей проходят сценарий одновременно
+            seed: начальное значение генератора случайных чисел
+            latency: искусственная задержка ответов Bot API в секундах
+            max_products: максимальное количество товаров, добавляемых в корзину
+            rate_limit: пропускать запросы к Bot API через ограничитель бота
+            flood: отвечать 429 на запросы сверх лимитов Telegram
+            flood_rate: вероятность случайного ответа 429
+        """
+        self.users = users
+        self.concurrency = concurrency
+        self.seed = seed
+        self.max_products = max_products
+        self.rate_limit = rate_limit
+        self.session = FakeTelegramSession(
+            latency=latency, flood_limiter=RateLimiter() if flood else None, flood_rate=flood_rate, seed=seed
+        )
+        self.bot = Bot("1:bench", session=self.session)
+        self.catalog: List[CatalogBranch] = []
+        self.durations: Dict[str, List[float]] = {}
+        self.queries: Dict[str, List[int]] = {}
+        self.journey_queries: List[int] = []
+        self.journey_api_calls: List[int] = []
+        self.journey_durations: List[float] = []
+        self.failed = 0
+        self.errors = 0
+        self._update_ids = iter(range(1, 2 ** 62))
+
+    def _user(self, user_id: int) -> Dict[str, Any]:
+        return {"id": user_id, "is_bot": False, "first_name": "Bench", "username": f"bench{user_id}"}
+
+    def _message(self, user_id: int, text: Optional[str] = None, **fields: Any) -> Dict[str, Any]:
+        message = {
+            "message_id": 1, "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"}, "from": self._user(user_id), **fields,
+        }
+        if text is not None:
+            message["text"] = text
+            if text.startswith("/"):
+                message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        return {"message": message}
+
+    def _callback(self, user_id: int, data: str) -> Dict[str, Any]:
+        return {"callback_query": {
+            "id": str(next(self._update_ids)), "chat_instance": "bench", "data": data,
+            "from": self._user(user_id), "message": self._message(user_id, "bench")["message"],
+        }}
+
+    def _payment(self, user_id: int, payload: str) -> List[Dict[str, Any]]:
+        payment = {"currency": "RUB", "total_amount": 100, "invoice_payload": payload}
+        return [
+            {"pre_checkout_query": {"id": str(next(self._update_ids)), "from": self._user(user_id), **payment}},
+            self._message(user_id, successful_payment={
+                **payment, "telegram_payment_charge_id": "bench", "provider_payment_charge_id": "bench",
+            }),
+        ]
+
+    async def _send(self, dp: Dispatcher, event: Dict[str, Any]) -> None:
+        """Передаёт апдейт диспетчеру и учитывает время обработки"""
+        update = Update.model_validate({"update_id": next(self._update_ids), **event}, context={"bot": self.bot})
+        updates = journey_updates.get()
+        start = time.perf_counter()
+        try:
+            await dp.feed_update(self.bot, update)
+        except Exception as e:
+            self.errors += 1
+            logger.error("Ошибка обработки апдейта %s в нагрузочном тесте: %s", update.update_id, e)
+        duration = time.perf_counter() - start
+        stats = updates[-1] if updates else None
+        handler = stats.handler if stats is not None else "unhandled"
+        self.durations.setdefault(handler, []).append(duration)
+        self.queries.setdefault(handler, []).append(stats.queries if stats is not None else 0)
+
+    def _find_callback(self, user_id: int, callback_class: type, **fields: Any) -> Optional[str]:
+        """Ищет в последней клавиатуре бота кнопку с callback_data указанного типа (и значениями полей)"""
+        markup = self.session.reply_markups.get(user_id)
+        for row in markup.inline_keyboard if markup else []:
+            for button in row:
+                data = parse_callback_data(button.callback_data)
+                if isinstance(data, callback_class) and all(getattr(data, k) == v for k, v in fields.items()):
+                    return button.callback_data
+        return None
+
+    async def _journey(self, dp: Dispatcher, index: int, semaphore: asyncio.Semaphore) -> None:
+        """Сценарий одного пользователя"""
+        async with semaphore:
+            rng = random.Random(self.seed * 1_000_003 + index)
+            user_id = BENCH_USER_BASE + index
+            updates: List[UpdateStats] = []
+            journey_updates.set(updates)
+            start = time.perf_counter()
+
+            await self._send(dp, self._message(user_id, "/start"))
+            await self._send(dp, self._message(user_id, "🛍 Каталог"))
+            for _ in range(rng.randint(1, self.max_products)):
+                category_id, subcategory_id, products = rng.choice(self.catalog)
+                product_id, quantity = rng.choice(products), rng.randint(1, 5)
+                for callback in (
+                    CategoryCallback(id=category_id),
+                    SubcategoryCallback(id=subcategory_id, category_id=category_id),
+                    ProductCallback(id=product_id, subcategory_id=subcategory_id),
+                    AddToCartCallback(id=product_id),
+                    SetQuantityCallback(id=product_id, quantity=quantity),
+                    ConfirmAddCallback(id=product_id, quantity=quantity),
+                ):
+                    await self._send(dp, self._callback(user_id, callback.pack()))
+            await self._send(dp, self._message(user_id, "🛒 Корзина"))
+            increase = self._find_callback(user_id, ChangeQuantityCallback, delta=1)
+            if increase is not None:
+                await self._send(dp, self._callback(user_id, increase))
+            checkout = self._find_callback(user_id, CheckoutCallback) or CheckoutCallback().pack()
+            await self._send(dp, self._callback(user_id, checkout))
+            await self._send(dp, self._message(user_id, f"Тестов Пользователь {index}"))
+            await self._send(dp, self._message(user_id, f"+7 900 {index % 10 ** 7:07d}"))
+            await self._send(dp, self._message(user_id, f"г. Москва, ул. Нагрузочная, д. {index}"))
+
+            payment = self._find_callback(user_id, PaymentCallback)
+            if payment is not None:
+                await self._send(dp, self._callback(user_id, payment))
+            payload = self.session.invoices.pop(user_id, None)
+            if payload is None:
+                self.failed += 1
+            else:
+                for event in self._payment(user_id, payload):
+                    await self._send(dp, event)
+            self.session.reply_markups.pop(user_id, None)
+
+            self.journey_durations.append(time.perf_counter() - start)
+            self.journey_queries.append(sum(stats.queries for stats in updates))
+            self.journey_api_calls.append(sum(stats.api_calls for stats in updates))
+
+    async def run(self) -> Dict[str, Any]:
+        """
+        Проводит тест
+
+        Returns:
+            Dict[str, Any]: пропускная способность, время и запросы к БД
+                по обработчикам и по сценариям
+        """
+        await database_sync_to_async(cleanup)(remove_catalog=False)
+        self.catalog, created = await database_sync_to_async(load_catalog)()
+
+        export_dir = tempfile.mkdtemp(prefix="botbench-")
+        order_exporter.base_path = os.path.join(export_dir, "orders.csv")
+        metrics_server.port = 0
+        rate_limiter.enabled = self.rate_limit
+
+        dp = create_dispatcher()
+        dp.update.outer_middleware(JourneyStatsMiddleware())
+        workflow_data = {"dispatcher": dp, "bots": [self.bot], **dp.workflow_data}
+        await dp.emit_startup(bot=self.bot, **workflow_data)
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        start = time.perf_counter()
+        try:
+            await asyncio.gather(*(self._journey(dp, index, semaphore) for index in range(self.users)))
+        finally:
+            elapsed = time.perf_counter() - start
+            await dp.emit_shutdown(bot=self.bot, **workflow_data)
+            await dp.storage.close()
+            shutil.rmtree(export_dir, ignore_errors=True)
+            await database_sync_to_async(cleanup)(remove_catalog=created)
+
+        updates = sum(len(durations) for durations in self.durations.values())
+        return {
+            "users": self.users,
+            "concurrency": self.concurrency,
+            "elapsed": elapsed,
+            "updates": updates,
+            "updates_per_second": updates / elapsed if elapsed else 0.0,
+            "journeys_per_second": self.users / elapsed if elapsed else 0.0,
+            "failed_journeys": self.failed,
+            "errors": self.errors,
+            "handlers": {
+                name: {**summarize(durations), "avg_queries": sum(self.queries[name]) / len(self.queries[name])}
+                for name, durations in self.durations.items()
+            },
+            "journey": {
+                "duration": summarize(self.journey_durations),
+                "queries": summarize(self.journey_queries),
+                "api_calls": summarize(self.journey_api_calls),
+            },
+            "api_calls": dict(self.session.calls),
+            "flood_errors": self.session.flood_errors,
+            "retries": sum(
+                count for (name, _), count in metrics.counters.items() if name == "bot_api_retries_total"
+            ),
+        }
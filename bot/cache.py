@@ -0,0 +1,262 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict, defaultdict
+from typing import Any, Callable, Optional
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.redis import RedisCache
+from django.utils.functional import cached_property
+
+from bot.logging_config import logger
+
+
+INVALIDATION_CHANNEL = "client_bot:cache:invalidate"  # Канал сообщений об инвалидации
+FLUSH_ALL = "*"  # Сообщение о полной очистке локального кэша
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Ограниченный по размеру LRU-кэш в памяти процесса
+
+    Записи могут иметь время жизни. Значения хранятся как есть, без
+    сериализации, поэтому возвращаемые объекты нельзя изменять.
+    """
+
+    def __init__(self, max_entries: int = 1024, timeout: Optional[float] = None):
+        """
+        Инициализация кэша
+
+        Args:
+            max_entries: максимальное количество записей
+            timeout: время жизни записи по умолчанию в секундах (None — бессрочно)
+        """
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Возвращает значение по ключу или default, если записи нет или она устарела"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout: Optional[float] = _MISSING) -> None:
+        """Сохраняет значение, вытесняя самые старые записи при переполнении"""
+        if timeout is _MISSING:
+            timeout = self.timeout
+        expires_at = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key) -> None:
+        """Удаляет запись"""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """Удаляет все записи"""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class InProcessCache(LocMemCache):
+    """
+    Замена Redis на чистом Python для тестов и локальной разработки
+
+    Хранит данные как LocMemCache (общие для всех экземпляров с одинаковым
+    LOCATION) и доставляет сообщения об инвалидации подписчикам в том же
+    процессе.
+    """
+
+    _subscribers: dict = defaultdict(list)
+
+    def publish(self, channel: str, message: str) -> None:
+        """Отправляет сообщение всем подписчикам канала"""
+        for callback in list(self._subscribers[channel]):
+            callback(message)
+
+    def subscribe(self, channel: str, callback: Callable[[Optional[str]], None]) -> None:
+        """Подписывает callback на сообщения канала"""
+        self._subscribers[channel].append(callback)
+
+
+class RedisPubSubCache(RedisCache):
+    """Redis-кэш Django с доставкой сообщений об инвалидации через Redis Pub/Sub"""
+
+    def publish(self, channel: str, message: str) -> None:
+        """Публикует сообщение в канал"""
+        self._cache.get_client(write=True).publish(channel, message)
+
+    def subscribe(self, channel: str, callback: Callable[[Optional[str]], None]) -> None:
+        """
+        Подписывает callback на сообщения канала в фоновом потоке
+
+        При обрыве соединения callback получает None: сообщения могли быть
+        потеряны, и подписчик должен сбросить локальные данные.
+        """
+        def handle_message(message):
+            data = message["data"]
+            callback(data.decode() if isinstance(data, bytes) else data)
+
+        def handle_error(error, pubsub, thread):
+            logger.warning("Ошибка подписки на канал %s: %s", channel, error)
+            callback(None)
+            time.sleep(1)
+
+        pubsub = self._cache.get_client(write=True).pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(**{channel: handle_message})
+        pubsub.run_in_thread(sleep_time=1, daemon=True, exception_handler=handle_error)
+
+
+class TwoTierCache(BaseCache):
+    """
+    Двухуровневый кэш: локальный LRU (L1) перед общим сетевым кэшем (L2)
+
+    LOCATION — алиас общего кэша из CACHES. Каждая запись, изменение или
+    удаление публикуется в канал инвалидации, и остальные процессы удаляют
+    ключ из своего L1. Время жизни записей L1 ограничено L1_TIMEOUT на случай
+    потери сообщений.
+
+    OPTIONS:
+        L1_MAX_ENTRIES: размер L1 (по умолчанию 1024)
+        L1_TIMEOUT: максимальное время жизни записи L1 в секундах (по умолчанию 60)
+        CHANNEL: канал сообщений об инвалидации
+    """
+
+    def __init__(self, location: str, params: dict):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        self._l2_alias = location or "shared"
+        self._l1_timeout = options.get("L1_TIMEOUT", 60)
+        self._l1 = LRUCache(options.get("L1_MAX_ENTRIES", 1024), self._l1_timeout)
+        self._channel = options.get("CHANNEL", INVALIDATION_CHANNEL)
+        self._node_id = uuid.uuid4().hex
+        self._subscribed = False
+        self._subscribe_lock = threading.Lock()
+
+    @cached_property
+    def _l2(self) -> BaseCache:
+        return caches[self._l2_alias]
+
+    def _ensure_subscribed(self) -> None:
+        """Подписывается на канал инвалидации при первом обращении"""
+        if self._subscribed:
+            return
+        with self._subscribe_lock:
+            if self._subscribed:
+                return
+            subscribe = getattr(self._l2, "subscribe", None)
+            if subscribe is not None:
+                subscribe(self._channel, self._on_invalidate)
+            self._subscribed = True
+
+    def _on_invalidate(self, message: Optional[str]) -> None:
+        """Обрабатывает сообщение об инвалидации от другого процесса"""
+        if message is None:
+            self._l1.clear()
+            return
+        node_id, _, key = message.partition("|")
+        if node_id == self._node_id:
+            return
+        if key == FLUSH_ALL:
+            self._l1.clear()
+        else:
+            self._l1.delete(key)
+
+    def _publish(self, key: str) -> None:
+        """Сообщает остальным процессам об изменении ключа"""
+        publish = getattr(self._l2, "publish", None)
+        if publish is None:
+            return
+        try:
+            publish(self._channel, f"{self._node_id}|{key}")
+        except Exception as e:
+            logger.warning("Не удалось отправить сообщение об инвалидации ключа %s: %s", key, e)
+
+    def _l1_set(self, l1_key: str, value: Any, timeout) -> None:
+        """Сохраняет значение в L1 с учётом времени жизни записи в L2"""
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is not None and timeout <= 0:
+            self._l1.delete(l1_key)
+            return
+        if timeout is None:
+            timeout = self._l1_timeout
+        self._l1.set(l1_key, value, min(timeout, self._l1_timeout))
+
+    def get(self, key, default=None, version=None):
+        self._ensure_subscribed()
+        l1_key = self.make_and_validate_key(key, version=version)
+        value = self._l1.get(l1_key, _MISSING)
+        if value is not _MISSING:
+            return value
+        value = self._l2.get(key, _MISSING, version=version)
+        if value is _MISSING:
+            return default
+        self._l1.set(l1_key, value)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._ensure_subscribed()
+        l1_key = self.make_and_validate_key(key, version=version)
+        self._l2.set(key, value, timeout, version=version)
+        self._l1_set(l1_key, value, timeout)
+        self._publish(l1_key)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._ensure_subscribed()
+        l1_key = self.make_and_validate_key(key, version=version)
+        added = self._l2.add(key, value, timeout, version=version)
+        if added:
+            self._l1_set(l1_key, value, timeout)
+            self._publish(l1_key)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._l2.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        self._ensure_subscribed()
+        l1_key = self.make_and_validate_key(key, version=version)
+        self._l1.delete(l1_key)
+        deleted = self._l2.delete(key, version=version)
+        self._publish(l1_key)
+        return deleted
+
+    def incr(self, key, delta=1, version=None):
+        self._ensure_subscribed()
+        l1_key = self.make_and_validate_key(key, version=version)
+        value = self._l2.incr(key, delta, version=version)
+        self._l1.delete(l1_key)
+        self._publish(l1_key)
+        return value
+
+    def has_key(self, key, version=None):
+        return self.get(key, _MISSING, version=version) is not _MISSING
+
+    def clear(self):
+        self._l1.clear()
+        self._l2.clear()
+        self._publish(FLUSH_ALL)
+
+    def close(self, **kwargs):
+        self._l2.close(**kwargs)
@@ -11,3 +11,44 @@ GROUP_URL = os.getenv("GROUP_URL")
 Y_KASSA_TOKEN = os.getenv("Y_KASSA_TOKEN")
 EXCEL_FILE = os.getenv("EXCEL_FILE")
 BOT_USERNAME = os.getenv("BOT_USERNAME", "clients_zhukata_bot")
+
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+UPDATE_WORKERS = int(os.getenv("UPDATE_WORKERS", "4"))
+UPDATE_QUEUE_SIZE = int(os.getenv("UPDATE_QUEUE_SIZE", "1000"))
+BOT_PROCESSES = int(os.getenv("BOT_PROCESSES", "1"))
+FSM_STORAGE = os.getenv("FSM_STORAGE", "db")
+FSM_TTL = int(os.getenv("FSM_TTL", str(24 * 3600)))
+FSM_CACHE_SIZE = int(os.getenv("FSM_CACHE_SIZE", "100000"))
+KEYBOARD_WARMUP_PAGES = int(os.getenv("KEYBOARD_WARMUP_PAGES", "1"))
+FAQ_FILE = os.getenv("FAQ_FILE")
+FAQ_RELOAD_INTERVAL = int(os.getenv("FAQ_RELOAD_INTERVAL", "30"))
+SUBSCRIPTION_CHECK = os.getenv("SUBSCRIPTION_CHECK", "false").lower() in ("1", "true", "yes")
+SUBSCRIPTION_TTL = int(os.getenv("SUBSCRIPTION_TTL", "60"))
+SUBSCRIPTION_NEGATIVE_TTL = int(os.getenv("SUBSCRIPTION_NEGATIVE_TTL", "10"))
+LOG_FILE = os.getenv("LOG_FILE", "project.log")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_LEVELS = os.getenv("LOG_LEVELS", "aiogram.event=WARNING")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+LOG_ROTATE_WHEN = os.getenv("LOG_ROTATE_WHEN", "")
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "8081"))
+QUERY_BUDGET = int(os.getenv("QUERY_BUDGET", "10"))
+DB_THREADS = int(os.getenv("DB_THREADS", "8"))
+RATE_LIMIT = os.getenv("RATE_LIMIT", "true").lower() in ("1", "true", "yes")
+RATE_LIMIT_GLOBAL = float(os.getenv("RATE_LIMIT_GLOBAL", "30"))
+RATE_LIMIT_CHAT = float(os.getenv("RATE_LIMIT_CHAT", "1"))
+RATE_LIMIT_CHAT_BURST = int(os.getenv("RATE_LIMIT_CHAT_BURST", "3"))
+RATE_LIMIT_GROUP_PER_MINUTE = float(os.getenv("RATE_LIMIT_GROUP_PER_MINUTE", "20"))
+RATE_LIMIT_RETRIES = int(os.getenv("RATE_LIMIT_RETRIES", "3"))
+RATE_LIMIT_MAX_WAIT = float(os.getenv("RATE_LIMIT_MAX_WAIT", "60"))
+BOT_API_CONNECTIONS = int(os.getenv("BOT_API_CONNECTIONS", "100"))
+BOT_API_KEEPALIVE = float(os.getenv("BOT_API_KEEPALIVE", "60"))
+BOT_API_DNS_TTL = int(os.getenv("BOT_API_DNS_TTL", "3600"))
+BOT_API_TIMEOUT = float(os.getenv("BOT_API_TIMEOUT", "60"))
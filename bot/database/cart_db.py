@@ -1,13 +1,267 @@
-from asgiref.sync import sync_to_async
-from django.db.models import F
-from django.core.exceptions import ObjectDoesNotExist
+from decimal import Decimal
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
 
-from bot.database.catalog_db import get_client
-from django_app.clients.models import Cart, CartItem
+from django.db import connection, transaction
+from django.db.models import Q, QuerySet
+from django.utils import timezone
+
+from bot.database.executor import database_sync_to_async
+from bot.database.identity_db import Identity, get_identity, remember_identity
+from django_app.clients.models import Cart, CartItem, Client
+from django_app.products.models import Product
 from bot.logging_config import logger
 
 
-async def add_to_cart(user_id: int, product_id: int, quantity: int = 1) -> CartItem:
+class CartLine(NamedTuple):
+    """Позиция корзины из снимка"""
+    id: int
+    product_id: int
+    name: str
+    price: Decimal
+    quantity: int
+
+
+class CartSnapshot(NamedTuple):
+    """Содержимое корзины, сохранённое в строке Cart"""
+    version: int
+    item_count: int
+    total_price: Decimal
+    lines: List[CartLine]
+
+
+EMPTY_CART = CartSnapshot(0, 0, Decimal("0.00"), [])
+
+
+def _make_line(item_id: int, product_id: int, name: str, price: Decimal, quantity: int) -> dict:
+    """Позиция в формате Cart.snapshot (цена строкой, чтобы не терять точность в JSON)"""
+    return {"id": item_id, "product_id": product_id, "name": name, "price": str(price), "quantity": quantity}
+
+
+def _to_price(value) -> Decimal:
+    """Приводит цену из сырого запроса к Decimal с точностью поля Product.price (SQLite возвращает float)"""
+    field = Product._meta.get_field("price")
+    return field.to_python(value).quantize(Decimal(10) ** -field.decimal_places)
+
+
+def cart_queryset(cart_id: int) -> QuerySet:
+    """Запрос полей снимка корзины"""
+    return Cart.objects.filter(id=cart_id).values_list("version", "item_count", "total_price", "snapshot")
+
+
+def cart_lines_queryset(cart_ids: Iterable[int]) -> QuerySet:
+    """Запрос позиций корзин вместе с названием и ценой товара"""
+    return (
+        CartItem.objects.filter(cart_id__in=list(cart_ids))
+        .order_by("id")
+        .values_list("cart_id", "id", "product_id", "product__name", "product__price", "quantity")
+    )
+
+
+def client_carts_queryset(tg_id: int) -> QuerySet:
+    """Запрос корзин клиента по ID в Telegram"""
+    return Cart.objects.filter(client_id__in=Client.objects.filter(tg_id=tg_id).values("id"))
+
+
+def lock_carts_queryset(carts: QuerySet) -> QuerySet:
+    """Запрос строк (ID, версия) корзин с блокировкой"""
+    return carts.select_for_update().values_list("id", "version")
+
+
+def locked_cart_queryset(cart_id: int) -> QuerySet:
+    """Запрос версии и снимка корзины с блокировкой"""
+    return Cart.objects.select_for_update().filter(id=cart_id).values_list("version", "snapshot")
+
+
+def cart_item_queryset(cart_id: int, cart_item_id: int) -> QuerySet:
+    """Запрос позиции корзины (позиция из чужой корзины не найдётся)"""
+    return CartItem.objects.filter(id=cart_item_id, cart_id=cart_id)
+
+
+def product_carts_queryset(product_ids: Iterable[int], cart_ids: Iterable[int] = ()) -> QuerySet:
+    """Запрос снимков корзин с указанными товарами и корзин cart_ids с блокировкой"""
+    return (
+        Cart.objects.select_for_update()
+        .filter(
+            Q(id__in=CartItem.objects.filter(product_id__in=list(product_ids)).values("cart_id"))
+            | Q(id__in=list(cart_ids))
+        )
+        .values_list("id", "version", "snapshot")
+    )
+
+
+def product_row_sql(product_id: int) -> Tuple[str, list]:
+    """
+    Запрос названия и цены товара с разделяемой блокировкой строки
+
+    Returns:
+        Tuple[str, list]: SQL и параметры
+    """
+    product_table = connection.ops.quote_name(Product._meta.db_table)
+    share_lock = " FOR SHARE" if connection.features.has_select_for_update else ""
+    return f"SELECT name, price FROM {product_table} WHERE id = %s{share_lock}", [product_id]
+
+
+def cart_upsert_sql(user_id: int, identity: Optional[Identity] = None) -> Tuple[str, list]:
+    """
+    Запрос, создающий корзину клиента, если её нет, и блокирующий её строку
+
+    Клиент ищется по tg_id, если его ID неизвестен.
+
+    Returns:
+        Tuple[str, list]: SQL и параметры; запрос возвращает client_id, id,
+        version и snapshot корзины
+    """
+    cart_table = connection.ops.quote_name(Cart._meta.db_table)
+    client_table = connection.ops.quote_name(Client._meta.db_table)
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    empty_snapshot = connection.ops.adapt_json_value([], None)
+    if identity is None:
+        source, params = (
+            f"SELECT id, %s, 0, 0, %s, 0 FROM {client_table} WHERE tg_id = %s", [now, empty_snapshot, user_id]
+        )
+    else:
+        source, params = "VALUES (%s, %s, 0, 0, %s, 0)", [identity.client_id, now, empty_snapshot]
+    return (
+        f"INSERT INTO {cart_table} (client_id, created_at, item_count, total_price, snapshot, version) {source} "
+        f"ON CONFLICT (client_id) DO UPDATE SET checkout_order_id = NULL "
+        f"RETURNING client_id, id, version, snapshot",
+        params
+    )
+
+
+def cart_item_upsert_sql(cart_id: int, product_id: int, quantity: int) -> Tuple[str, list]:
+    """
+    Запрос, добавляющий позицию корзины или увеличивающий её количество
+
+    Returns:
+        Tuple[str, list]: SQL и параметры; запрос возвращает id и итоговое количество
+    """
+    item_table = connection.ops.quote_name(CartItem._meta.db_table)
+    return (
+        f"INSERT INTO {item_table} (cart_id, product_id, quantity) VALUES (%s, %s, %s) "
+        f"ON CONFLICT (cart_id, product_id) "
+        f"DO UPDATE SET quantity = {item_table}.quantity + EXCLUDED.quantity "
+        f"RETURNING id, quantity",
+        [cart_id, product_id, quantity]
+    )
+
+
+def _build_lines(cart_ids: Iterable[int]) -> Dict[int, list]:
+    """
+    Собирает позиции корзин из БД одним запросом CartItem → Product
+
+    Returns:
+        Dict[int, list]: позиции в формате Cart.snapshot для каждой корзины
+    """
+    lines = {cart_id: [] for cart_id in cart_ids}
+    for cart_id, *row in cart_lines_queryset(lines):
+        lines[cart_id].append(_make_line(*row))
+    return lines
+
+
+def _save_snapshot(cart_id: int, version: int, lines: list, reset_checkout: bool = True) -> CartSnapshot:
+    """
+    Сохраняет снимок корзины и увеличивает её версию
+
+    Вызывается внутри транзакции, в которой строка корзины уже заблокирована,
+    поэтому версия увеличивается без гонок.
+
+    Args:
+        cart_id: ID корзины
+        version: текущая версия корзины
+        lines: новые позиции в формате Cart.snapshot
+        reset_checkout: сбросить оформленный из корзины заказ
+
+    Returns:
+        CartSnapshot: сохранённый снимок
+    """
+    fields = {
+        "item_count": sum(line["quantity"] for line in lines),
+        "total_price": sum((Decimal(line["price"]) * line["quantity"] for line in lines), Decimal("0.00")),
+        "snapshot": lines,
+        "version": version + 1,
+    }
+    if reset_checkout:
+        fields["checkout_order"] = None
+    Cart.objects.filter(id=cart_id).update(**fields)
+    return _parse_snapshot(fields["version"], fields["item_count"], fields["total_price"], lines)
+
+
+def _parse_snapshot(version: int, item_count: int, total_price: Decimal, lines: list) -> CartSnapshot:
+    """Преобразует поля Cart в CartSnapshot"""
+    return CartSnapshot(
+        version, item_count, total_price,
+        [
+            CartLine(line["id"], line["product_id"], line["name"], Decimal(line["price"]), line["quantity"])
+            for line in lines
+        ]
+    )
+
+
+def _upsert_cart_item(
+    user_id: int,
+    product_id: int,
+    quantity: int,
+    identity: Optional[Identity] = None
+) -> Optional[Tuple[CartItem, Identity]]:
+    """
+    Атомарно добавляет товар в корзину двумя запросами INSERT ... ON CONFLICT
+
+    Сначала читаются название и цена товара с разделяемой блокировкой строки:
+    заказ оплачивается по сумме снимка, поэтому данные берутся из БД, а не из
+    кэша каталога. Блокировка не даёт админке изменить товар, пока позиция не
+    записана, а если товар уже меняется, ждёт фиксации, после которой
+    refresh_product_carts видит позицию. Товар блокируется раньше корзины, в
+    том же порядке, что и при сохранении товара, поэтому взаимоблокировок нет.
+
+    Первый INSERT создаёт корзину клиента, если её нет (клиент ищется по
+    tg_id, если его ID неизвестен), блокирует её строку и возвращает снимок,
+    второй добавляет позицию или увеличивает количество существующей. Снимок
+    обновляется без повторного чтения позиций.
+
+    Returns:
+        Optional[Tuple[CartItem, Identity]]: позиция корзины с итоговым количеством
+        и идентификаторы клиента или None, если клиент не найден
+
+    Raises:
+        Product.DoesNotExist: если товар удалён
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(*product_row_sql(product_id))
+        product = cursor.fetchone()
+        if product is None:
+            raise Product.DoesNotExist(f"Товар {product_id} не найден")
+        name, price = product[0], _to_price(product[1])
+        cursor.execute(*cart_upsert_sql(user_id, identity))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        identity, version = Identity(*row[:2]), row[2]
+        lines = Cart._meta.get_field("snapshot").from_db_value(row[3], None, connection)
+
+        cursor.execute(*cart_item_upsert_sql(identity.cart_id, product_id, quantity))
+        item_id, total_quantity = cursor.fetchone()
+
+        new_line = _make_line(item_id, product_id, name, price, total_quantity)
+        index = next((i for i, line in enumerate(lines) if line["id"] == item_id), None)
+        if index is not None:
+            lines[index] = new_line
+        else:
+            lines.append(new_line)
+        _save_snapshot(identity.cart_id, version, lines)
+
+    cart_item = CartItem(
+        id=item_id, cart_id=identity.cart_id, product_id=product_id, quantity=total_quantity
+    )
+    return cart_item, identity
+
+
+async def add_to_cart(
+    user_id: int,
+    product_id: int,
+    quantity: int = 1,
+    identity: Optional[Identity] = None
+) -> CartItem:
     """
     Добавляет товар в корзину пользователя
     
@@ -15,109 +269,206 @@ async def add_to_cart(user_id: int, product_id: int, quantity: int = 1) -> CartI
         user_id: ID пользователя
         product_id: ID товара
         quantity: количество товара
+        identity: ID клиента и корзины, если уже известны
         
     Returns:
-        CartItem: созданный или обновленный элемент корзины
+        CartItem: созданный или обновленный элемент корзины с итоговым количеством
     """
     try:
-        client = await get_client(user_id)
-        if not client:
-            logger.error(f"Клиент с ID {user_id} не найден")
+        result = await database_sync_to_async(_upsert_cart_item)(user_id, product_id, quantity, identity)
+        if result is None:
+            logger.error("Клиент с ID %s не найден", user_id)
             raise ValueError("Клиент не найден")
 
-        cart, created = await Cart.objects.aget_or_create(client_id=client.id)
-        if created:
-            logger.info(f"Создана новая корзина для клиента {user_id}")
-
-        cart_item, created = await CartItem.objects.aget_or_create(
-            cart=cart,
-            product_id=product_id
+        cart_item, identity = result
+        remember_identity(user_id, identity)
+        logger.info(
+            "Товар %s добавлен в корзину %s, количество: %s", product_id, cart_item.cart_id, cart_item.quantity
         )
-
-        if not created:
-            cart_item.quantity = F('quantity') + quantity
-            logger.info(f"Обновлено количество товара {product_id} в корзине {cart.id}")
-        else:
-            cart_item.quantity = quantity
-            logger.info(f"Добавлен новый товар {product_id} в корзину {cart.id}")
-
-        await cart_item.asave()
         return cart_item
 
     except Exception as e:
-        logger.error(f"Ошибка при добавлении товара в корзину: {e}")
+        logger.error("Ошибка при добавлении товара в корзину: %s", e)
         raise
 
 
-async def get_cart_items(user_id: int) -> list:
+def _delete_cart_items(carts: QuerySet) -> int:
     """
-    Получает список товаров в корзине пользователя
-    
+    Удаляет все позиции корзин, обновляет их снимки и сбрасывает оформленные из них заказы
+
+    Args:
+        carts: QuerySet корзин
+
+    Returns:
+        int: количество удалённых позиций
+    """
+    with transaction.atomic():
+        versions = dict(lock_carts_queryset(carts))
+        if not versions:
+            return 0
+
+        deleted_count, _ = CartItem.objects.filter(cart_id__in=list(versions)).delete()
+        if deleted_count:
+            for cart_id, version in versions.items():
+                _save_snapshot(cart_id, version, [])
+    return deleted_count
+
+
+def _change_cart_item(cart_id: int, cart_item_id: int, delta: Optional[int]) -> Optional[CartSnapshot]:
+    """
+    Меняет количество товара в позиции корзины или удаляет её
+
+    Returns:
+        Optional[CartSnapshot]: новый снимок или None, если позиции нет в корзине
+    """
+    with transaction.atomic():
+        row = locked_cart_queryset(cart_id).first()
+        if row is None:
+            return None
+        version, lines = row
+        line = next((line for line in lines if line["id"] == cart_item_id), None)
+        if line is None:
+            return None
+
+        cart_items = cart_item_queryset(cart_id, cart_item_id)
+        quantity = line["quantity"] + delta if delta is not None else 0
+        if quantity > 0:
+            cart_items.update(quantity=quantity)
+            line["quantity"] = quantity
+        else:
+            cart_items.delete()
+            lines.remove(line)
+        return _save_snapshot(cart_id, version, lines)
+
+
+def refresh_product_carts(product_ids: Iterable[int], cart_ids: Iterable[int] = ()) -> int:
+    """
+    Обновляет снимки корзин после изменения или удаления товаров
+
+    Цена и название товара хранятся в снимке, поэтому при их изменении в
+    админке снимки корзин с этим товаром пересчитываются. Версия корзины
+    увеличивается, только если содержимое снимка изменилось.
+
+    Args:
+        product_ids: ID изменённых товаров
+        cart_ids: ID корзин, которые нужно пересчитать дополнительно (позиции
+            удалённого товара к моменту вызова уже удалены)
+
+    Returns:
+        int: количество обновлённых корзин
+    """
+    with transaction.atomic():
+        snapshots = {
+            cart_id: (version, lines)
+            for cart_id, version, lines in product_carts_queryset(product_ids, cart_ids)
+        }
+        updated = 0
+        for cart_id, lines in _build_lines(snapshots).items():
+            version, previous = snapshots[cart_id]
+            if lines != previous:
+                _save_snapshot(cart_id, version, lines, reset_checkout=False)
+                updated += 1
+    return updated
+
+
+async def get_cart(user_id: int, identity: Optional[Identity] = None) -> CartSnapshot:
+    """
+    Получает содержимое корзины пользователя из снимка одним запросом
+
     Args:
         user_id: ID пользователя
-        
+        identity: ID клиента и корзины, если уже известны
+
     Returns:
-        list: список товаров в корзине
+        CartSnapshot: снимок корзины (EMPTY_CART, если клиента или корзины нет)
     """
     try:
-        client = await get_client(user_id)
-        if not client:
-            logger.warning(f"Клиент с ID {user_id} не найден")
-            return []
-
-        cart = await Cart.objects.aget(client_id=client.id)
-        if not cart:
-            logger.info(f"Корзина для клиента {user_id} не найдена")
-            return []
-        
-        items = await sync_to_async(list)(cart.items.select_related("product"))
-        logger.info(f"Получено {len(items)} товаров из корзины клиента {user_id}")
-        return items
+        if identity is None:
+            identity = await get_identity(user_id)
+        if identity is None:
+            logger.warning("Клиент с ID %s не найден", user_id)
+            return EMPTY_CART
+
+        if identity.cart_id is None:
+            logger.debug("Корзина для клиента %s не найдена", user_id)
+            return EMPTY_CART
+
+        row = await database_sync_to_async(cart_queryset(identity.cart_id).first)()
+        if row is None:
+            return EMPTY_CART
+
+        snapshot = _parse_snapshot(*row)
+        logger.debug(
+            "Корзина клиента %s: версия %s, %s позиций", user_id, snapshot.version, len(snapshot.lines)
+        )
+        return snapshot
 
-    except Cart.DoesNotExist:
-        logger.warning(f"Корзина для клиента с ID {user_id} не найдена")
-        return []
     except Exception as e:
-        logger.error(f"Ошибка получения корзины для пользователя {user_id}: {e}")
+        logger.error("Ошибка получения корзины для пользователя %s: %s", user_id, e)
         raise
 
 
-async def remove_from_cart(cart_item_id: int) -> None:
+async def change_cart_item(
+    user_id: int,
+    cart_item_id: int,
+    delta: Optional[int],
+    identity: Optional[Identity] = None
+) -> Optional[CartSnapshot]:
     """
-    Удаляет товар из корзины
-    
+    Изменяет количество товара в корзине пользователя
+
     Args:
-        cart_item_id: ID элемента корзины
+        user_id: ID пользователя
+        cart_item_id: ID позиции корзины
+        delta: изменение количества (None — удалить позицию); при нулевом
+            итоговом количестве позиция удаляется
+        identity: ID клиента и корзины, если уже известны
+
+    Returns:
+        Optional[CartSnapshot]: новый снимок корзины или None, если позиции нет
+        в корзине пользователя
     """
     try:
-        cart_item = await CartItem.objects.aget(id=cart_item_id)
-        cart_id = cart_item.cart_id
-        await cart_item.adelete()
-        logger.info(f"Товар с ID {cart_item_id} удалён из корзины {cart_id}")
-    except CartItem.DoesNotExist:
-        logger.warning(f"Товар с ID {cart_item_id} не найден в корзине")
+        if identity is None:
+            identity = await get_identity(user_id)
+        if identity is None or identity.cart_id is None:
+            return None
+
+        cart = await database_sync_to_async(_change_cart_item)(identity.cart_id, cart_item_id, delta)
+        if cart is None:
+            logger.warning("Товар с ID %s не найден в корзине пользователя %s", cart_item_id, user_id)
+            return None
+        logger.info(
+            "Позиция %s корзины %s изменена (%s), товаров: %s",
+            cart_item_id, identity.cart_id, "удалена" if delta is None else f"{delta:+d}", cart.item_count
+        )
+        return cart
     except Exception as e:
-        logger.error(f"Ошибка при удалении товара с ID {cart_item_id}: {e}")
+        logger.error("Ошибка при изменении товара с ID %s: %s", cart_item_id, e)
         raise
 
 
-async def clear_cart(user_id: int) -> None:
+async def clear_cart(user_id: int, identity: Optional[Identity] = None) -> None:
     """
     Очищает корзину пользователя
     
     Args:
         user_id: ID пользователя
+        identity: ID клиента и корзины, если уже известны
     """
     try:
-        cart_items = CartItem.objects.filter(cart__client__tg_id=user_id)
-        
-        if not await cart_items.aexists():
-            logger.info(f"Корзина пользователя {user_id} уже пуста")
+        if identity is not None:
+            carts = Cart.objects.filter(id=identity.cart_id)
+        else:
+            carts = client_carts_queryset(user_id)
+
+        deleted_count = await database_sync_to_async(_delete_cart_items)(carts)
+        if not deleted_count:
+            logger.info("Корзина пользователя %s уже пуста", user_id)
             return
 
-        deleted_count, _ = await cart_items.adelete()
-        logger.info(f"Удалено {deleted_count} товаров из корзины пользователя {user_id}")
+        logger.info("Удалено %s товаров из корзины пользователя %s", deleted_count, user_id)
         
     except Exception as e:
-        logger.error(f"Ошибка при очистке корзины пользователя {user_id}: {e}")
+        logger.error("Ошибка при очистке корзины пользователя %s: %s", user_id, e)
         raise
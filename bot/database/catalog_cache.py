@@ -0,0 +1,141 @@
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from bot.logging_config import logger
+
+
+SHARED_CACHE_TIMEOUT = 24 * 3600  # Время жизни записи при общем кэше (страховка, инвалидация по версии)
+LOCAL_CACHE_TIMEOUT = 60  # Время жизни записей и версии, если общего кэша нет
+# Без REDIS_URL кэш и версия хранятся в памяти каждого процесса, и изменения
+# из админки до процесса бота не доходят: свежесть обеспечивает короткий TTL
+CACHE_TIMEOUT = SHARED_CACHE_TIMEOUT if getattr(settings, "REDIS_URL", None) else LOCAL_CACHE_TIMEOUT
+VERSION_TIMEOUT = None if getattr(settings, "REDIS_URL", None) else LOCAL_CACHE_TIMEOUT
+VERSION_KEY = "catalog:version"  # Ключ текущей версии каталога
+VERSION_CHECK_INTERVAL = 1.0  # Как часто асинхронный код перечитывает версию из кэша, секунды
+
+_MISSING = object()
+
+
+class CatalogCache:
+    """
+    Кэш каталога с версионированными ключами
+
+    Все ключи включают текущую версию каталога. Любое изменение категорий,
+    подкатегорий или товаров увеличивает версию, после чего старые записи
+    больше не читаются и вытесняются по времени жизни. Если у версии есть
+    время жизни, по его истечении она создаётся заново, и все данные,
+    привязанные к версии (записи, клавиатуры, поисковый индекс), обновляются.
+    """
+
+    def __init__(self, timeout: int = CACHE_TIMEOUT, version_timeout: Optional[int] = VERSION_TIMEOUT):
+        """
+        Инициализация кэша
+
+        Args:
+            timeout: время жизни записи в секундах
+            version_timeout: время жизни версии в секундах (None — бессрочно)
+        """
+        self.timeout = timeout
+        self.version_timeout = version_timeout
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._version: Optional[int] = None
+        self._version_checked = 0.0
+
+    def get_version(self) -> int:
+        """Возвращает текущую версию каталога"""
+        version = cache.get(VERSION_KEY)
+        if version is None:
+            # Начальная версия от времени, чтобы не совпасть с записями до сброса кэша
+            cache.add(VERSION_KEY, time.time_ns(), self.version_timeout)
+            version = cache.get(VERSION_KEY)
+        return version
+
+    async def aget_version(self) -> int:
+        """
+        Возвращает версию каталога, не блокируя event loop
+
+        Версия запоминается в процессе и перечитывается из кэша не чаще раза
+        в VERSION_CHECK_INTERVAL секунд в отдельном потоке: при промахе L1
+        чтение — это сетевой запрос к Redis.
+        """
+        now = time.monotonic()
+        if self._version is None or now - self._version_checked >= VERSION_CHECK_INTERVAL:
+            self._version = await sync_to_async(self.get_version, thread_sensitive=False)()
+            self._version_checked = now
+        return self._version
+
+    def bump_version(self) -> int:
+        """
+        Увеличивает версию каталога, инвалидируя все записи
+
+        Returns:
+            int: новая версия
+        """
+        try:
+            version = cache.incr(VERSION_KEY)
+        except ValueError:
+            version = time.time_ns()
+            cache.set(VERSION_KEY, version, self.version_timeout)
+        self._version, self._version_checked = version, time.monotonic()
+        logger.info("Версия каталога обновлена: %s", version)
+        return version
+
+    def make_key(self, name: str, *parts, version: int) -> str:
+        """Формирует ключ записи для указанной версии каталога"""
+        return ":".join(["catalog", str(version), name, *map(str, parts)])
+
+    def get_or_set(self, name: str, loader: Callable[[], Any], *parts) -> Any:
+        """
+        Возвращает значение из кэша или загружает его и сохраняет
+
+        Args:
+            name: имя набора данных (categories, products, ...)
+            loader: функция загрузки данных из БД
+            parts: параметры, от которых зависят данные
+
+        Returns:
+            Any: закэшированное или загруженное значение
+        """
+        key = self.make_key(name, *parts, version=self.get_version())
+        value = cache.get(key, _MISSING)
+        if value is not _MISSING:
+            with self._lock:
+                self.hits += 1
+            return value
+
+        with self._lock:
+            self.misses += 1
+        value = loader()
+        cache.set(key, value, self.timeout)
+        return value
+
+    def delete(self, name: str, *parts) -> None:
+        """Удаляет запись текущей версии каталога"""
+        cache.delete(self.make_key(name, *parts, version=self.get_version()))
+
+    def stats(self) -> dict:
+        """
+        Возвращает счётчики попаданий и промахов
+
+        Returns:
+            dict: версия каталога, попадания, промахи и доля попаданий
+        """
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            "version": self.get_version(),
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": hits / total if total else 0.0,
+        }
+
+
+catalog_cache = CatalogCache()
@@ -1,50 +1,111 @@
-from math import ceil
-from typing import List, Optional, Tuple
+from typing import List, NamedTuple, Optional
 
 from asgiref.sync import sync_to_async
 from django.core.exceptions import ObjectDoesNotExist
-from django.db.models import QuerySet
-from django.core.cache import cache
+from django.db.models import Q, QuerySet, Subquery
+from django.utils import timezone
 
 from django_app.clients.models import Client
 from django_app.products.models import Category, Product, Subcategory
+from bot.database.catalog_cache import catalog_cache
+from bot.database.executor import database_sync_to_async
+from bot.database.search_db import product_search
 from bot.logging_config import logger
 
 
 ITEMS_PER_PAGE = 3  # Количество элементов на одной странице
-CACHE_TIMEOUT = 3600  # Время кэширования в секундах
 
 
-class Paginator:
-    """Класс для пагинации списков"""
-    def __init__(self, items: List, page: int = 1, per_page: int = ITEMS_PER_PAGE):
+class PageItem(NamedTuple):
+    """Элемент страницы списка: только то, что нужно для кнопки"""
+    id: int
+    name: str
+
+
+class Page(NamedTuple):
+    """Страница списка"""
+    items: List[PageItem]
+    has_next: bool
+    has_previous: bool
+
+    @property
+    def next_cursor(self) -> Optional[int]:
+        """ID последнего элемента страницы, если есть следующая страница"""
+        return self.items[-1].id if self.has_next and self.items else None
+
+    @property
+    def previous_cursor(self) -> Optional[int]:
+        """ID первого элемента страницы, если есть предыдущая страница"""
+        return self.items[0].id if self.has_previous and self.items else None
+
+
+class KeysetPaginator:
+    """
+    Пагинация по ключу (name, id) на стороне БД
+
+    Вместо загрузки всего списка и OFFSET выбирается per_page + 1 строк после
+    (или перед) элементом-курсором, поэтому стоимость перехода по страницам
+    зависит только от размера страницы. Лишняя строка показывает, есть ли
+    следующая страница, без подсчёта общего количества.
+    """
+    def __init__(self, queryset: QuerySet, per_page: int = ITEMS_PER_PAGE):
         """
         Инициализация пагинатора
-        
+
         Args:
-            items: список элементов для пагинации
-            page: текущая страница (по умолчанию 1)
+            queryset: выборка элементов с полями id и name
             per_page: количество элементов на странице
         """
-        self.items = items
-        self.page = max(page, 1)  # Минимальная страница = 1
+        self.queryset = queryset
         self.per_page = per_page
-        self.total_count = len(items)
-        self.total_pages = ceil(self.total_count / per_page)
 
-    def get_page_items(self) -> List:
-        """Возвращает элементы текущей страницы"""
-        start = (self.page - 1) * self.per_page
-        end = start + self.per_page
-        return self.items[start:end]
+    def page_queryset(self, after: Optional[int] = None, before: Optional[int] = None) -> QuerySet:
+        """
+        Строит запрос строк (id, name) для страницы после или перед элементом-курсором
 
-    def has_next(self) -> bool:
-        """Проверяет наличие следующей страницы"""
-        return self.page < self.total_pages
+        Args:
+            after: ID элемента, после которого начинается страница
+            before: ID элемента, перед которым заканчивается страница
 
-    def has_previous(self) -> bool:
-        """Проверяет наличие предыдущей страницы"""
-        return self.page > 1
+        Returns:
+            QuerySet: per_page + 1 строк (лишняя строка — признак следующей страницы)
+        """
+        rows = self.queryset
+        if after is not None or before is not None:
+            cursor = after if after is not None else before
+            # Имя курсора подставляется подзапросом, чтобы не передавать его в callback_data
+            name = Subquery(self.queryset.model.objects.filter(id=cursor).values("name")[:1])
+            if after is not None:
+                rows = rows.filter(Q(name__gt=name) | Q(name=name, id__gt=cursor)).order_by("name", "id")
+            else:
+                rows = rows.filter(Q(name__lt=name) | Q(name=name, id__lt=cursor)).order_by("-name", "-id")
+        else:
+            rows = rows.order_by("name", "id")
+        return rows.values_list("id", "name")[:self.per_page + 1]
+
+    def get_page(self, after: Optional[int] = None, before: Optional[int] = None) -> Page:
+        """
+        Возвращает страницу после или перед элементом-курсором
+
+        Args:
+            after: ID элемента, после которого начинается страница
+            before: ID элемента, перед которым заканчивается страница
+                (без курсоров возвращается первая страница)
+
+        Returns:
+            Page: элементы страницы и признаки соседних страниц
+        """
+        items = [PageItem(*row) for row in self.page_queryset(after, before)]
+        extra = len(items) > self.per_page
+        items = items[:self.per_page]
+
+        if before is not None:
+            items.reverse()
+            return Page(items, has_next=True, has_previous=extra)
+        if after is not None and not items:
+            # Курсор удалён или устарел: начинаем список сначала
+            return self.get_page()
+        return Page(items, has_next=extra, has_previous=after is not None)
 
 
 async def create_client(tg_id: int, tg_username: Optional[str]) -> Client:
@@ -58,9 +119,12 @@ async def create_client(tg_id: int, tg_username: Optional[str]) -> Client:
     Returns:
         Client: созданный клиент
     """
-    client = await Client.objects.acreate(tg_id=tg_id, username=tg_username)
-    await client.asave()
-    return client
+    return await database_sync_to_async(Client.objects.create)(tg_id=tg_id, username=tg_username)
+
+
+def client_queryset(tg_id: int) -> QuerySet:
+    """Запрос клиента по ID в Telegram"""
+    return Client.objects.filter(tg_id=tg_id)
 
 
 async def get_client(tg_id: int) -> Optional[Client]:
@@ -74,88 +138,120 @@ async def get_client(tg_id: int) -> Optional[Client]:
         Optional[Client]: клиент или None, если не найден
     """
     try:
-        return await Client.objects.aget(tg_id=tg_id)
+        return await database_sync_to_async(client_queryset(tg_id).get)()
+    except ObjectDoesNotExist:
+        return None
+
+
+def category_queryset() -> QuerySet:
+    """Запрос всех категорий (для KeysetPaginator)"""
+    return Category.objects.all()
+
+
+def subcategory_queryset(category_id: int) -> QuerySet:
+    """Запрос подкатегорий категории (для KeysetPaginator)"""
+    return Subcategory.objects.filter(category_id=category_id)
+
+
+def product_list_queryset(subcategory_id: int) -> QuerySet:
+    """Запрос товаров подкатегории (для KeysetPaginator)"""
+    return Product.objects.filter(category_id=subcategory_id)
+
+
+def product_queryset(product_id: int) -> QuerySet:
+    """Запрос товара вместе с подкатегорией"""
+    return Product.objects.select_related('category').filter(id=product_id)
+
+
+def _load_page(queryset: QuerySet, after: Optional[int], before: Optional[int]) -> Page:
+    """Загружает страницу списка из БД"""
+    return KeysetPaginator(queryset).get_page(after=after, before=before)
+
+
+def _load_product(product_id: int) -> Optional[Product]:
+    """Загружает товар из БД"""
+    try:
+        return product_queryset(product_id).get()
     except ObjectDoesNotExist:
+        logger.warning("Товар с ID %s не найден", product_id)
         return None
 
 
-@sync_to_async
-def get_categories() -> List[Category]:
+@database_sync_to_async
+def get_category_page(after: Optional[int] = None, before: Optional[int] = None) -> Page:
     """
-    Получает список всех категорий
-    
+    Получает страницу списка категорий
+
+    Args:
+        after: ID категории, после которой начинается страница
+        before: ID категории, перед которой заканчивается страница
+
     Returns:
-        List[Category]: список категорий
+        Page: страница категорий
     """
-    cache_key = 'all_categories'
-    categories = cache.get(cache_key)
-    
-    if categories is None:
-        try:
-            categories = list(Category.objects.all())
-            cache.set(cache_key, categories, CACHE_TIMEOUT)
-            logger.info(f"Получено {len(categories)} категорий из БД")
-        except Exception as e:
-            logger.error(f"Ошибка при получении категорий: {e}")
-            categories = []
-    
-    return categories
+    try:
+        return catalog_cache.get_or_set(
+            'categories', lambda: _load_page(category_queryset(), after, before), after, before
+        )
+    except Exception as e:
+        logger.error("Ошибка при получении категорий: %s", e)
+        return Page([], False, False)
 
 
-@sync_to_async
-def get_subcategories(category_id: int) -> List[Subcategory]:
+@database_sync_to_async
+def get_subcategory_page(category_id: int, after: Optional[int] = None, before: Optional[int] = None) -> Page:
     """
-    Получает список подкатегорий для указанной категории
-    
+    Получает страницу подкатегорий для указанной категории
+
     Args:
         category_id: ID категории
-        
+        after: ID подкатегории, после которой начинается страница
+        before: ID подкатегории, перед которой заканчивается страница
+
     Returns:
-        List[Subcategory]: список подкатегорий
+        Page: страница подкатегорий
     """
-    cache_key = f'subcategories_{category_id}'
-    subcategories = cache.get(cache_key)
-    
-    if subcategories is None:
-        try:
-            subcategories = list(
-                Subcategory.objects.filter(category_id=category_id)
-                .select_related('category')
-            )
-            cache.set(cache_key, subcategories, CACHE_TIMEOUT)
-            logger.info(f"Получено {len(subcategories)} подкатегорий для категории {category_id}")
-        except Exception as e:
-            logger.error(f"Ошибка при получении подкатегорий для категории {category_id}: {e}")
-            subcategories = []
-    
-    return subcategories
+    try:
+        return catalog_cache.get_or_set(
+            'subcategories',
+            lambda: _load_page(subcategory_queryset(category_id), after, before),
+            category_id, after, before
+        )
+    except Exception as e:
+        logger.error("Ошибка при получении подкатегорий для категории %s: %s", category_id, e)
+        return Page([], False, False)
 
 
-@sync_to_async
-def get_products(subcategory_id: int) -> list[Product]:
+@database_sync_to_async
+def get_product_page(subcategory_id: int, after: Optional[int] = None, before: Optional[int] = None) -> Page:
     """
-    Получает все товары для подкатегории
-    
+    Получает страницу товаров подкатегории
+
     Args:
         subcategory_id: ID подкатегории
-        
+        after: ID товара, после которого начинается страница
+        before: ID товара, перед которым заканчивается страница
+
     Returns:
-        list[Product]: список товаров
+        Page: страница товаров
     """
     try:
-        products = list(
-            Product.objects.filter(category_id=subcategory_id)
-            .select_related('category')
+        return catalog_cache.get_or_set(
+            'products',
+            lambda: _load_page(product_list_queryset(subcategory_id), after, before),
+            subcategory_id, after, before
         )
-        logger.info(f"Получено {len(products)} товаров для подкатегории {subcategory_id}")
-        return products
-
     except Exception as e:
-        logger.error(f"Ошибка при получении товаров: {e}")
-        return []
+        logger.error("Ошибка при получении товаров: %s", e)
+        return Page([], False, False)
 
 
-@sync_to_async
+def get_cached_product(product_id: int) -> Optional[Product]:
+    """Получает товар из кэша каталога, при промахе загружает из БД (синхронно)"""
+    return catalog_cache.get_or_set('product', lambda: _load_product(product_id), product_id)
+
+
+@database_sync_to_async
 def get_product(product_id: int) -> Optional[Product]:
     """
     Получает информацию о конкретном товаре
@@ -167,12 +263,29 @@ def get_product(product_id: int) -> Optional[Product]:
         Optional[Product]: объект товара или None, если товар не найден
     """
     try:
-        product = Product.objects.select_related('category').get(id=product_id)
-        return product
-    except ObjectDoesNotExist:
-        logger.warning(f"Товар с ID {product_id} не найден")
-        return None
+        return get_cached_product(product_id)
     except Exception as e:
-        logger.error(f"Ошибка при получении товара с ID {product_id}: {e}")
+        logger.error("Ошибка при получении товара с ID %s: %s", product_id, e)
         return None
 
+
+async def save_product_photo(product_id: int, file_id: str, image_hash: str) -> None:
+    """
+    Сохраняет file_id загруженного в Telegram фото товара
+
+    Args:
+        product_id: ID товара
+        file_id: file_id фото на серверах Telegram
+        image_hash: хэш содержимого загруженного изображения
+    """
+    try:
+        await database_sync_to_async(Product.objects.filter(id=product_id).update)(
+            image_file_id=file_id,
+            image_file_hash=image_hash,
+            updated_at=timezone.now()
+        )
+        await sync_to_async(catalog_cache.delete)('product', product_id)
+        product_search.set_file_id(product_id, file_id)
+        logger.info("Сохранён file_id фото для товара %s", product_id)
+    except Exception as e:
+        logger.error("Ошибка при сохранении file_id для товара %s: %s", product_id, e)
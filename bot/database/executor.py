@@ -0,0 +1,43 @@
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, TypeVar
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+from bot.config import DB_THREADS
+
+
+T = TypeVar("T")
+
+# Пул потоков для работы с ORM. sync_to_async по умолчанию выполняет весь
+# синхронный код в одном потоке (thread_sensitive), и запросы всех
+# пользователей к БД идут строго по одному.
+db_executor = ThreadPoolExecutor(max_workers=DB_THREADS, thread_name_prefix="db")
+
+
+def database_sync_to_async(func: Callable[..., T]) -> Callable[..., Awaitable[T]]:
+    """
+    Выполняет синхронную функцию с ORM в пуле потоков БД
+
+    Аналог sync_to_async для кода, работающего с БД: вызовы разных
+    пользователей выполняются параллельно в DB_THREADS потоках. До и после
+    вызова закрываются устаревшие и сломанные подключения потока
+    (close_old_connections): при пуле psycopg подключение возвращается в пул,
+    без пула — переиспользуется до CONN_MAX_AGE с проверкой перед первым
+    запросом (CONN_HEALTH_CHECKS).
+
+    Используется как декоратор или обёртка: database_sync_to_async(list)(queryset).
+    Вызов целиком выполняется в одном потоке, поэтому transaction.atomic
+    внутри функции работает как обычно.
+    """
+
+    @functools.wraps(func)
+    def run(*args, **kwargs) -> T:
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(run, thread_sensitive=False, executor=db_executor)
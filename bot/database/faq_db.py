@@ -0,0 +1,239 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from typing import List, Optional, Tuple
+
+from aiogram.types import InlineQueryResultArticle, InputTextMessageContent
+from django.db.models import Count, Max, QuerySet
+
+from bot.config import BOT_USERNAME, FAQ_FILE, FAQ_RELOAD_INTERVAL
+from bot.database.executor import database_sync_to_async
+from bot.logging_config import logger
+from bot.models import FAQEntry
+from bot.text_index import SearchDocument, TextIndex
+
+
+MAX_RESULTS = 50  # Ограничение Telegram на количество результатов инлайн-запроса
+
+# Вопросы и ответы по умолчанию (если в БД и в файле FAQ_FILE ничего нет)
+DEFAULT_FAQ = {
+    "как сделать заказ": """
+1. Выберите товар в каталоге
+2. Нажмите "🛒 Добавить в корзину"
+3. Перейдите в корзину
+4. Нажмите "💳 Оплатить"
+5. Следуйте инструкциям для оплаты
+    """,
+    
+    "способы оплаты": """
+Мы принимаем следующие способы оплаты:
+💳 Банковская карта
+🏦 Перевод на счет
+💵 Наличные при самовывозе
+    """,
+    
+    "доставка": """
+Доступные способы доставки:
+🚚 Курьерская доставка
+🏪 Самовывоз из магазина
+📦 Почта России
+    """,
+    
+    "возврат": """
+Условия возврата:
+1. Товар не был в употреблении
+2. Сохранена упаковка
+3. Есть чек
+4. Прошло не более 14 дней
+    """,
+    
+    "контакты": """
+Наши контакты:
+📞 Телефон: +7 (XXX) XXX-XX-XX
+📧 Email: support@example.com
+💬 Telegram: @support
+    """,
+    
+    "работа": """
+Режим работы:
+Пн-Пт: 9:00 - 18:00
+Сб: 10:00 - 16:00
+Вс: Выходной
+    """,
+    
+    "скидки": """
+Наши скидки:
+🎁 5% при первом заказе
+🎁 10% при заказе от 5000₽
+🎁 15% при заказе от 10000₽
+    """,
+    
+    "гарантия": """
+Гарантия на товары:
+📦 14 дней на возврат
+⚖️ 1 год гарантии
+🛡 Защита покупателя
+    """
+}
+
+
+def active_entries_queryset() -> QuerySet:
+    """Запрос активных вопросов FAQ (читается по частичному индексу faq_active_idx)"""
+    return FAQEntry.objects.filter(is_active=True)
+
+
+def _get_fingerprint(path: Optional[str]) -> tuple:
+    """Возвращает отпечаток источников FAQ: меняется при любом изменении вопросов"""
+    entries = active_entries_queryset().aggregate(count=Count("id"), updated_at=Max("updated_at"))
+    mtime = os.path.getmtime(path) if path and os.path.exists(path) else None
+    return entries["count"], entries["updated_at"], mtime
+
+
+def _load_entries(path: Optional[str]) -> List[Tuple[str, str]]:
+    """
+    Загружает вопросы и ответы
+
+    Источники по приоритету: активные записи FAQEntry в БД, JSON-файл path
+    ({"вопрос": "ответ"} или [{"question": ..., "answer": ...}]), DEFAULT_FAQ.
+
+    Returns:
+        List[Tuple[str, str]]: пары (вопрос, ответ)
+    """
+    entries = list(active_entries_queryset().values_list("question", "answer"))
+    if entries:
+        return entries
+
+    if path and os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            return list(data.items())
+        return [(item["question"], item["answer"]) for item in data]
+
+    return list(DEFAULT_FAQ.items())
+
+
+def make_result(question: str, answer: str) -> InlineQueryResultArticle:
+    """Формирует результат инлайн-запроса для вопроса"""
+    return InlineQueryResultArticle(
+        id=hashlib.md5(question.encode()).hexdigest(),
+        title=question.capitalize(),
+        description="Нажмите, чтобы увидеть ответ",
+        input_message_content=InputTextMessageContent(
+            message_text=f"❓ {question.capitalize()}\n\n{answer}"
+        )
+    )
+
+
+NOT_FOUND_RESULT = InlineQueryResultArticle(
+    id="not_found",
+    title="Вопрос не найден",
+    description="Попробуйте сформулировать вопрос иначе",
+    input_message_content=InputTextMessageContent(
+        message_text=(
+            "❓ Извините, мы не нашли ответ на ваш вопрос.\n\n"
+            "Пожалуйста, попробуйте сформулировать вопрос иначе "
+            "или обратитесь в поддержку."
+        )
+    )
+)
+
+
+class FAQEngine:
+    """
+    Поиск ответов на частые вопросы
+
+    Результаты инлайн-запроса для каждого вопроса создаются один раз при
+    загрузке. Вопросы ищутся по индексу слов вопроса и ответа (слова вопроса
+    весят больше), слова с опечатками сопоставляются по триграммам.
+    Источники проверяются не чаще раза в reload_interval секунд и
+    перезагружаются без перезапуска бота, если изменились.
+    """
+
+    def __init__(self, path: Optional[str] = FAQ_FILE, reload_interval: float = FAQ_RELOAD_INTERVAL):
+        """
+        Инициализация
+
+        Args:
+            path: JSON-файл с вопросами и ответами
+            reload_interval: период проверки изменений в секундах
+        """
+        self.path = path
+        self.reload_interval = reload_interval
+        self.questions: List[str] = []
+        self.results: List[InlineQueryResultArticle] = []
+        self.menu_text = ""
+        self._index = TextIndex()
+        self._fingerprint: Optional[tuple] = None
+        self._checked_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self._compile(list(DEFAULT_FAQ.items()))
+
+    def _compile(self, entries: List[Tuple[str, str]]) -> None:
+        """Строит индекс, результаты и текст меню по списку вопросов"""
+        index = TextIndex()
+        for position, (question, answer) in enumerate(entries):
+            index.add(SearchDocument(position, question, "", "", ""), answer)
+
+        questions = [question for question, _ in entries]
+        numbered = "\n".join(f"{number}. {question.capitalize()}" for number, question in enumerate(questions, 1))
+        self.menu_text = (
+            "Часто задаваемые вопросы:\n\n"
+            f"{numbered}\n\n"
+            "Для получения ответа на вопрос:\n"
+            f"1. Напишите @{BOT_USERNAME} и пробел\n"
+            "2. Введите интересующий вопрос\n"
+            "3. Выберите подходящий вариант из списка"
+        )
+        self.questions = questions
+        self.results = [make_result(question, answer) for question, answer in entries]
+        self._index = index
+
+    async def refresh(self, force: bool = False) -> None:
+        """
+        Перезагружает вопросы, если источники изменились
+
+        Args:
+            force: проверить источники, не дожидаясь reload_interval
+        """
+        now = time.monotonic()
+        if not force and self._checked_at is not None and now - self._checked_at < self.reload_interval:
+            return
+
+        async with self._lock:
+            if not force and self._checked_at is not None and now - self._checked_at < self.reload_interval:
+                return
+            self._checked_at = time.monotonic()
+            try:
+                fingerprint = await database_sync_to_async(_get_fingerprint)(self.path)
+                if fingerprint == self._fingerprint:
+                    return
+                entries = await database_sync_to_async(_load_entries)(self.path)
+            except Exception as e:
+                logger.error("Ошибка загрузки FAQ: %s", e)
+                return
+
+            self._compile(entries)
+            self._fingerprint = fingerprint
+            logger.info("FAQ загружен: %s вопросов", len(entries))
+
+    def search(self, query: str, limit: int = MAX_RESULTS) -> List[InlineQueryResultArticle]:
+        """
+        Ищет вопросы по запросу
+
+        Args:
+            query: текст запроса (пустой запрос возвращает все вопросы)
+            limit: максимальное количество результатов
+
+        Returns:
+            List[InlineQueryResultArticle]: готовые результаты, от более подходящих к менее
+        """
+        if not query.strip():
+            return self.results[:limit]
+        documents, _ = self._index.search(query, 0, limit, match_all=False)
+        return [self.results[document.id] for document in documents]
+
+
+faq_engine = FAQEngine()
@@ -0,0 +1,63 @@
+from typing import NamedTuple, Optional
+
+from django.db.models import QuerySet
+
+from django_app.clients.models import Client
+from bot.cache import LRUCache
+from bot.database.executor import database_sync_to_async
+from bot.logging_config import logger
+
+
+IDENTITY_CACHE_SIZE = 10000  # Максимальное количество пользователей в кэше
+IDENTITY_CACHE_TIMEOUT = 300  # Время жизни записи в секундах
+
+
+class Identity(NamedTuple):
+    """Идентификаторы клиента и его корзины в БД"""
+    client_id: int
+    cart_id: Optional[int]
+
+
+identity_cache = LRUCache(IDENTITY_CACHE_SIZE, IDENTITY_CACHE_TIMEOUT)
+
+
+def identity_queryset(tg_id: int) -> QuerySet:
+    """Запрос строк (ID клиента, ID корзины) по ID в Telegram"""
+    return Client.objects.filter(tg_id=tg_id).values_list("id", "cart__id")
+
+
+async def get_identity(tg_id: int) -> Optional[Identity]:
+    """
+    Получает ID клиента и корзины по ID в Telegram
+
+    Результат кэшируется в памяти процесса. Незарегистрированные пользователи
+    не кэшируются, чтобы регистрация была видна сразу.
+
+    Args:
+        tg_id: ID пользователя в Telegram
+
+    Returns:
+        Optional[Identity]: идентификаторы или None, если клиент не найден
+    """
+    identity = identity_cache.get(tg_id)
+    if identity is not None:
+        return identity
+
+    row = await database_sync_to_async(identity_queryset(tg_id).first)()
+    if row is None:
+        return None
+
+    identity = Identity(*row)
+    identity_cache.set(tg_id, identity)
+    logger.debug("Идентификаторы пользователя %s загружены из БД: %s", tg_id, identity)
+    return identity
+
+
+def remember_identity(tg_id: int, identity: Identity) -> None:
+    """Сохраняет идентификаторы пользователя в кэш"""
+    identity_cache.set(tg_id, identity)
+
+
+def forget_identity(tg_id: int) -> None:
+    """Удаляет идентификаторы пользователя из кэша"""
+    identity_cache.delete(tg_id)
@@ -1,32 +1,102 @@
+from typing import Optional
+
+from django.db import transaction
+from django.db.models import QuerySet
+
 from bot.logging_config import logger
-from bot.database.catalog_db import get_client
-from django_app.clients.models import Order, OrderItem
+from bot.database.executor import database_sync_to_async
+from bot.database.identity_db import Identity, get_identity
+from django_app.clients.models import Cart, Order, OrderItem
 
 
 async def get_order(order_id):
     try:
-        order = await Order.objects.aget(id=order_id)
+        order = await database_sync_to_async(Order.objects.get)(id=order_id)
         return order
     except Exception as e:
-        logger.warning(f"Заказ не найден {e}")
+        logger.warning("Заказ не найден %s", e)
         raise
 
 
-async def create_order(user_id, full_name, phone, address, total_price, cart_items):
-    """Создаёт заказ в БД"""
-    client = await get_client(user_id)
-    order = await Order.objects.acreate(
-        client=client,
-        full_name=full_name,
-        phone=phone,
-        address=address,
-        total_price=total_price
+def checkout_cart_queryset(client_id: int) -> QuerySet:
+    """Запрос корзины клиента с блокировкой: только поля, нужные для оформления заказа"""
+    return (
+        Cart.objects.select_for_update()
+        .filter(client_id=client_id)
+        .only("id", "checkout_order_id", "item_count", "total_price", "snapshot")
     )
 
-    order_items = [
-        OrderItem(order=order, product=item.product, quantity=item.quantity)
-        for item in cart_items
-    ]
-    await OrderItem.objects.abulk_create(order_items)
 
+def _checkout(client_id: int, full_name: str, phone: str, address: str) -> Optional[Order]:
+    """
+    Оформляет заказ из корзины клиента в одной транзакции
+
+    Корзина блокируется на время оформления. Сумма и позиции заказа берутся из
+    снимка корзины (Cart.snapshot): все изменения корзины тоже блокируют её
+    строку, поэтому снимок совпадает с позициями. Если из текущего содержимого
+    корзины заказ уже оформлен (повторное нажатие), возвращается существующий заказ;
+    если контактные данные введены заново и отличаются, они обновляются в заказе
+    (заказ, привязанный к корзине, ещё не оплачен: после оплаты корзина очищается).
+
+    Returns:
+        Optional[Order]: заказ или None, если корзина пуста
+    """
+    with transaction.atomic():
+        cart = checkout_cart_queryset(client_id).first()
+        if cart is None or not cart.item_count:
+            return None
+
+        if cart.checkout_order_id is not None:
+            order = Order.objects.filter(id=cart.checkout_order_id).first()
+            if order is not None:
+                contacts = {"full_name": full_name, "phone": phone, "address": address}
+                changed = [field for field, value in contacts.items() if getattr(order, field) != value]
+                if changed:
+                    for field in changed:
+                        setattr(order, field, contacts[field])
+                    order.save(update_fields=changed)
+                    logger.info("Обновлены контактные данные заказа %s: %s", order.id, ", ".join(changed))
+                else:
+                    logger.info("Заказ %s уже оформлен из корзины %s", order.id, cart.id)
+                return order
+
+        order = Order.objects.create(
+            client_id=client_id,
+            full_name=full_name,
+            phone=phone,
+            address=address,
+            total_price=cart.total_price
+        )
+        OrderItem.objects.bulk_create(
+            OrderItem(order_id=order.id, product_id=line["product_id"], quantity=line["quantity"])
+            for line in cart.snapshot
+        )
+        Cart.objects.filter(id=cart.id).update(checkout_order_id=order.id)
+
+    return order
+
+
+async def create_order(user_id, full_name, phone, address, identity: Optional[Identity] = None) -> Optional[Order]:
+    """
+    Создаёт заказ в БД из корзины пользователя
+
+    Args:
+        user_id: ID пользователя
+        full_name: ФИО
+        phone: телефон
+        address: адрес доставки
+        identity: ID клиента и корзины, если уже известны
+
+    Returns:
+        Optional[Order]: созданный заказ или None, если корзина пуста
+    """
+    if identity is None:
+        identity = await get_identity(user_id)
+    if identity is None:
+        logger.warning("Клиент с ID %s не найден", user_id)
+        return None
+
+    order = await database_sync_to_async(_checkout)(identity.client_id, full_name, phone, address)
+    if order is not None:
+        logger.info("Оформлен заказ %s пользователя %s на сумму %s", order.id, user_id, order.total_price)
     return order
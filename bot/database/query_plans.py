@@ -0,0 +1,262 @@
+import random
+import re
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Dict, List, Tuple, Union
+
+from django.db import connection, transaction
+from django.db.models import QuerySet
+
+from django_app.clients.models import Cart, CartItem, Client, Order, OrderItem
+from django_app.products.models import Category, Product, Subcategory
+from bot.database.cart_db import (
+    cart_item_queryset, cart_item_upsert_sql, cart_lines_queryset, cart_queryset, cart_upsert_sql,
+    client_carts_queryset, lock_carts_queryset, locked_cart_queryset, product_carts_queryset, product_row_sql
+)
+from bot.database.catalog_db import (
+    KeysetPaginator, category_queryset, client_queryset, product_list_queryset, product_queryset,
+    subcategory_queryset
+)
+from bot.database.faq_db import active_entries_queryset
+from bot.database.identity_db import Identity, identity_queryset
+from bot.database.order_db import checkout_cart_queryset
+from bot.database.search_db import changed_products_queryset, deletions_queryset, expired_deletions_queryset
+from bot.excel import order_rows_queryset, orders_between_queryset
+from bot.fsm_storage import expired_records_queryset, record_queryset
+from bot.models import DeletedProduct, FAQEntry, FSMRecord
+
+
+# Запрос: QuerySet или сырой SQL с параметрами
+PlanQuery = Union[QuerySet, Tuple[str, list]]
+
+SEED_USER_BASE = 10 ** 12  # tg_id синтетических клиентов
+BATCH_SIZE = 1000
+
+# Полный просмотр таблицы в плане запроса
+SEQ_SCAN_PATTERNS = {
+    "postgresql": re.compile(r"Seq Scan on (\S+)"),
+    "sqlite": re.compile(r"\bSCAN (?!CONSTANT ROW)(\S+)(?!.*\bUSING\b)"),
+}
+
+
+def seed(products: int, seed_value: int = 0) -> Dict[str, int]:
+    """
+    Заполняет пустую БД синтетическими данными для проверки планов запросов
+
+    Args:
+        products: количество товаров; клиентов, корзин и заказов создаётся
+            столько же, категорий и подкатегорий — пропорционально меньше
+        seed_value: начальное значение генератора случайных чисел
+
+    Returns:
+        Dict[str, int]: ID записей, на которых выполняются проверяемые запросы
+    """
+    rng = random.Random(seed_value)
+    now = datetime.now(timezone.utc)
+    category_count = max(1, products // 1000)
+    subcategory_count = max(1, products // 50)
+
+    categories = Category.objects.bulk_create(
+        [Category(name=f"Категория {i:05}") for i in range(category_count)], batch_size=BATCH_SIZE
+    )
+    subcategories = Subcategory.objects.bulk_create(
+        [
+            Subcategory(name=f"Подкатегория {i:05}", category=categories[i % category_count])
+            for i in range(subcategory_count)
+        ],
+        batch_size=BATCH_SIZE
+    )
+    product_rows = Product.objects.bulk_create(
+        [
+            Product(
+                name=f"Товар {rng.randrange(products):06} {i}",
+                description="Описание товара",
+                price=Decimal(rng.randrange(100, 100000)) / 100,
+                category=subcategories[i % subcategory_count]
+            )
+            for i in range(products)
+        ],
+        batch_size=BATCH_SIZE
+    )
+
+    clients = Client.objects.bulk_create(
+        [Client(tg_id=SEED_USER_BASE + i, username=f"user{i}") for i in range(products)], batch_size=BATCH_SIZE
+    )
+    carts = Cart.objects.bulk_create([Cart(client=client) for client in clients], batch_size=BATCH_SIZE)
+    cart_items = CartItem.objects.bulk_create(
+        [
+            CartItem(cart=cart, product=product, quantity=rng.randint(1, 5))
+            for cart in carts
+            for product in rng.sample(product_rows, 3)
+        ],
+        batch_size=BATCH_SIZE
+    )
+    orders = Order.objects.bulk_create(
+        [
+            Order(
+                client=rng.choice(clients), full_name="Иван Иванов", phone="+79990000000",
+                address="Москва", total_price=Decimal("100.00")
+            )
+            for _ in range(products)
+        ],
+        batch_size=BATCH_SIZE
+    )
+    # created_at заполняется auto_now_add, поэтому даты раскладываются отдельным запросом
+    for order in orders:
+        order.created_at = now - timedelta(minutes=rng.randrange(60 * 24 * 365))
+    Order.objects.bulk_update(orders, ["created_at"], batch_size=BATCH_SIZE)
+    OrderItem.objects.bulk_create(
+        [OrderItem(order=order, product=rng.choice(product_rows), quantity=1) for order in orders],
+        batch_size=BATCH_SIZE
+    )
+
+    FAQEntry.objects.bulk_create(
+        [
+            FAQEntry(question=f"Вопрос {i}", answer="Ответ", position=i, is_active=i % 10 != 0)
+            for i in range(max(10, products // 100))
+        ],
+        batch_size=BATCH_SIZE
+    )
+    FSMRecord.objects.bulk_create(
+        [
+            FSMRecord(key=f"fsm:{i}", payload=b"{}", expires_at=now + timedelta(minutes=rng.randrange(-600, 600)))
+            for i in range(products)
+        ],
+        batch_size=BATCH_SIZE
+    )
+
+    DeletedProduct.objects.bulk_create(
+        [
+            DeletedProduct(product_id=products + i, deleted_at=now - timedelta(minutes=rng.randrange(60 * 24 * 60)))
+            for i in range(max(10, products // 10))
+        ],
+        batch_size=BATCH_SIZE
+    )
+
+    if connection.vendor == "postgresql":
+        # SQLite без статистики считает таблицы большими и выбирает индексы,
+        # как PostgreSQL с enable_seqscan = off (disable_seq_scans)
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    client = clients[len(clients) // 2]
+    return {
+        "category_id": categories[0].id,
+        "subcategory_id": subcategories[0].id,
+        "product_id": product_rows[len(product_rows) // 2].id,
+        "client_id": client.id,
+        "tg_id": client.tg_id,
+        "cart_id": carts[len(carts) // 2].id,
+        "cart_item_id": cart_items[len(cart_items) // 2].id,
+        "order_id": orders[len(orders) // 2].id,
+    }
+
+
+def _first(queryset: QuerySet) -> QuerySet:
+    """Запрос, который выполняет QuerySet.first()"""
+    return (queryset if queryset.ordered else queryset.order_by("pk"))[:1]
+
+
+def hot_queries(ids: Dict[str, int]) -> List[Tuple[str, PlanQuery]]:
+    """
+    Возвращает запросы из bot/database, выполняемые при обработке апдейтов
+
+    Запросы строятся теми же функциями, что и в коде бота, поэтому проверка
+    не расходится с тем, что бот выполняет на самом деле. Запросы, которые
+    намеренно читают всю таблицу (полная загрузка поискового индекса),
+    в список не входят.
+
+    Args:
+        ids: ID записей из seed()
+
+    Returns:
+        List[Tuple[str, PlanQuery]]: имя запроса и сам запрос
+    """
+    now = datetime.now(timezone.utc)
+    identity = Identity(ids["client_id"], ids["cart_id"])
+    categories = KeysetPaginator(category_queryset())
+    subcategories = KeysetPaginator(subcategory_queryset(ids["category_id"]))
+    products = KeysetPaginator(product_list_queryset(ids["subcategory_id"]))
+
+    return [
+        ("catalog_db.get_category_page", categories.page_queryset()),
+        ("catalog_db.get_category_page after", categories.page_queryset(after=ids["category_id"])),
+        ("catalog_db.get_subcategory_page", subcategories.page_queryset()),
+        ("catalog_db.get_subcategory_page after", subcategories.page_queryset(after=ids["subcategory_id"])),
+        ("catalog_db.get_product_page", products.page_queryset()),
+        ("catalog_db.get_product_page after", products.page_queryset(after=ids["product_id"])),
+        ("catalog_db.get_product_page before", products.page_queryset(before=ids["product_id"])),
+        ("catalog_db.get_product", product_queryset(ids["product_id"])),
+        ("catalog_db.get_client", client_queryset(ids["tg_id"])),
+        ("identity_db.get_identity", _first(identity_queryset(ids["tg_id"]))),
+        ("cart_db.get_cart", _first(cart_queryset(ids["cart_id"]))),
+        ("cart_db.add_to_cart product", product_row_sql(ids["product_id"])),
+        ("cart_db.add_to_cart cart", cart_upsert_sql(ids["tg_id"])),
+        ("cart_db.add_to_cart cart by identity", cart_upsert_sql(ids["tg_id"], identity)),
+        ("cart_db.add_to_cart item", cart_item_upsert_sql(ids["cart_id"], ids["product_id"], 1)),
+        ("cart_db._build_lines", cart_lines_queryset([ids["cart_id"]])),
+        ("cart_db.clear_cart", lock_carts_queryset(client_carts_queryset(ids["tg_id"]))),
+        ("cart_db.change_cart_item", _first(locked_cart_queryset(ids["cart_id"]))),
+        ("cart_db.change_cart_item item", cart_item_queryset(ids["cart_id"], ids["cart_item_id"])),
+        ("cart_db.refresh_product_carts", product_carts_queryset([ids["product_id"]])),
+        ("cart_db.refresh_product_carts carts", product_carts_queryset([ids["product_id"]], [ids["cart_id"]])),
+        ("order_db.create_order cart", _first(checkout_cart_queryset(ids["client_id"]))),
+        ("orders history", Order.objects.filter(client_id=ids["client_id"]).order_by("-created_at")[:10]),
+        ("excel.OrderExporter", order_rows_queryset([ids["order_id"]])),
+        ("excel.iter_orders", orders_between_queryset(now - timedelta(days=1), now)),
+        ("search_db.refresh", changed_products_queryset(now - timedelta(minutes=5))),
+        ("search_db.refresh deletions", deletions_queryset(0)),
+        ("search_db.refresh purge", expired_deletions_queryset(now - timedelta(days=30))),
+        # Отпечаток — агрегат по тем же строкам; план QuerySet.aggregate() не строится
+        ("faq_db._get_fingerprint", active_entries_queryset().order_by().values_list("id", "updated_at")),
+        ("faq_db._load_entries", active_entries_queryset().values_list("question", "answer")),
+        ("fsm_storage.load", _first(record_queryset("fsm:1", now))),
+        ("fsm_storage.purge_expired", expired_records_queryset(now)),
+    ]
+
+
+def explain(query: PlanQuery) -> str:
+    """
+    Возвращает план запроса в текстовом виде
+
+    План строится в транзакции: запросы с select_for_update() вне неё не
+    выполняются. EXPLAIN без ANALYZE не выполняет сам запрос, поэтому
+    INSERT и блокировки данные не меняют.
+    """
+    if isinstance(query, QuerySet):
+        with transaction.atomic():
+            return query.explain()
+
+    sql, params = query
+    prefix = "EXPLAIN QUERY PLAN " if connection.vendor == "sqlite" else "EXPLAIN "
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(prefix + sql, params)
+        return "\n".join(" ".join(str(value) for value in row) for row in cursor.fetchall())
+
+
+def find_seq_scans(plan: str) -> List[str]:
+    """
+    Ищет в плане полные просмотры таблиц
+
+    Args:
+        plan: план запроса (explain())
+
+    Returns:
+        List[str]: таблицы, которые читаются целиком
+    """
+    pattern = SEQ_SCAN_PATTERNS.get(connection.vendor)
+    if pattern is None:
+        raise ValueError(f"Проверка планов не поддерживается для БД {connection.vendor}")
+    return [match.group(1) for line in plan.splitlines() for match in pattern.finditer(line)]
+
+
+def disable_seq_scans() -> None:
+    """
+    Запрещает PostgreSQL выбирать полный просмотр, если есть подходящий индекс
+
+    На небольшой тестовой выборке планировщику выгоднее читать таблицу
+    целиком, и Seq Scan в плане остаётся только там, где индекса нет.
+    """
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("SET enable_seqscan = off")
@@ -0,0 +1,180 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional, Set, Tuple
+
+from django.db.models import Max, QuerySet
+from django.utils import timezone
+
+from django_app.products.models import Product
+from bot.database.catalog_cache import catalog_cache
+from bot.database.executor import database_sync_to_async
+from bot.logging_config import logger
+from bot.models import DeletedProduct
+from bot.text_index import SearchDocument, TextIndex
+
+
+DESCRIPTION_PREVIEW_LENGTH = 100  # Длина описания в результатах поиска
+LOAD_CHUNK_SIZE = 2000  # Размер порции при загрузке товаров из БД
+
+PRODUCT_FIELDS = ("id", "name", "description", "price", "image_file_id", "updated_at")
+# Сколько хранятся записи об удалённых товарах. Индекс, не обновлявшийся
+# дольше, строится заново: часть записей об удалениях уже могла быть удалена
+DELETED_PRODUCTS_TTL = 30 * 24 * 3600
+
+
+def _make_document(row: tuple) -> Tuple[SearchDocument, str]:
+    """Формирует документ индекса из строки товара"""
+    product_id, name, description, price, image_file_id, _ = row
+    description = description or ""
+    preview = description[:DESCRIPTION_PREVIEW_LENGTH]
+    return SearchDocument(product_id, name, preview, str(price), image_file_id), description
+
+
+def _last_deletion_id() -> int:
+    """Возвращает ID последней записи об удалённом товаре (0, если записей нет)"""
+    return DeletedProduct.objects.aggregate(last=Max("id"))["last"] or 0
+
+
+def changed_products_queryset(since: datetime) -> QuerySet:
+    """Запрос товаров, изменённых не раньше since, вместе с ID подкатегории"""
+    return Product.objects.filter(updated_at__gte=since).values_list(*PRODUCT_FIELDS, "category_id")
+
+
+def deletions_queryset(deleted_after: int) -> QuerySet:
+    """Запрос записей об удалённых товарах после deleted_after"""
+    return DeletedProduct.objects.filter(id__gt=deleted_after).values_list("id", "product_id")
+
+
+def expired_deletions_queryset(before: datetime) -> QuerySet:
+    """Запрос записей об удалённых товарах старше before"""
+    return DeletedProduct.objects.filter(deleted_at__lt=before)
+
+
+def _build_index() -> Tuple[TextIndex, Optional[datetime], int]:
+    """
+    Строит индекс по всем товарам каталога
+
+    Returns:
+        Tuple[TextIndex, Optional[datetime], int]: индекс, время последнего изменения
+            товаров и ID последней записи об удалённом товаре
+    """
+    # Удаления, случившиеся во время загрузки, будут применены повторно — это безопасно
+    deleted_after = _last_deletion_id()
+    index, updated_at = TextIndex(), None
+    products = Product.objects.filter(category__isnull=False).values_list(*PRODUCT_FIELDS)
+    for row in products.iterator(chunk_size=LOAD_CHUNK_SIZE):
+        index.add(*_make_document(row))
+        updated_at = max(updated_at, row[-1]) if updated_at else row[-1]
+    return index, updated_at, deleted_after
+
+
+def _load_changes(since: datetime, deleted_after: int) -> Tuple[List[tuple], Set[int], int]:
+    """
+    Загружает изменения каталога после последнего обновления индекса
+
+    Товары, изменённые после since, читаются по индексу updated_at; те из них,
+    у которых больше нет подкатегории, убираются из индекса. Удалённые товары
+    берутся из записей DeletedProduct после deleted_after, поэтому объём
+    работы зависит от количества изменений, а не от размера каталога.
+    Заодно удаляются записи об удалениях старше DELETED_PRODUCTS_TTL.
+
+    Args:
+        since: время последнего известного изменения товаров
+        deleted_after: ID последней известной записи об удалённом товаре
+
+    Returns:
+        Tuple[List[tuple], Set[int], int]: изменённые товары каталога, ID товаров,
+            которые нужно убрать из индекса, и ID последней записи об удалённом товаре
+    """
+    rows = list(changed_products_queryset(since))
+    removed = {row[0] for row in rows if row[-1] is None}
+    deletions = list(deletions_queryset(deleted_after))
+    removed.update(product_id for _, product_id in deletions)
+    expired_deletions_queryset(timezone.now() - timedelta(seconds=DELETED_PRODUCTS_TTL)).delete()
+    changed = [row[:-1] for row in rows if row[-1] is not None]
+    return changed, removed, max((deletion_id for deletion_id, _ in deletions), default=deleted_after)
+
+
+class ProductSearch:
+    """
+    Поиск товаров по индексу в памяти процесса
+
+    Индекс строится целиком при запуске в отдельном потоке и затем
+    обновляется инкрементально: когда меняется версия каталога, из БД
+    загружаются только товары с updated_at не раньше последнего известного
+    изменения и новые записи об удалённых товарах (DeletedProduct).
+    """
+
+    def __init__(self):
+        self.index = TextIndex()
+        self.version: Optional[int] = None
+        self.updated_at: Optional[datetime] = None
+        self.deleted_after = 0
+        self.synced_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def sync(self) -> None:
+        """Обновляет индекс, если каталог изменился"""
+        version = await catalog_cache.aget_version()
+        if version == self.version:
+            return
+
+        async with self._lock:
+            if version == self.version:
+                return
+            stale = time.monotonic() - self.synced_at > DELETED_PRODUCTS_TTL
+            if self.version is None or self.updated_at is None or stale:
+                try:
+                    self.index, self.updated_at, self.deleted_after = await database_sync_to_async(_build_index)()
+                except Exception as e:
+                    logger.error("Ошибка построения поискового индекса: %s", e)
+                    return
+                self.version = version
+                self.synced_at = time.monotonic()
+                logger.info("Поисковый индекс построен: %s товаров", len(self.index))
+                return
+
+            try:
+                rows, removed, deleted_after = await database_sync_to_async(_load_changes)(
+                    self.updated_at, self.deleted_after
+                )
+            except Exception as e:
+                logger.error("Ошибка обновления поискового индекса: %s", e)
+                return
+
+            # Изменения применяются в потоке event loop, где выполняется поиск
+            self.index.extend(_make_document(row) for row in rows)
+            for product_id in removed:
+                self.index.remove(product_id)
+            if rows:
+                latest = max(row[-1] for row in rows)
+                self.updated_at = max(self.updated_at, latest) if self.updated_at else latest
+            self.deleted_after = deleted_after
+            self.version = version
+            self.synced_at = time.monotonic()
+            logger.info("Поисковый индекс обновлён: изменено %s, всего %s товаров", len(rows), len(self.index))
+
+    async def search(self, query: str, offset: int = 0, limit: int = 10) -> Tuple[List[SearchDocument], int]:
+        """
+        Ищет товары по запросу
+
+        Args:
+            query: текст запроса
+            offset: сколько лучших результатов пропустить
+            limit: количество результатов
+
+        Returns:
+            Tuple[List[SearchDocument], int]: товары страницы и общее количество найденных
+        """
+        await self.sync()
+        return self.index.search(query, offset, limit)
+
+    def set_file_id(self, product_id: int, file_id: str) -> None:
+        """Обновляет file_id фото товара в индексе"""
+        document = self.index.documents.get(product_id)
+        if document is not None:
+            self.index.documents[product_id] = document._replace(image_file_id=file_id)
+
+
+product_search = ProductSearch()
@@ -0,0 +1,82 @@
+from aiogram import Dispatcher
+from aiogram.fsm.storage.base import BaseStorage
+
+from bot.handlers.search import router as search_router
+from bot.handlers.start import router as start_router
+from bot.handlers.catalog import router as catalog_router
+from bot.handlers.cart import router as cart_router
+from bot.handlers.order import router as order_router
+from bot.handlers.payment import router as payment_router
+from bot.handlers.faq import router as faq_router
+from bot.handlers.fallback import router as fallback_router
+from bot.middlewares.identity import IdentityMiddleware
+from bot.middlewares.callback_data import CallbackDataMiddleware
+from bot.middlewares.subscription import SubscriptionMiddleware
+from bot.middlewares.metrics import HandlerNameMiddleware, UpdateMetricsMiddleware, install_api_metrics
+from bot.middlewares.rate_limit import install_rate_limiter
+from bot.metrics import metrics, metrics_server
+from bot.fsm_storage import InMemoryFSMBackend, WriteBehindStorage
+from bot.excel import order_exporter
+from bot.database.search_db import product_search
+from bot.database.faq_db import faq_engine
+from bot.kbds.catalog_kbds import warm_keyboard_cache
+from bot.subscription import membership_checker
+from bot.config import FSM_CACHE_SIZE, FSM_STORAGE, FSM_TTL, SUBSCRIPTION_CHECK
+
+
+def create_storage() -> BaseStorage:
+    """
+    Создаёт хранилище FSM согласно настройке FSM_STORAGE
+
+    Returns:
+        BaseStorage: хранилище в БД ("db") или в памяти процесса ("memory")
+    """
+    if FSM_STORAGE == "memory":
+        return WriteBehindStorage(InMemoryFSMBackend(), ttl=FSM_TTL, cache_size=FSM_CACHE_SIZE)
+    return WriteBehindStorage(ttl=FSM_TTL, cache_size=FSM_CACHE_SIZE)
+
+
+def create_dispatcher(storage: BaseStorage = None) -> Dispatcher:
+    """
+    Создаёт диспетчер с middleware и роутерами бота
+
+    Args:
+        storage: хранилище FSM (по умолчанию создаётся согласно настройкам)
+
+    Returns:
+        Dispatcher: настроенный диспетчер
+    """
+    dp = Dispatcher(storage=storage or create_storage())
+    # Метрики первыми, чтобы учитывать запросы к БД остальных middleware
+    dp.update.outer_middleware(UpdateMetricsMiddleware(metrics))
+    dp.update.outer_middleware(IdentityMiddleware())
+    dp.callback_query.outer_middleware(CallbackDataMiddleware())
+    for observer in (dp.message, dp.callback_query, dp.inline_query, dp.pre_checkout_query):
+        observer.middleware(HandlerNameMiddleware())
+    # Ограничитель раньше метрик: в метрики запросов не попадает ожидание в очереди
+    dp.startup.register(install_rate_limiter)
+    dp.startup.register(install_api_metrics)
+    dp.startup.register(metrics_server.start)
+    dp.startup.register(order_exporter.start)
+    dp.startup.register(warm_keyboard_cache)
+    dp.startup.register(product_search.sync)
+    dp.startup.register(faq_engine.refresh)
+
+    if SUBSCRIPTION_CHECK:
+        dp.startup.register(membership_checker.resolve)
+        dp.message.middleware(SubscriptionMiddleware(membership_checker))
+        dp.callback_query.middleware(SubscriptionMiddleware(membership_checker))
+    dp.shutdown.register(order_exporter.stop)
+    dp.shutdown.register(metrics_server.stop)
+
+    # Поиск раньше start: он обрабатывает /start со ссылкой на товар и инлайн-запросы с #
+    dp.include_router(search_router)
+    dp.include_router(start_router)
+    dp.include_router(catalog_router)
+    dp.include_router(cart_router)
+    dp.include_router(order_router)
+    dp.include_router(payment_router)
+    dp.include_router(faq_router)
+    # Последним: отвечает на нажатия кнопок, не подошедшие ни одному обработчику
+    dp.include_router(fallback_router)
+    return dp
@@ -1,46 +1,245 @@
-import pandas as pd
 import asyncio
+import csv
+import fcntl
 import os
-import logging
+import threading
+from datetime import date, datetime
+from typing import Iterable, List, Optional, Sequence
+
+from django.db.models import QuerySet
+from django.utils import timezone
 
 from django_app.clients.models import Order
+from bot.config import EXCEL_FILE
+from bot.database.executor import database_sync_to_async
+from bot.logging_config import logger
+
+
+EXPORT_FILE = EXCEL_FILE or "orders.csv"  # Базовое имя файла выгрузки
+MAX_FILE_SIZE = 10 * 1024 * 1024  # Размер файла, после которого начинается новый
+FLUSH_INTERVAL = 2  # Максимальная задержка записи заказа в секундах
+BATCH_SIZE = 100  # Максимальное количество заказов в одной записи
+EXPORT_CHUNK_SIZE = 2000  # Размер порции при выгрузке заказов из БД
+
+HEADER = ["ID заказа", "ФИО", "Телефон", "Адрес", "Сумма", "Дата"]
+ORDER_FIELDS = ["id", "full_name", "phone", "address", "total_price", "created_at"]
+
+_file_lock = threading.Lock()
+
+
+def order_rows_queryset(order_ids: List[int]) -> QuerySet:
+    """Запрос строк выгрузки заказов по ID"""
+    return Order.objects.filter(id__in=order_ids).order_by("id").values_list(*ORDER_FIELDS)
+
+
+def orders_between_queryset(start: datetime, end: datetime) -> QuerySet:
+    """Запрос строк выгрузки заказов за период [start, end) в порядке оформления"""
+    return (
+        Order.objects.filter(created_at__gte=start, created_at__lt=end)
+        .order_by("created_at", "id")
+        .values_list(*ORDER_FIELDS)
+    )
+
+
+def format_row(row: Sequence) -> list:
+    """Преобразует значения заказа в строку выгрузки"""
+    *values, created_at = row
+    return [*values, timezone.localtime(created_at).strftime("%Y-%m-%d %H:%M")]
+
 
+def get_export_path(base_path: str = EXPORT_FILE, day: Optional[date] = None, max_size: int = MAX_FILE_SIZE) -> str:
+    """
+    Возвращает путь к текущему файлу выгрузки
+
+    Файлы ротируются по дате (orders-2025-03-20.csv), а при превышении
+    max_size в пределах дня — по номеру части (orders-2025-03-20-1.csv).
+
+    Args:
+        base_path: базовое имя файла
+        day: дата выгрузки (по умолчанию сегодня)
+        max_size: максимальный размер файла в байтах
+
+    Returns:
+        str: путь к файлу
+    """
+    stem, _ = os.path.splitext(base_path)
+    prefix = f"{stem}-{(day or timezone.localdate()).isoformat()}"
+    path, part = f"{prefix}.csv", 0
+    while os.path.exists(path) and os.path.getsize(path) >= max_size:
+        part += 1
+        path = f"{prefix}-{part}.csv"
+    return path
+
+
+def append_rows(rows: List[list], base_path: str = EXPORT_FILE) -> str:
+    """
+    Дописывает строки в текущий файл выгрузки
+
+    Запись защищена блокировкой внутри процесса и flock между процессами,
+    заголовок пишется только в пустой файл.
+
+    Args:
+        rows: строки для записи
+        base_path: базовое имя файла
+
+    Returns:
+        str: путь к файлу, в который записаны строки
+    """
+    with _file_lock:
+        path = get_export_path(base_path)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, mode="a", encoding="utf-8-sig", newline="") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                writer = csv.writer(f)
+                if f.tell() == 0:
+                    writer.writerow(HEADER)
+                writer.writerows(rows)
+                f.flush()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+    return path
 
-EXCEL_FILE = "orders.xlsx"
 
-async def save_order_to_excel(order_id: int) -> None:
+class OrderExporter:
     """
-    Асинхронно получает данные заказа из базы данных и записывает их в Excel.
-    :param order_id: ID заказа
+    Фоновая выгрузка оплаченных заказов в файл
+
+    Заказы ставятся в очередь без ожидания, а фоновая задача собирает их в
+    пакеты, загружает одним запросом и дописывает в файл в отдельном потоке.
     """
-    try:
-        # Асинхронный запрос к базе данных для получения заказа
-        order = await Order.objects.aget(id=order_id)
 
-        if not order:
-            logging.warning(f"Заказ с ID {order_id} не найден.")
+    def __init__(self, base_path: str = EXPORT_FILE, batch_size: int = BATCH_SIZE, flush_interval: float = FLUSH_INTERVAL):
+        """
+        Инициализация выгрузки
+
+        Args:
+            base_path: базовое имя файла выгрузки
+            batch_size: максимальное количество заказов в одной записи
+            flush_interval: максимальная задержка записи в секундах
+        """
+        self.base_path = base_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: Optional[asyncio.Queue] = None
+        self._pending: List[int] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def enqueue(self, order_id: int) -> None:
+        """Ставит заказ в очередь на выгрузку"""
+        if self._queue is None:
+            self._pending.append(order_id)
+        else:
+            self._queue.put_nowait(order_id)
+
+    async def start(self) -> None:
+        """Запускает фоновую задачу выгрузки"""
+        if self._task is not None:
+            return
+        self._queue = asyncio.Queue()
+        for order_id in self._pending:
+            self._queue.put_nowait(order_id)
+        self._pending.clear()
+        self._task = asyncio.create_task(self._run())
+        logger.info("Выгрузка заказов запущена, файл %s", self.base_path)
+
+    async def stop(self) -> None:
+        """Записывает оставшиеся заказы и останавливает фоновую задачу"""
+        if self._task is None:
             return
+        await self._queue.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._queue = None
+
+    async def _run(self) -> None:
+        """Собирает заказы из очереди в пакеты и записывает их"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await self._write_batch(batch)
+            except Exception as e:
+                logger.error("Ошибка при выгрузке заказов %s: %s", batch, e)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _write_batch(self, order_ids: List[int]) -> None:
+        """Загружает заказы одним запросом и дописывает их в файл"""
+        rows = await database_sync_to_async(list)(order_rows_queryset(order_ids))
+        if len(rows) < len(order_ids):
+            found = {row[0] for row in rows}
+            logger.warning("Заказы не найдены: %s", [i for i in order_ids if i not in found])
+        if not rows:
+            return
+        path = await asyncio.to_thread(append_rows, [format_row(row) for row in rows], self.base_path)
+        logger.info("Записано %s заказов в %s", len(rows), path)
+
+
+order_exporter = OrderExporter()
+
+
+def iter_orders(start: datetime, end: datetime) -> Iterable[list]:
+    """
+    Построчно читает заказы за период из БД, не загружая их в память целиком
+
+    Args:
+        start: начало периода (включительно)
+        end: конец периода (не включительно)
+
+    Yields:
+        list: строка выгрузки
+    """
+    for row in orders_between_queryset(start, end).iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield format_row(row)
+
+
+def export_orders(start: datetime, end: datetime, path: str) -> int:
+    """
+    Выгружает заказы за период в файл CSV или XLSX
+
+    Args:
+        start: начало периода (включительно)
+        end: конец периода (не включительно)
+        path: путь к файлу; формат определяется расширением (.csv или .xlsx)
+
+    Returns:
+        int: количество выгруженных заказов
+    """
+    count = 0
+    if path.endswith(".xlsx"):
+        from openpyxl import Workbook
+
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet("Заказы")
+        sheet.append(HEADER)
+        for row in iter_orders(start, end):
+            sheet.append(row)
+            count += 1
+        workbook.save(path)
+    else:
+        with open(path, mode="w", encoding="utf-8-sig", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(HEADER)
+            for row in iter_orders(start, end):
+                writer.writerow(row)
+                count += 1
 
-        # Подготовка данных для записи
-        data = {
-            "ID заказа": [order.id],
-            "ФИО": [order.full_name],
-            "Телефон": [order.phone],
-            "Адрес": [order.address],
-            "Сумма": [order.total_price],
-            "Дата": [order.created_at.strftime("%Y-%m-%d %H:%M")],
-        }
-
-        df = pd.DataFrame(data)
-        file_exists = os.path.exists(EXCEL_FILE)
-
-        # Функция синхронной записи данных в файл
-        def write_to_excel():
-            with open(EXCEL_FILE, mode="a", encoding="utf-8-sig") as f:
-                df.to_csv(f, header=not file_exists, index=False, encoding="utf-8-sig")
-
-        # Асинхронный запуск синхронной операции через asyncio.to_thread
-        await asyncio.to_thread(write_to_excel)
-        logging.info(f"Заказ {order_id} успешно записан в {EXCEL_FILE}.")
-    except Exception as e:
-        logging.error(f"Ошибка при сохранении заказа {order_id} в Excel: {e}")
+    logger.info("Выгружено %s заказов в %s", count, path)
+    return count
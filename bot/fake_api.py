@@ -0,0 +1,190 @@
+import asyncio
+import itertools
+import json
+import math
+import random
+import time
+from collections import Counter
+from typing import Any, AsyncGenerator, Dict, Optional
+
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiogram.types import InlineKeyboardMarkup
+
+from bot.rate_limit import RateLimiter, classify_request
+
+
+FAKE_BOT_USER = {"id": 1, "is_bot": True, "first_name": "Fake", "username": "fake_bot"}
+
+# Методы, которые возвращают отправленное или изменённое сообщение
+MESSAGE_METHODS = {
+    "sendMessage", "sendPhoto", "sendInvoice", "sendDocument",
+    "editMessageText", "editMessageCaption", "editMessageReplyMarkup", "editMessageMedia",
+}
+
+
+class FakeTelegramSession(BaseSession):
+    """
+    Сессия бота, отвечающая на запросы к Bot API локально, без обращения к Telegram
+
+    Ответы формируются в формате Bot API и проходят через стандартную проверку
+    ответа aiogram, поэтому обработчики получают те же типы, что и в работе.
+    Используется для запуска бота на искусственных апдейтах и нагрузочных тестов.
+
+    Флуд-контроль Telegram эмулируется ответами 429 с retry_after: при
+    превышении лимитов flood_limiter и (для проверки повторов) случайно с
+    вероятностью flood_rate.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        flood_limiter: Optional[RateLimiter] = None,
+        flood_rate: float = 0.0,
+        retry_after: int = 1,
+        seed: Optional[int] = None,
+        **kwargs: Any
+    ):
+        """
+        Инициализация сессии
+
+        Args:
+            latency: искусственная задержка ответа в секундах
+            flood_limiter: лимиты, при превышении которых возвращается 429
+            flood_rate: вероятность ответа 429 на ограничиваемый запрос
+            retry_after: retry_after случайных ответов 429 в секундах
+            seed: начальное значение генератора случайных отказов
+        """
+        super().__init__(**kwargs)
+        self.latency = latency
+        self.flood_limiter = flood_limiter
+        self.flood_rate = flood_rate
+        self.retry_after = retry_after
+        self.flood_errors = 0
+        self._random = random.Random(seed)
+        self.calls: Counter = Counter()
+        # Статусы участников чатов для getChatMember: (chat_id, user_id) -> статус
+        # (member, creator, restricted, left или kicked)
+        self.member_statuses: Dict[tuple, str] = {}
+        # Последняя инлайн-клавиатура и последний payload инвойса в каждом чате
+        self.reply_markups: Dict[int, InlineKeyboardMarkup] = {}
+        self.invoices: Dict[int, str] = {}
+        self._message_ids = itertools.count(1)
+
+    async def make_request(
+        self, bot: Bot, method: TelegramMethod[TelegramType], timeout: Optional[int] = None
+    ) -> TelegramType:
+        api_method = method.__api_method__
+        self.calls[api_method] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        status_code, payload = self.flood_response(method) or self.build_response(api_method, method)
+        response = self.check_response(
+            bot=bot, method=method, status_code=status_code, content=json.dumps(payload)
+        )
+        return response.result
+
+    def flood_response(self, method: TelegramMethod) -> Optional[tuple]:
+        """Возвращает ответ 429, если запрос не проходит флуд-контроль, иначе None"""
+        chat_id, priority = classify_request(method)
+        if priority is None:
+            return None
+
+        retry_after = self.flood_limiter.try_acquire(chat_id) if self.flood_limiter is not None else 0.0
+        if not retry_after and self.flood_rate and self._random.random() < self.flood_rate:
+            retry_after = self.retry_after
+        if not retry_after:
+            return None
+
+        self.flood_errors += 1
+        seconds = max(1, math.ceil(retry_after))
+        return 429, {
+            "ok": False, "error_code": 429,
+            "description": f"Too Many Requests: retry after {seconds}",
+            "parameters": {"retry_after": seconds},
+        }
+
+    def build_response(self, api_method: str, method: TelegramMethod) -> tuple:
+        """
+        Формирует ответ Bot API на запрос
+
+        Returns:
+            tuple: HTTP-статус и тело ответа
+        """
+        return 200, {"ok": True, "result": self.build_result(api_method, method)}
+
+    def build_result(self, api_method: str, method: TelegramMethod) -> Any:
+        """Формирует поле result ответа для метода Bot API"""
+        chat_id = self._chat_id(method)
+
+        if api_method in MESSAGE_METHODS:
+            message: Dict[str, Any] = {
+                "message_id": getattr(method, "message_id", None) or next(self._message_ids),
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+            }
+            if api_method == "sendPhoto":
+                file_id = getattr(method, "photo", None)
+                message["photo"] = [{
+                    "file_id": file_id if isinstance(file_id, str) else f"fake_photo_{message['message_id']}",
+                    "file_unique_id": f"fake_unique_{message['message_id']}",
+                    "width": 1,
+                    "height": 1,
+                }]
+            elif getattr(method, "text", None):
+                message["text"] = method.text
+            reply_markup = getattr(method, "reply_markup", None)
+            if isinstance(reply_markup, InlineKeyboardMarkup):
+                self.reply_markups[chat_id] = reply_markup
+            if api_method == "sendInvoice":
+                self.invoices[chat_id] = method.payload
+            return message
+        if api_method == "getMe":
+            return FAKE_BOT_USER
+        if api_method == "getChat":
+            return {
+                "id": chat_id, "type": "supergroup", "title": "Fake chat",
+                "accent_color_id": 0, "max_reaction_count": 0,
+            }
+        if api_method == "getChatMember":
+            user_id = getattr(method, "user_id", 0)
+            status = self.member_statuses.get((chat_id, user_id), "member")
+            member = {"status": status, "user": {"id": user_id, "is_bot": False, "first_name": "User"}}
+            if status == "restricted":
+                member.update({
+                    "is_member": False, "can_send_messages": False, "can_send_audios": False,
+                    "can_send_documents": False, "can_send_photos": False, "can_send_videos": False,
+                    "can_send_video_notes": False, "can_send_voice_notes": False, "can_send_polls": False,
+                    "can_send_other_messages": False, "can_add_web_page_previews": False,
+                    "can_change_info": False, "can_invite_users": False, "can_pin_messages": False,
+                    "can_manage_topics": False, "until_date": 0,
+                })
+            elif status == "kicked":
+                member["until_date"] = 0
+            elif status == "creator":
+                member["is_anonymous"] = False
+            return member
+        if api_method == "getUpdates":
+            return []
+        return True
+
+    @staticmethod
+    def _chat_id(method: TelegramMethod) -> int:
+        """Возвращает ID чата из запроса, если он числовой"""
+        chat_id = getattr(method, "chat_id", None)
+        try:
+            return int(chat_id)
+        except (TypeError, ValueError):
+            return 0
+
+    async def stream_content(
+        self, url: str, headers: Optional[Dict[str, Any]] = None, timeout: int = 30,
+        chunk_size: int = 65536, raise_for_status: bool = True
+    ) -> AsyncGenerator[bytes, None]:
+        yield b""
+
+    async def close(self) -> None:
+        pass
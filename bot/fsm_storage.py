@@ -0,0 +1,265 @@
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+from bot.cache import LRUCache
+from bot.database.executor import database_sync_to_async
+from bot.logging_config import logger
+
+
+FSM_TTL = 24 * 3600  # Время жизни незавершённого состояния в секундах
+FSM_CACHE_SIZE = 100_000  # Количество состояний, которые хранятся в памяти процесса
+FLUSH_INTERVAL = 0.5  # Период записи изменений в хранилище в секундах
+FLUSH_BATCH_SIZE = 500  # Количество изменений, при котором запись начинается сразу
+PURGE_INTERVAL = 600  # Период удаления устаревших записей из хранилища в секундах
+
+
+def make_record_key(key: StorageKey) -> str:
+    """Формирует строковый ключ записи из ключа хранилища aiogram"""
+    return ":".join(
+        "" if part is None else str(part)
+        for part in (
+            key.bot_id, key.chat_id, key.user_id,
+            key.thread_id, key.business_connection_id, key.destiny
+        )
+    )
+
+
+def encode_record(state: Optional[str], data: Dict[str, Any]) -> bytes:
+    """Сериализует состояние и данные в компактный JSON"""
+    record = {"s": state} if not data else {"s": state, "d": data}
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def decode_record(payload: bytes) -> Tuple[Optional[str], Dict[str, Any]]:
+    """Восстанавливает состояние и данные из сериализованной записи"""
+    record = json.loads(payload)
+    return record.get("s"), record.get("d", {})
+
+
+class InMemoryFSMBackend:
+    """Хранилище записей FSM в памяти процесса (для тестов и локальной разработки)"""
+
+    def __init__(self):
+        self.records: Dict[str, Tuple[bytes, datetime]] = {}
+
+    async def load(self, record_key: str) -> Optional[bytes]:
+        """Возвращает запись или None, если её нет или она устарела"""
+        record = self.records.get(record_key)
+        if record is None or record[1] <= datetime.now(timezone.utc):
+            return None
+        return record[0]
+
+    async def save_many(self, records: Dict[str, Optional[bytes]], expires_at: datetime) -> None:
+        """Сохраняет записи; None означает удаление записи"""
+        for record_key, payload in records.items():
+            if payload is None:
+                self.records.pop(record_key, None)
+            else:
+                self.records[record_key] = (payload, expires_at)
+
+    async def purge_expired(self) -> int:
+        """Удаляет устаревшие записи"""
+        now = datetime.now(timezone.utc)
+        expired = [k for k, (_, expires_at) in self.records.items() if expires_at <= now]
+        for record_key in expired:
+            del self.records[record_key]
+        return len(expired)
+
+
+def record_queryset(record_key: str, now: datetime):
+    """Запрос содержимого неустаревшей записи FSM"""
+    from bot.models import FSMRecord
+
+    return FSMRecord.objects.filter(key=record_key, expires_at__gt=now).values_list("payload", flat=True)
+
+
+def expired_records_queryset(now: datetime):
+    """Запрос устаревших записей FSM"""
+    from bot.models import FSMRecord
+
+    return FSMRecord.objects.filter(expires_at__lte=now)
+
+
+class DjangoFSMBackend:
+    """Хранилище записей FSM в БД проекта (PostgreSQL или SQLite) через Django ORM"""
+
+    @database_sync_to_async
+    def load(self, record_key: str) -> Optional[bytes]:
+        """Возвращает запись или None, если её нет или она устарела"""
+        payload = record_queryset(record_key, datetime.now(timezone.utc)).first()
+        return bytes(payload) if payload is not None else None
+
+    @database_sync_to_async
+    def save_many(self, records: Dict[str, Optional[bytes]], expires_at: datetime) -> None:
+        """Сохраняет записи одним запросом; None означает удаление записи"""
+        from django.db import transaction
+        from bot.models import FSMRecord
+
+        deleted = [record_key for record_key, payload in records.items() if payload is None]
+        saved = [
+            FSMRecord(key=record_key, payload=payload, expires_at=expires_at)
+            for record_key, payload in records.items()
+            if payload is not None
+        ]
+        with transaction.atomic():
+            if deleted:
+                FSMRecord.objects.filter(key__in=deleted).delete()
+            if saved:
+                FSMRecord.objects.bulk_create(
+                    saved,
+                    update_conflicts=True,
+                    unique_fields=["key"],
+                    update_fields=["payload", "expires_at"]
+                )
+
+    @database_sync_to_async
+    def purge_expired(self) -> int:
+        """Удаляет устаревшие записи"""
+        deleted, _ = expired_records_queryset(datetime.now(timezone.utc)).delete()
+        return deleted
+
+
+class WriteBehindStorage(BaseStorage):
+    """
+    Хранилище FSM с отложенной пакетной записью
+
+    Состояния читаются и изменяются в памяти процесса, а изменения
+    записываются в хранилище пакетами в фоне. Незавершённые состояния
+    удаляются через ttl секунд после последнего изменения.
+
+    В памяти хранится не больше cache_size последних записей (LRU), включая
+    пустые, чтобы не обращаться к хранилищу на каждом апдейте. Изменения,
+    ещё не записанные в хранилище, хранятся отдельно и не вытесняются.
+
+    Кэш в памяти согласован, пока апдейты одного чата обрабатывает один
+    процесс (режимы polling, вебхука и супервизора это обеспечивают).
+    """
+
+    def __init__(
+        self,
+        backend=None,
+        ttl: int = FSM_TTL,
+        cache_size: int = FSM_CACHE_SIZE,
+        flush_interval: float = FLUSH_INTERVAL,
+        batch_size: int = FLUSH_BATCH_SIZE
+    ):
+        """
+        Инициализация хранилища
+
+        Args:
+            backend: хранилище записей (по умолчанию — БД проекта)
+            ttl: время жизни незавершённого состояния в секундах
+            cache_size: количество состояний в памяти процесса
+            flush_interval: период записи изменений в секундах
+            batch_size: количество изменений, при котором запись начинается сразу
+        """
+        self.backend = backend or DjangoFSMBackend()
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._records = LRUCache(cache_size, ttl)
+        self._dirty: Dict[str, Tuple[Optional[str], Dict[str, Any]]] = {}
+        self._flushing: Dict[str, Tuple[Optional[str], Dict[str, Any]]] = {}
+        self._flush_event: Optional[asyncio.Event] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._closing = False
+        self._last_purge = time.monotonic()
+
+    async def _get_record(self, key: StorageKey) -> Tuple[Optional[str], Dict[str, Any]]:
+        """Возвращает состояние и данные, загружая их из хранилища при необходимости"""
+        record_key = make_record_key(key)
+        # Незаписанные изменения могли быть вытеснены из кэша, но актуальнее хранилища
+        record = self._dirty.get(record_key) or self._flushing.get(record_key) or self._records.get(record_key)
+        if record is not None:
+            return record
+
+        # Пустые записи тоже кэшируются, чтобы не обращаться к хранилищу на каждом апдейте
+        payload = await self.backend.load(record_key)
+        record = decode_record(payload) if payload is not None else (None, {})
+        self._records.set(record_key, record)
+        return record
+
+    def _put_record(self, key: StorageKey, state: Optional[str], data: Dict[str, Any]) -> None:
+        """Сохраняет запись в памяти и помечает её для записи в хранилище"""
+        record_key = make_record_key(key)
+        record = (state, data)
+        self._records.set(record_key, record)
+        self._dirty[record_key] = record
+        self._schedule_flush()
+
+    def _schedule_flush(self) -> None:
+        """Запускает фоновую запись, если она ещё не запущена"""
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_event = asyncio.Event()
+            self._flush_task = asyncio.create_task(self._flush_loop())
+        if len(self._dirty) >= self.batch_size:
+            self._flush_event.set()
+
+    async def _flush_loop(self) -> None:
+        """Периодически записывает изменения в хранилище"""
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._flush_event.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_event.clear()
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Записывает все накопленные изменения в хранилище"""
+        if self._dirty:
+            dirty, self._dirty = self._dirty, {}
+            records = {
+                record_key: None if state is None and not data else encode_record(state, data)
+                for record_key, (state, data) in dirty.items()
+            }
+            expires_at = datetime.now(timezone.utc) + timedelta(seconds=self.ttl)
+            self._flushing = dirty
+            try:
+                await self.backend.save_many(records, expires_at)
+            except Exception as e:
+                logger.error("Ошибка записи %s состояний FSM: %s", len(records), e)
+                # Изменения, сделанные во время записи, новее неудавшихся
+                self._dirty = {**dirty, **self._dirty}
+                return
+            finally:
+                self._flushing = {}
+
+        if time.monotonic() - self._last_purge >= PURGE_INTERVAL:
+            self._last_purge = time.monotonic()
+            try:
+                purged = await self.backend.purge_expired()
+                if purged:
+                    logger.info("Удалено %s устаревших состояний FSM", purged)
+            except Exception as e:
+                logger.error("Ошибка удаления устаревших состояний FSM: %s", e)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        _, data = await self._get_record(key)
+        self._put_record(key, state.state if isinstance(state, State) else state, data)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        state, _ = await self._get_record(key)
+        return state
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        state, _ = await self._get_record(key)
+        self._put_record(key, state, data.copy())
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        _, data = await self._get_record(key)
+        return data.copy()
+
+    async def close(self) -> None:
+        self._closing = True
+        if self._flush_task is not None:
+            self._flush_event.set()
+            await self._flush_task
+            self._flush_task = None
+        await self.flush()
@@ -1,44 +1,259 @@
-from aiogram.filters.callback_data import CallbackData
+import string
+from typing import Any, ClassVar, Dict, Optional, Tuple, Type, get_origin, get_type_hints
 
+from aiogram.filters import Filter
+from aiogram.types import CallbackQuery
 
-class CategoryCallback(CallbackData, prefix="category"):
+
+SEPARATOR = ":"  # Разделитель полей в callback_data
+MAX_LENGTH = 64  # Ограничение Telegram на длину callback_data в байтах
+DIGITS = string.digits + string.ascii_lowercase  # Алфавит base36
+
+# Таблица коротких префиксов: префикс -> класс callback_data
+CALLBACKS: Dict[str, Type["CompactCallback"]] = {}
+
+
+def encode_int(value: Optional[int]) -> str:
+    """Кодирует целое число в base36 (None — пустая строка)"""
+    if value is None:
+        return ""
+    if value < 0:
+        return "-" + encode_int(-value)
+    if value < 36:
+        return DIGITS[value]
+    digits = []
+    while value:
+        value, rest = divmod(value, 36)
+        digits.append(DIGITS[rest])
+    return "".join(reversed(digits))
+
+
+def decode_int(value: str) -> Optional[int]:
+    """Декодирует число из base36 (пустая строка — None)"""
+    return int(value, 36) if value else None
+
+
+class CompactCallback:
+    """
+    Компактные callback_data: короткий префикс и целочисленные поля в base36
+
+    Поля объявляются аннотациями в подклассе, как в CallbackData aiogram:
+
+        class ProductCallback(CompactCallback, prefix="p"):
+            id: int | None = None
+
+    ProductCallback(id=1000).pack() == "p:rs". Пустые поля в конце не
+    передаются. Разбор выполняется один раз на апдейт (см.
+    CallbackDataMiddleware), а фильтры только сравнивают тип результата.
+    """
+
+    __prefix__: ClassVar[str]
+    __fields__: ClassVar[Tuple[str, ...]] = ()
+    __defaults__: ClassVar[Dict[str, Any]] = {}
+    __slots__ = ()
+
+    def __init_subclass__(cls, prefix: str, **kwargs: Any):
+        super().__init_subclass__(**kwargs)
+        if not prefix or SEPARATOR in prefix:
+            raise ValueError(f"Некорректный префикс callback_data: {prefix!r}")
+        if prefix in CALLBACKS:
+            raise ValueError(f"Префикс {prefix!r} уже занят {CALLBACKS[prefix].__name__}")
+
+        cls.__prefix__ = prefix
+        # get_type_hints учитывает поля базовых классов и отложенные аннотации
+        cls.__fields__ = tuple(
+            name for name, annotation in get_type_hints(cls).items()
+            if get_origin(annotation) is not ClassVar
+        )
+        cls.__defaults__ = {name: getattr(cls, name) for name in cls.__fields__ if hasattr(cls, name)}
+        CALLBACKS[prefix] = cls
+
+    def __init__(self, **kwargs: Any):
+        for name in self.__fields__:
+            if name in kwargs:
+                value = kwargs.pop(name)
+            elif name in self.__defaults__:
+                value = self.__defaults__[name]
+            else:
+                raise TypeError(f"{type(self).__name__}: не указано поле {name}")
+            object.__setattr__(self, name, value)
+        if kwargs:
+            raise TypeError(f"{type(self).__name__}: неизвестные поля {', '.join(kwargs)}")
+
+    def pack(self) -> str:
+        """
+        Упаковывает данные в строку callback_data
+
+        Returns:
+            str: строка не длиннее 64 байт
+        """
+        parts = [self.__prefix__, *(encode_int(getattr(self, name)) for name in self.__fields__)]
+        while len(parts) > 1 and not parts[-1]:
+            parts.pop()
+        value = SEPARATOR.join(parts)
+        if len(value.encode()) > MAX_LENGTH:
+            raise ValueError(f"callback_data длиннее {MAX_LENGTH} байт: {value}")
+        return value
+
+    @classmethod
+    def unpack(cls, value: str) -> "CompactCallback":
+        """
+        Распаковывает строку callback_data
+
+        Raises:
+            ValueError: если префикс не совпадает или поля некорректны
+        """
+        prefix, *parts = value.split(SEPARATOR)
+        if prefix != cls.__prefix__ or len(parts) > len(cls.__fields__):
+            raise ValueError(f"callback_data не относится к {cls.__name__}: {value}")
+        values = dict(zip(cls.__fields__, map(decode_int, parts)))
+        for name in cls.__fields__:
+            if values.get(name) is None and name not in cls.__defaults__:
+                raise ValueError(f"callback_data {value}: не указано поле {name}")
+        return cls(**{name: values.get(name) for name in cls.__fields__})
+
+    @classmethod
+    def filter(cls) -> "CallbackFilter":
+        """Возвращает фильтр, пропускающий callback этого типа"""
+        return CallbackFilter(cls)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"{type(self).__name__} нельзя изменять")
+
+    def __eq__(self, other: Any) -> bool:
+        return type(self) is type(other) and all(
+            getattr(self, name) == getattr(other, name) for name in self.__fields__
+        )
+
+    def __hash__(self) -> int:
+        return hash((self.__prefix__, *(getattr(self, name) for name in self.__fields__)))
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__fields__)
+        return f"{type(self).__name__}({fields})"
+
+
+def parse_callback_data(value: Optional[str]) -> Optional[CompactCallback]:
+    """
+    Разбирает callback_data по таблице префиксов
+
+    Args:
+        value: строка callback_data
+
+    Returns:
+        Optional[CompactCallback]: данные или None, если префикс неизвестен или данные некорректны
+    """
+    if not value:
+        return None
+    callback_class = CALLBACKS.get(value.partition(SEPARATOR)[0])
+    if callback_class is None:
+        return None
+    try:
+        return callback_class.unpack(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class CallbackFilter(Filter):
+    """
+    Фильтр по типу callback_data
+
+    Данные разбираются один раз в CallbackDataMiddleware, поэтому фильтр
+    только сравнивает тип. Без middleware данные разбираются здесь.
+    """
+
+    def __init__(self, callback_class: Type[CompactCallback]):
+        self.callback_class = callback_class
+
+    async def __call__(
+        self, query: CallbackQuery, callback_data: Optional[CompactCallback] = None
+    ) -> bool | Dict[str, Any]:
+        if type(callback_data) is self.callback_class:
+            return True
+        if callback_data is None:
+            parsed = parse_callback_data(query.data)
+            if type(parsed) is self.callback_class:
+                return {"callback_data": parsed}
+        return False
+
+
+class CategoryCallback(CompactCallback, prefix="c"):
     """Callback для категорий"""
     id: int | None = None  # None для навигации, int для выбора категории
-    page: int = 1
+    after: int | None = None  # Курсор следующей страницы
+    before: int | None = None  # Курсор предыдущей страницы
 
 
-class SubcategoryCallback(CallbackData, prefix="subcategory"):
+class SubcategoryCallback(CompactCallback, prefix="s"):
     """Callback для подкатегорий"""
     id: int | None = None  # None для навигации, int для выбора подкатегории
-    page: int = 1
+    after: int | None = None  # Курсор следующей страницы
+    before: int | None = None  # Курсор предыдущей страницы
     category_id: int | None = None  # ID родительской категории
 
 
-class ProductCallback(CallbackData, prefix="product"):
+class ProductCallback(CompactCallback, prefix="p"):
     """Callback для товаров"""
     id: int | None = None  # None для навигации, int для выбора товара
-    page: int = 1
+    after: int | None = None  # Курсор следующей страницы
+    before: int | None = None  # Курсор предыдущей страницы
     subcategory_id: int | None = None  # ID родительской подкатегории
+    category_id: int | None = None  # ID категории для возврата к подкатегориям со страниц 2+
+
+
+class ProductCardCallback(CompactCallback, prefix="g"):
+    """Возврат к кнопкам карточки товара"""
+    id: int
 
 
-class AddToCartCallback(CallbackData, prefix="add_to_cart"):
+class AddToCartCallback(CompactCallback, prefix="a"):
     id: int
 
 
-class SetQuantityCallback(CallbackData, prefix="set_quantity"):
+class SetQuantityCallback(CompactCallback, prefix="q"):
     id: int
     quantity: int
 
 
-class ConfirmAddCallback(CallbackData, prefix="confirm_add"):
+class ConfirmAddCallback(CompactCallback, prefix="k"):
     id: int
     quantity: int
 
 
-class RemoveFromCartCallback(CallbackData, prefix="remove"):
+class CartCallback(CompactCallback, prefix="b"):
+    """Показ корзины (обновляет сообщение корзины на месте)"""
+    version: int | None = None  # Версия корзины в показанном сообщении
+
+
+class ChangeQuantityCallback(CompactCallback, prefix="e"):
+    """Изменение количества товара в корзине кнопками +/−"""
+    id: int  # ID позиции корзины
+    delta: int
+    version: int | None = None
+
+
+class RemoveFromCartCallback(CompactCallback, prefix="r"):
     id: int
+    version: int | None = None
+
+
+class CheckoutCallback(CompactCallback, prefix="o"):
+    """Переход к оформлению заказа"""
+    version: int | None = None  # Версия корзины, которую видел пользователь
 
 
-class PaymentCallback(CallbackData, prefix="pay"):
+class CancelOrderCallback(CompactCallback, prefix="x"):
+    """Отмена оформления заказа"""
+
+
+class PaymentCallback(CompactCallback, prefix="y"):
+    order_id: int
+
+
+class CancelPaymentCallback(CompactCallback, prefix="n"):
     order_id: int
 
+
+class SearchPageCallback(CompactCallback, prefix="f"):
+    """Страница результатов поиска (запрос хранится в данных FSM)"""
+    offset: int = 0
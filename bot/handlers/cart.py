@@ -1,68 +1,173 @@
+from typing import Optional, Tuple
+
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
 from aiogram.utils.keyboard import InlineKeyboardMarkup, InlineKeyboardButton
 
 from bot.logging_config import logger
-from bot.database.cart_db import get_cart_items, remove_from_cart
-from bot.handlers.callback import RemoveFromCartCallback
+from bot.database.cart_db import CartSnapshot, change_cart_item, get_cart
+from bot.database.identity_db import Identity
+from bot.handlers.callback import CartCallback, ChangeQuantityCallback, CheckoutCallback, RemoveFromCartCallback
+from bot.message_edit import edit_message
 
 
 router = Router()
 
+EMPTY_CART_TEXT = "🛒 Ваша корзина пуста."
 
-@router.message(F.text == "🛒 Корзина")
-async def cart_handler(message: Message):
-    """Отправляет список товаров в корзине"""
-    user_id = message.from_user.id
-    try:
-        cart_items = await get_cart_items(user_id)
-        logger.info(f"Корзина пользователя {user_id}: {cart_items}")
-    except Exception as e:
-        logger.error(f"Ошибка получения корзины для пользователя {user_id}: {e}")
-        await message.answer("Произошла ошибка при получении корзины. Попробуйте позже.")
-        return
 
-    if not cart_items:
-        await message.answer("🛒 Ваша корзина пуста.")
-        return
+def render_cart(cart: CartSnapshot) -> Tuple[str, Optional[InlineKeyboardMarkup]]:
+    """
+    Формирует текст и клавиатуру корзины по её снимку
+
+    Для каждой позиции — строка кнопок ➖ / количество / ➕ / ❌. Кнопки
+    содержат версию корзины, чтобы нажатия в устаревшем сообщении можно было
+    отличить от актуальных.
+
+    Args:
+        cart: снимок корзины
+
+    Returns:
+        Tuple[str, Optional[InlineKeyboardMarkup]]: текст сообщения и клавиатура
+        (для пустой корзины клавиатуры нет)
+    """
+    if not cart.lines:
+        return EMPTY_CART_TEXT, None
 
     text = "🛍 Ваши товары в корзине:\n\n"
     buttons = []
 
-    for item in cart_items:
-        callback_data = RemoveFromCartCallback(id=item.id).pack()
-        logger.info(f"Сформирован callback_data для товара: {callback_data}")
-
-        text += f"📌 {item.product.name} — {item.quantity} шт.\n"
+    for number, line in enumerate(cart.lines, 1):
+        text += f"{number}. {line.name} — {line.quantity} шт. × {line.price} руб.\n"
         buttons.append([
             InlineKeyboardButton(
-                text=f"❌ Удалить {item.product.name}",
-                callback_data=callback_data
-            )
+                text="➖", callback_data=ChangeQuantityCallback(id=line.id, delta=-1, version=cart.version).pack()
+            ),
+            InlineKeyboardButton(
+                text=f"№{number}: {line.quantity} шт.", callback_data=CartCallback(version=cart.version).pack()
+            ),
+            InlineKeyboardButton(
+                text="➕", callback_data=ChangeQuantityCallback(id=line.id, delta=1, version=cart.version).pack()
+            ),
+            InlineKeyboardButton(
+                text="❌", callback_data=RemoveFromCartCallback(id=line.id, version=cart.version).pack()
+            ),
         ])
+    text += f"\n💰 Итого: {cart.total_price} руб."
 
     buttons.append([
         InlineKeyboardButton(
             text="✅ Оформить заказ",
-            callback_data="checkout"
+            callback_data=CheckoutCallback(version=cart.version).pack()
         )
     ])
+    return text, InlineKeyboardMarkup(inline_keyboard=buttons)
+
+
+async def show_cart(callback: CallbackQuery, cart: CartSnapshot) -> None:
+    """
+    Показывает корзину в сообщении, на кнопке которого нажали
+
+    Сообщение корзины изменяется на месте (только если содержимое изменилось).
+    Если кнопка нажата под карточкой товара, корзина отправляется новым сообщением.
+    """
+    text, keyboard = render_cart(cart)
+    if callback.message.text is None:
+        await callback.message.answer(text, reply_markup=keyboard)
+    else:
+        await edit_message(callback.message, text, keyboard)
+
+
+@router.message(F.text == "🛒 Корзина")
+async def cart_handler(message: Message, identity: Optional[Identity] = None):
+    """Отправляет список товаров в корзине"""
+    user_id = message.from_user.id
+    try:
+        cart = await get_cart(user_id, identity)
+    except Exception as e:
+        logger.error("Ошибка получения корзины для пользователя %s: %s", user_id, e)
+        await message.answer("Произошла ошибка при получении корзины. Попробуйте позже.")
+        return
 
     try:
-        keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
+        text, keyboard = render_cart(cart)
         await message.answer(text, reply_markup=keyboard)
     except Exception as e:
-        logger.error(f"Ошибка при создании клавиатуры для пользователя {user_id}: {e}")
+        logger.error("Ошибка при создании клавиатуры для пользователя %s: %s", user_id, e)
         await message.answer("Произошла ошибка при отображении корзины.")
 
 
-@router.callback_query(lambda c: c.data.startswith("remove:"))
-async def remove_from_cart_handler(callback: CallbackQuery):
+@router.callback_query(CartCallback.filter())
+async def show_cart_handler(
+    callback: CallbackQuery,
+    callback_data: CartCallback,
+    identity: Optional[Identity] = None
+):
+    """Показывает или обновляет корзину"""
+    try:
+        cart = await get_cart(callback.from_user.id, identity)
+        if callback_data.version == cart.version and callback.message.text is not None:
+            await callback.answer("Корзина не изменилась")
+            return
+        await show_cart(callback, cart)
+        await callback.answer()
+    except Exception as e:
+        logger.error("Ошибка при показе корзины: %s", e)
+        await callback.answer("Произошла ошибка при получении корзины.", show_alert=True)
+
+
+async def update_cart_item(
+    callback: CallbackQuery,
+    cart_item_id: int,
+    delta: Optional[int],
+    identity: Optional[Identity]
+) -> None:
+    """
+    Изменяет позицию корзины и обновляет сообщение корзины
+
+    Args:
+        callback: нажатие кнопки в сообщении корзины
+        cart_item_id: ID позиции корзины
+        delta: изменение количества (None — удалить позицию)
+        identity: ID клиента и корзины
+    """
+    user_id = callback.from_user.id
+    cart = await change_cart_item(user_id, cart_item_id, delta, identity)
+    if cart is None:
+        # Позиция уже удалена (например, в другом сообщении корзины): показываем актуальное содержимое
+        await show_cart(callback, await get_cart(user_id, identity))
+        await callback.answer("Товара уже нет в корзине.")
+        return
+
+    await show_cart(callback, cart)
+    await callback.answer("❌ Товар удалён." if delta is None else None)
+
+
+@router.callback_query(ChangeQuantityCallback.filter())
+async def change_quantity_handler(
+    callback: CallbackQuery,
+    callback_data: ChangeQuantityCallback,
+    identity: Optional[Identity] = None
+):
+    """Увеличивает или уменьшает количество товара в корзине"""
+    try:
+        logger.debug("Изменяем количество товара с ID %s на %s", callback_data.id, callback_data.delta)
+        await update_cart_item(callback, callback_data.id, callback_data.delta, identity)
+    except Exception as e:
+        logger.warning("Ошибка при изменении количества: %s", e)
+        await callback.answer("Ошибка изменения количества.", show_alert=True)
+
+
+@router.callback_query(RemoveFromCartCallback.filter())
+async def remove_from_cart_handler(
+    callback: CallbackQuery,
+    callback_data: RemoveFromCartCallback,
+    identity: Optional[Identity] = None
+):
+    """Удаляет товар из корзины"""
     try:
-        cart_item_id = int(callback.data.split(":")[1])
-        logger.info(f"Удаляем товар с ID: {cart_item_id}")
-        await remove_from_cart(cart_item_id)
-        await callback.answer("❌ Товар удалён.")
+        logger.debug("Удаляем товар с ID: %s", callback_data.id)
+        await update_cart_item(callback, callback_data.id, None, identity)
     except Exception as e:
-        logger.warning(f"Ошибка при удалении: {e}")
+        logger.warning("Ошибка при удалении: %s", e)
         await callback.answer("Ошибка удаления.", show_alert=True)
@@ -1,51 +1,133 @@
-import os
+import asyncio
+from typing import Optional
+
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, FSInputFile
+from aiogram.exceptions import TelegramBadRequest
 
 from bot.database.cart_db import add_to_cart
+from bot.database.identity_db import Identity
 from bot.kbds.catalog_kbds import (
-    get_category_keyboard, get_subcategory_keyboard, get_product_keyboard
+    category_page_keyboard, subcategory_page_keyboard, product_page_keyboard
 )
 from bot.handlers.callback import (
-    CategoryCallback, SubcategoryCallback, ProductCallback,
-    AddToCartCallback, SetQuantityCallback, ConfirmAddCallback
+    CategoryCallback, SubcategoryCallback, ProductCallback, ProductCardCallback,
+    AddToCartCallback, SetQuantityCallback, ConfirmAddCallback, CartCallback
 )
 from bot.logging_config import logger
-from bot.database.catalog_db import get_categories, get_product, get_subcategories, get_products
+from bot.images import get_image_path, image_digest
+from bot.message_edit import edit_message
+from bot.database.catalog_db import (
+    get_product, save_product_photo
+)
 
 
 router = Router()
 
 
+def product_keyboard(product_id: int, in_cart: bool = False) -> InlineKeyboardMarkup:
+    """Клавиатура карточки товара (с кнопкой перехода в корзину, если товар уже добавлен)"""
+    buttons = [
+        [InlineKeyboardButton(text="🛒 Добавить в корзину", callback_data=AddToCartCallback(id=product_id).pack())],
+    ]
+    if in_cart:
+        buttons.append([InlineKeyboardButton(text="🛍 Перейти в корзину", callback_data=CartCallback().pack())])
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+
+def product_caption(product, note: str = "") -> str:
+    """
+    Формирует подпись карточки товара в HTML
+
+    Args:
+        product: объект товара
+        note: строка под описанием (например, сколько товара уже в корзине)
+    """
+    caption = f"<b>{product.name}</b>\n\n{product.description}\n\nЦена: {product.price} ₽"
+    return f"{caption}\n\n{note}" if note else caption
+
+
+async def send_product_photo(message: Message, product, caption: str, keyboard: InlineKeyboardMarkup) -> None:
+    """
+    Отправляет фото товара
+
+    Повторно использует file_id, полученный от Telegram при первой загрузке,
+    и загружает файл с диска только если file_id ещё нет или он недействителен.
+    Если изображения нет, карточка отправляется текстом.
+
+    Args:
+        message: сообщение, в ответ на которое отправляется фото
+        product: объект товара
+        caption: подпись к фото
+        keyboard: клавиатура под фото
+    """
+    if product.image_file_id:
+        try:
+            await message.answer_photo(
+                photo=product.image_file_id,
+                caption=caption,
+                reply_markup=keyboard,
+                parse_mode="HTML"
+            )
+            return
+        except TelegramBadRequest as e:
+            logger.warning("file_id фото товара %s недействителен: %s", product.id, e)
+
+    image_path = get_image_path(product)
+    if image_path is None:
+        logger.warning("Изображение товара %s не найдено", product.id)
+        await message.answer(caption, reply_markup=keyboard, parse_mode="HTML")
+        return
+
+    sent = await message.answer_photo(
+        photo=FSInputFile(image_path),
+        caption=caption,
+        reply_markup=keyboard,
+        parse_mode="HTML"
+    )
+    image_hash = await asyncio.to_thread(image_digest, image_path)
+    await save_product_photo(product.id, sent.photo[-1].file_id, image_hash)
+
+
+async def show_product(message: Message, product) -> None:
+    """
+    Отправляет карточку товара с кнопкой добавления в корзину
+
+    Дальнейшие шаги (выбор количества, подтверждение) изменяют эту карточку
+    на месте, а не отправляют новые сообщения.
+
+    Args:
+        message: сообщение, в ответ на которое отправляется карточка
+        product: объект товара
+    """
+    await send_product_photo(message, product, product_caption(product), product_keyboard(product.id))
+
+
 @router.message(F.text == "🛍 Каталог")
 async def catalog_handler(message: Message):
     """Отправляет список категорий с пагинацией"""
-    logger.info("Получен запрос на отображение каталога.")
-    categories = await get_categories()
-    keyboard = get_category_keyboard(categories, page=1)
+    logger.debug("Получен запрос на отображение каталога.")
+    keyboard = await category_page_keyboard()
     await message.answer("Выберите категорию:", reply_markup=keyboard)
 
 
 @router.callback_query(CategoryCallback.filter())
 async def category_handler(callback: CallbackQuery, callback_data: CategoryCallback):
     """Обрабатывает выбор категории и показывает подкатегории"""
-    logger.info(f"Получен callback в category_handler: {callback.data}")
+    logger.debug("Получен callback в category_handler: %s", callback.data)
     category_id = callback_data.id
-    page = callback_data.page
 
     if not category_id:
-        # Показываем список категорий с пагинацией
-        categories = await get_categories()
-        keyboard = get_category_keyboard(categories, page)
+        # Показываем страницу категорий
+        keyboard = await category_page_keyboard(callback_data.after, callback_data.before)
         await callback.message.edit_text(
             "Выберите категорию:",
             reply_markup=keyboard
         )
     else:
         # Показываем подкатегории
-        subcategories = await get_subcategories(category_id)
-        keyboard = get_subcategory_keyboard(subcategories, page, category_id)
+        keyboard = await subcategory_page_keyboard(category_id)
         await callback.message.edit_text(
             "Выберите подкатегорию:",
             reply_markup=keyboard
@@ -57,31 +139,27 @@ async def category_handler(callback: CallbackQuery, callback_data: CategoryCallb
 @router.callback_query(SubcategoryCallback.filter())
 async def subcategory_handler(callback: CallbackQuery, callback_data: SubcategoryCallback):
     """Обрабатывает выбор подкатегории и показывает товары"""
-    logger.info(f"Получен callback в subcategory_handler: {callback.data}")
+    logger.debug("Получен callback в subcategory_handler: %s", callback.data)
     subcategory_id = callback_data.id
-    page = callback_data.page
     category_id = callback_data.category_id
 
     if subcategory_id is None and category_id is not None:
         # Это навигация по страницам подкатегорий
-        subcategories = await get_subcategories(category_id)
-        keyboard = get_subcategory_keyboard(subcategories, page, category_id)
+        keyboard = await subcategory_page_keyboard(category_id, callback_data.after, callback_data.before)
         await callback.message.edit_text(
             "Выберите подкатегорию:",
             reply_markup=keyboard
         )
     elif subcategory_id is None and category_id is None:
         # Возвращаемся к категориям
-        categories = await get_categories()
-        keyboard = get_category_keyboard(categories, page=1)
+        keyboard = await category_page_keyboard()
         await callback.message.edit_text(
             "Выберите категорию:",
             reply_markup=keyboard
         )
     else:
         # Показываем товары выбранной подкатегории
-        products = await get_products(subcategory_id)
-        keyboard = get_product_keyboard(products, page=1, subcategory_id=subcategory_id, category_id=category_id)
+        keyboard = await product_page_keyboard(subcategory_id, category_id)
         await callback.message.edit_text(
             "Выберите товар:",
             reply_markup=keyboard
@@ -93,23 +171,22 @@ async def subcategory_handler(callback: CallbackQuery, callback_data: Subcategor
 @router.callback_query(ProductCallback.filter())
 async def product_handler(callback: CallbackQuery, callback_data: ProductCallback):
     """Отображает информацию о товаре и кнопку 'Добавить в корзину'"""
-    logger.info(f"Получен callback в product_handler: {callback.data}")
+    logger.debug("Получен callback в product_handler: %s", callback.data)
     product_id = callback_data.id
-    page = callback_data.page
     subcategory_id = callback_data.subcategory_id
 
     if product_id is None and subcategory_id is not None:
         # Это навигация по страницам товаров
-        products = await get_products(subcategory_id)
-        keyboard = get_product_keyboard(products, page, subcategory_id)
+        keyboard = await product_page_keyboard(
+            subcategory_id, callback_data.category_id, after=callback_data.after, before=callback_data.before
+        )
         await callback.message.edit_text(
             "Выберите товар:",
             reply_markup=keyboard
         )
     elif product_id is None and subcategory_id is None:
         # Возвращаемся к подкатегориям
-        categories = await get_categories()
-        keyboard = get_category_keyboard(categories, page=1)
+        keyboard = await category_page_keyboard()
         await callback.message.edit_text(
             "Выберите категорию:",
             reply_markup=keyboard
@@ -121,67 +198,78 @@ async def product_handler(callback: CallbackQuery, callback_data: ProductCallbac
             await callback.answer("Товар не найден!", show_alert=True)
             return
 
-        caption = f"<b>{product.name}</b>\n\n{product.description}\n\nЦена: {product.price} ₽"
-        image_path = os.path.join("", str(product.image) or "")
-
-        if product.image and os.path.exists(image_path):
-            photo = FSInputFile(image_path)
-            await callback.message.answer_photo(
-                photo=photo,
-                caption=caption,
-                reply_markup=InlineKeyboardMarkup(
-                    inline_keyboard=[
-                        [InlineKeyboardButton(text="🛒 Добавить в корзину", callback_data=AddToCartCallback(id=product_id).pack())],
-                    ]
-                ),
-                parse_mode="HTML"
-            )
-        else:
-            await callback.message.answer("Ошибка: изображение не найдено!", parse_mode="HTML")
+        await show_product(callback.message, product)
     
     await callback.answer()
 
 
+@router.callback_query(ProductCardCallback.filter())
+async def product_card_handler(callback: CallbackQuery, callback_data: ProductCardCallback):
+    """Возвращает карточке товара исходные кнопки"""
+    await edit_message(callback.message, reply_markup=product_keyboard(callback_data.id))
+    await callback.answer()
+
+
 @router.callback_query(AddToCartCallback.filter())
 async def add_to_cart_handler(callback: CallbackQuery, callback_data: AddToCartCallback):
-    """Запрашивает количество товара перед добавлением в корзину"""
-    logger.info(f"Получен callback в add_to_cart_handler: {callback.data}")
+    """Запрашивает количество товара перед добавлением в корзину (кнопками в карточке товара)"""
+    logger.debug("Получен callback в add_to_cart_handler: %s", callback.data)
     product_id = callback_data.id
 
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text=str(i), callback_data=SetQuantityCallback(id=product_id, quantity=i).pack())]
-        for i in range(1, 6)
+        [
+            InlineKeyboardButton(text=str(i), callback_data=SetQuantityCallback(id=product_id, quantity=i).pack())
+            for i in range(1, 6)
+        ],
+        [InlineKeyboardButton(text="◀️ Назад", callback_data=ProductCardCallback(id=product_id).pack())],
     ])
-    await callback.message.answer("Выберите количество товара:", reply_markup=keyboard)
-    await callback.answer()
+    await edit_message(callback.message, reply_markup=keyboard)
+    await callback.answer("Выберите количество товара")
 
 
 @router.callback_query(SetQuantityCallback.filter())
 async def set_quantity_handler(callback: CallbackQuery, callback_data: SetQuantityCallback):
     """Обрабатывает выбор количества товара"""
-    logger.info(f"Получен callback в set_quantity_handler: {callback.data}")
+    logger.debug("Получен callback в set_quantity_handler: %s", callback.data)
     product_id = callback_data.id
     quantity = callback_data.quantity
 
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="✅ Подтвердить", callback_data=ConfirmAddCallback(id=product_id, quantity=quantity).pack())],
+        [InlineKeyboardButton(
+            text=f"✅ Добавить {quantity} шт. в корзину",
+            callback_data=ConfirmAddCallback(id=product_id, quantity=quantity).pack()
+        )],
+        [InlineKeyboardButton(text="◀️ Назад", callback_data=AddToCartCallback(id=product_id).pack())],
     ])
-    await callback.message.edit_text(f"Вы выбрали {quantity} шт. Добавить в корзину?", reply_markup=keyboard)
+    await edit_message(callback.message, reply_markup=keyboard)
     await callback.answer()
 
 
 @router.callback_query(ConfirmAddCallback.filter())
-async def confirm_add_to_cart(callback: CallbackQuery, callback_data: ConfirmAddCallback):
-    """Добавляет товар в корзину и уведомляет пользователя"""
-    logger.info(f"Получен callback в confirm_add_to_cart: {callback.data}")
+async def confirm_add_to_cart(
+    callback: CallbackQuery,
+    callback_data: ConfirmAddCallback,
+    identity: Optional[Identity] = None
+):
+    """Добавляет товар в корзину и показывает результат в карточке товара"""
+    logger.debug("Получен callback в confirm_add_to_cart: %s", callback.data)
     product_id = callback_data.id
     quantity = callback_data.quantity
 
     user_id = callback.from_user.id
     try:
-        await add_to_cart(user_id, product_id, quantity)
-        await callback.message.edit_text("✅ Товар добавлен в корзину!")
+        cart_item = await add_to_cart(user_id, product_id, quantity, identity)
+        product = await get_product(product_id)
     except Exception as e:
-        logger.error(f"Ошибка добавления товара: {e}")
-        await callback.message.edit_text("Ошибка добавления товара в корзину.")
+        logger.error("Ошибка добавления товара: %s", e)
+        await callback.answer("Ошибка добавления товара в корзину.", show_alert=True)
+        return
+
+    note = f"✅ Товар добавлен в корзину! Сейчас в корзине: {cart_item.quantity} шт."
+    if product is None:
+        await callback.answer(note, show_alert=True)
+        return
+    await edit_message(
+        callback.message, product_caption(product, note), product_keyboard(product_id, in_cart=True), parse_mode="HTML"
+    )
     await callback.answer()
@@ -0,0 +1,22 @@
+from aiogram import Router
+from aiogram.types import CallbackQuery
+
+from bot.logging_config import logger
+
+router = Router()
+
+
+@router.callback_query()
+async def stale_callback(callback: CallbackQuery):
+    """
+    Отвечает на нажатия кнопок, которые не обработал ни один роутер
+
+    Такие данные приходят от кнопок старых сообщений (прежний формат
+    callback_data или удалённые разделы меню). Без ответа Telegram
+    показывает у кнопки индикатор загрузки, пока не истечёт таймаут.
+
+    Args:
+        callback: объект callback-запроса
+    """
+    logger.debug("Необработанный callback от пользователя %s: %s", callback.from_user.id, callback.data)
+    await callback.answer("Кнопка устарела, откройте меню заново", show_alert=True)
@@ -1,4 +1,6 @@
-from aiogram import Router, F
+from typing import Optional
+
+from aiogram import Router
 from aiogram.fsm.context import FSMContext
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.state import State, StatesGroup
@@ -6,8 +8,11 @@ from aiogram.utils.keyboard import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.exceptions import TelegramBadRequest
 
 from bot.logging_config import logger
-from bot.database.cart_db import get_cart_items
+from bot.database.cart_db import get_cart
 from bot.database.order_db import create_order
+from bot.database.identity_db import Identity
+from bot.handlers.callback import CancelOrderCallback, CheckoutCallback, PaymentCallback
+from bot.handlers.cart import show_cart
 
 
 router = Router()
@@ -20,34 +25,47 @@ class OrderForm(StatesGroup):
     address = State()
 
 
-@router.callback_query(F.data == "checkout")
-async def start_order(callback: CallbackQuery, state: FSMContext):
+@router.callback_query(CheckoutCallback.filter())
+async def start_order(
+    callback: CallbackQuery,
+    callback_data: CheckoutCallback,
+    state: FSMContext,
+    identity: Optional[Identity] = None
+):
     """
     Начинает оформление заказа
     
     Args:
         callback: объект callback запроса
+        callback_data: версия корзины, которую видел пользователь
         state: объект состояния FSM
+        identity: ID клиента и корзины
     """
     try:
         user_id = callback.from_user.id
-        cart_items = await get_cart_items(user_id)
+        cart = await get_cart(user_id, identity)
         
-        if not cart_items:
+        if not cart.lines:
             await callback.answer("❌ Ваша корзина пуста. Добавьте товары перед оформлением заказа.", show_alert=True)
             return
+
+        if callback_data.version is not None and callback_data.version != cart.version:
+            # Корзина изменилась после показа: обновляем сообщение корзины
+            await show_cart(callback, cart)
+            await callback.answer("Корзина изменилась, проверьте её перед оформлением.", show_alert=True)
+            return
             
         await callback.message.answer(
             "📝 Введите ваше ФИО:",
             reply_markup=InlineKeyboardMarkup(
-                inline_keyboard=[[InlineKeyboardButton(text="❌ Отмена", callback_data="cancel_order")]]
+                inline_keyboard=[[InlineKeyboardButton(text="❌ Отмена", callback_data=CancelOrderCallback().pack())]]
             )
         )
         await state.set_state(OrderForm.full_name)
         await callback.answer()
         
     except Exception as e:
-        logger.error(f"Ошибка при начале оформления заказа: {e}")
+        logger.error("Ошибка при начале оформления заказа: %s", e)
         await callback.answer("❌ Произошла ошибка. Пожалуйста, попробуйте позже.", show_alert=True)
 
 
@@ -71,13 +89,13 @@ async def process_full_name(message: Message, state: FSMContext):
         await message.answer(
             "📞 Введите ваш номер телефона:",
             reply_markup=InlineKeyboardMarkup(
-                inline_keyboard=[[InlineKeyboardButton(text="❌ Отмена", callback_data="cancel_order")]]
+                inline_keyboard=[[InlineKeyboardButton(text="❌ Отмена", callback_data=CancelOrderCallback().pack())]]
             )
         )
         await state.set_state(OrderForm.phone)
         
     except Exception as e:
-        logger.error(f"Ошибка при обработке ФИО: {e}")
+        logger.error("Ошибка при обработке ФИО: %s", e)
         await message.answer("❌ Произошла ошибка. Пожалуйста, попробуйте позже.")
 
 
@@ -102,24 +120,25 @@ async def process_phone(message: Message, state: FSMContext):
         await message.answer(
             "📍 Введите ваш адрес доставки:",
             reply_markup=InlineKeyboardMarkup(
-                inline_keyboard=[[InlineKeyboardButton(text="❌ Отмена", callback_data="cancel_order")]]
+                inline_keyboard=[[InlineKeyboardButton(text="❌ Отмена", callback_data=CancelOrderCallback().pack())]]
             )
         )
         await state.set_state(OrderForm.address)
         
     except Exception as e:
-        logger.error(f"Ошибка при обработке телефона: {e}")
+        logger.error("Ошибка при обработке телефона: %s", e)
         await message.answer("❌ Произошла ошибка. Пожалуйста, попробуйте позже.")
 
 
 @router.message(OrderForm.address)
-async def process_address(message: Message, state: FSMContext):
+async def process_address(message: Message, state: FSMContext, identity: Optional[Identity] = None):
     """
     Сохраняет адрес, создаёт заказ и показывает итог
     
     Args:
         message: объект сообщения
         state: объект состояния FSM
+        identity: ID клиента и корзины
     """
     try:
         user_id = message.from_user.id
@@ -133,29 +152,25 @@ async def process_address(message: Message, state: FSMContext):
             await message.answer("❌ Адрес слишком короткий. Пожалуйста, введите корректный адрес:")
             return
             
-        cart_items = await get_cart_items(user_id)
-        if not cart_items:
+        order = await create_order(user_id, full_name, phone, address, identity)
+        if order is None:
             await message.answer("❌ Ваша корзина пуста. Добавьте товары перед оформлением заказа.")
             await state.clear()
             return
-            
-        total_price = sum(item.product.price * item.quantity for item in cart_items)
-        
-        order = await create_order(user_id, full_name, phone, address, total_price, cart_items)
         
         text = (
             f"✅ Ваш заказ оформлен!\n\n"
-            f"👤 ФИО: {full_name}\n"
-            f"📞 Телефон: {phone}\n"
-            f"📍 Адрес: {address}\n"
-            f"💰 Сумма: {total_price} руб.\n\n"
+            f"👤 ФИО: {order.full_name}\n"
+            f"📞 Телефон: {order.phone}\n"
+            f"📍 Адрес: {order.address}\n"
+            f"💰 Сумма: {order.total_price} руб.\n\n"
             f"Теперь выберите способ оплаты."
         )
         
         keyboard = InlineKeyboardMarkup(
             inline_keyboard=[
-                [InlineKeyboardButton(text="💳 Оплатить", callback_data=f"pay_{order.id}")],
-                [InlineKeyboardButton(text="❌ Отмена", callback_data="cancel_order")]
+                [InlineKeyboardButton(text="💳 Оплатить", callback_data=PaymentCallback(order_id=order.id).pack())],
+                [InlineKeyboardButton(text="❌ Отмена", callback_data=CancelOrderCallback().pack())]
             ]
         )
         
@@ -163,12 +178,12 @@ async def process_address(message: Message, state: FSMContext):
         await state.clear()
         
     except Exception as e:
-        logger.error(f"Ошибка при создании заказа: {e}")
+        logger.error("Ошибка при создании заказа: %s", e)
         await message.answer("❌ Произошла ошибка при создании заказа. Пожалуйста, попробуйте позже.")
         await state.clear()
 
 
-@router.callback_query(F.data == "cancel_order")
+@router.callback_query(CancelOrderCallback.filter())
 async def cancel_order(callback: CallbackQuery, state: FSMContext):
     """
     Отменяет оформление заказа
@@ -182,5 +197,5 @@ async def cancel_order(callback: CallbackQuery, state: FSMContext):
         await callback.message.answer("❌ Оформление заказа отменено")
         await callback.answer()
     except Exception as e:
-        logger.error(f"Ошибка при отмене заказа: {e}")
+        logger.error("Ошибка при отмене заказа: %s", e)
         await callback.answer("❌ Произошла ошибка. Пожалуйста, попробуйте позже.", show_alert=True)
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from aiogram import Bot, Router, F
 from aiogram.types import (
     CallbackQuery, LabeledPrice, InlineKeyboardMarkup,
@@ -8,27 +10,27 @@ from aiogram.exceptions import TelegramBadRequest
 from bot.logging_config import logger
 from bot.database.cart_db import clear_cart
 from bot.database.order_db import get_order
-from bot.config import Y_KASSA_TOKEN, BOT_TOKEN
-from bot.excel import save_order_to_excel
+from bot.database.identity_db import Identity
+from bot.config import Y_KASSA_TOKEN
+from bot.excel import order_exporter
+from bot.handlers.callback import CancelPaymentCallback, PaymentCallback
 
 
 router: Router = Router()
-bot: Bot = Bot(BOT_TOKEN)
 
 
-@router.callback_query(F.data.startswith('pay_'))
-async def process_payment(callback: CallbackQuery) -> None:
+@router.callback_query(PaymentCallback.filter())
+async def process_payment(callback: CallbackQuery, callback_data: PaymentCallback, bot: Bot) -> None:
     """Генерация платежного инвойса"""
     user_id = callback.from_user.id
-    logger.info(f"Пользователь {user_id} инициировал оплату.")
+    logger.info("Пользователь %s инициировал оплату.", user_id)
 
     try:
-        order_id = int(callback.data.split("_")[1])
-        order = await get_order(order_id)
+        order = await get_order(callback_data.order_id)
         if not order:
             raise ValueError("Заказ не найден")
-    except (IndexError, ValueError) as e:
-        logger.error(f"Ошибка при получении заказа: {e}")
+    except ValueError as e:
+        logger.error("Ошибка при получении заказа: %s", e)
         await callback.message.answer("❌ Ошибка: заказ не найден!")
         return
 
@@ -41,7 +43,7 @@ async def process_payment(callback: CallbackQuery) -> None:
         inline_keyboard=[
             [InlineKeyboardButton(text="💳 Оплатить", pay=True)],
             [InlineKeyboardButton(
-                text="❌ Отмена", callback_data=f"cancel_pay_{order.id}")]
+                text="❌ Отмена", callback_data=CancelPaymentCallback(order_id=order.id).pack())]
         ]
     )
     description = f"""Пожалуйста проверьте свои данные перед оплатой.\n
@@ -58,47 +60,44 @@ async def process_payment(callback: CallbackQuery) -> None:
             prices=prices,
             reply_markup=keyboard
         )
-        logger.info(f"Инвойс для заказа {order.id} отправлен пользователю {user_id}.")
+        logger.info("Инвойс для заказа %s отправлен пользователю %s.", order.id, user_id)
     except TelegramBadRequest as e:
-        logger.error(f"Ошибка при отправке инвойса: {e}")
+        logger.error("Ошибка при отправке инвойса: %s", e)
         await callback.message.answer("❌ Ошибка при создании платежа.")
 
     await callback.message.answer("Следуйте дальнейшим инструкциям для оплаты")
 
 
-@router.callback_query(F.data.startswith('cancel_pay_'))
+@router.callback_query(CancelPaymentCallback.filter())
 async def cancel_payment(callback: CallbackQuery) -> None:
     """Отмена оплаты пользователем"""
-    logger.info(f"Пользователь {callback.from_user.id} отменил оплату.")
+    logger.info("Пользователь %s отменил оплату.", callback.from_user.id)
     await callback.message.answer("❌ Оплата отменена.")
     await callback.message.delete()
 
 
 @router.pre_checkout_query(lambda query: True)
-async def pre_checkout_query(pre_checkout_q: PreCheckoutQuery) -> None:
+async def pre_checkout_query(pre_checkout_q: PreCheckoutQuery, bot: Bot) -> None:
     """Подтверждение перед оплатой"""
     await bot.answer_pre_checkout_query(pre_checkout_q.id, ok=True)
-    logger.info(f"Предварительная проверка платежа {pre_checkout_q.id} пройдена.")
+    logger.info("Предварительная проверка платежа %s пройдена.", pre_checkout_q.id)
 
 
 @router.message(F.successful_payment)
-async def process_successful_payment(message: Message) -> None:
+async def process_successful_payment(message: Message, identity: Optional[Identity] = None) -> None:
     """Обрабатывает успешную оплату"""
     order_id = int(message.successful_payment.invoice_payload)
     user_id = message.from_user.id
-    logger.info(f"Платеж за заказ {order_id} от пользователя {user_id} прошел успешно.")
+    logger.info("Платеж за заказ %s от пользователя %s прошел успешно.", order_id, user_id)
 
-    # Записываем заказ в Excel
-    try:
-        await save_order_to_excel(order_id)
-    except Exception as e:
-        logger.error(f"Ошибка при сохранении заказа {order_id} в Excel: {e}")
+    # Ставим заказ в очередь на выгрузку в файл
+    order_exporter.enqueue(order_id)
 
     # Очищаем корзину
     try:
-        await clear_cart(user_id)
+        await clear_cart(user_id, identity)
     except Exception as e:
-        logger.error(f"Ошибка при очистке корзины: {e}")
+        logger.error("Ошибка при очистке корзины: %s", e)
 
     await message.answer(
         f"✅ Оплата заказа #{order_id} прошла успешно!\n"
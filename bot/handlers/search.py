@@ -0,0 +1,178 @@
+import html
+from typing import Optional
+
+from aiogram import F, Router
+from aiogram.filters import Command, CommandObject, CommandStart
+from aiogram.fsm.context import FSMContext
+from aiogram.types import (
+    CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup, InlineQuery,
+    InlineQueryResultArticle, InlineQueryResultCachedPhoto, InputTextMessageContent, Message
+)
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+
+from bot.config import BOT_USERNAME
+from bot.database.catalog_db import get_product
+from bot.database.identity_db import Identity
+from bot.database.search_db import product_search
+from bot.handlers.callback import ProductCallback, SearchPageCallback
+from bot.handlers.catalog import show_product
+from bot.handlers.start import handle_user_registration
+from bot.logging_config import logger
+from bot.text_index import SearchDocument
+
+
+router = Router()
+
+SEARCH_PREFIX = "#"  # Префикс инлайн-запроса для поиска товаров (без него — поиск по FAQ)
+SEARCH_PAGE_SIZE = 5  # Количество товаров на странице результатов /search
+INLINE_PAGE_SIZE = 20  # Количество товаров в одном ответе на инлайн-запрос
+INLINE_CACHE_TIME = 60  # Время кэширования инлайн-результатов в Telegram в секундах
+DEEP_LINK_PREFIX = "product_"  # Префикс параметра /start для открытия товара
+
+
+def product_link(product_id: int) -> str:
+    """Возвращает ссылку, открывающую товар в боте"""
+    return f"https://t.me/{BOT_USERNAME}?start={DEEP_LINK_PREFIX}{product_id}"
+
+
+def build_search_keyboard(query: str, documents: list[SearchDocument], offset: int, total: int) -> InlineKeyboardMarkup:
+    """
+    Создает клавиатуру страницы результатов поиска
+
+    Args:
+        query: текст запроса
+        documents: товары страницы
+        offset: номер первого товара страницы
+        total: общее количество найденных товаров
+    """
+    keyboard = InlineKeyboardBuilder()
+    for document in documents:
+        keyboard.button(
+            text=f"{document.name} — {document.price} ₽",
+            callback_data=ProductCallback(id=document.id).pack()
+        )
+    keyboard.adjust(1)
+
+    nav_buttons = []
+    if offset > 0:
+        nav_buttons.append(InlineKeyboardButton(
+            text="◀️ Назад",
+            callback_data=SearchPageCallback(offset=max(offset - SEARCH_PAGE_SIZE, 0)).pack()
+        ))
+    if offset + len(documents) < total:
+        nav_buttons.append(InlineKeyboardButton(
+            text="Вперед ▶️",
+            callback_data=SearchPageCallback(offset=offset + SEARCH_PAGE_SIZE).pack()
+        ))
+    if nav_buttons:
+        keyboard.row(*nav_buttons)
+
+    keyboard.row(InlineKeyboardButton(
+        text="🔎 Искать с фото",
+        switch_inline_query_current_chat=f"{SEARCH_PREFIX}{query}"
+    ))
+    return keyboard.as_markup()
+
+
+async def render_search_page(query: str, offset: int) -> tuple[str, InlineKeyboardMarkup | None]:
+    """Возвращает текст и клавиатуру страницы результатов поиска"""
+    documents, total = await product_search.search(query, offset, SEARCH_PAGE_SIZE)
+    if not documents:
+        return f"По запросу «{html.escape(query)}» ничего не найдено.", None
+    text = f"🔎 Найдено товаров: {total}\nЗапрос: «{html.escape(query)}»"
+    return text, build_search_keyboard(query, documents, offset, total)
+
+
+@router.message(Command("search"))
+async def search_command(message: Message, command: CommandObject, state: FSMContext):
+    """Ищет товары по запросу из команды /search"""
+    query = (command.args or "").strip()
+    if not query:
+        await message.answer("Введите запрос после команды, например: /search чай")
+        return
+
+    await state.update_data(search_query=query)
+    text, keyboard = await render_search_page(query, 0)
+    await message.answer(text, reply_markup=keyboard)
+    logger.info("Пользователь %s искал товары: %s", message.from_user.id, query)
+
+
+@router.callback_query(SearchPageCallback.filter())
+async def search_page_handler(callback: CallbackQuery, callback_data: SearchPageCallback, state: FSMContext):
+    """Показывает другую страницу результатов поиска"""
+    query = (await state.get_data()).get("search_query")
+    if not query:
+        await callback.answer("Поиск устарел, повторите запрос /search", show_alert=True)
+        return
+
+    text, keyboard = await render_search_page(query, callback_data.offset)
+    await callback.message.edit_text(text, reply_markup=keyboard)
+    await callback.answer()
+
+
+@router.message(CommandStart(deep_link=True, magic=F.args.startswith(DEEP_LINK_PREFIX)))
+async def open_product_link(message: Message, command: CommandObject, identity: Optional[Identity] = None):
+    """
+    Открывает товар по ссылке из результатов инлайн-поиска
+
+    Ссылка заменяет обычный /start, поэтому новый пользователь сначала
+    регистрируется (и получает основную клавиатуру), иначе он не сможет
+    добавить товар в корзину.
+    """
+    if identity is None:
+        user = message.from_user
+        await handle_user_registration(message, user.id, user.username, identity)
+
+    try:
+        product_id = int(command.args.removeprefix(DEEP_LINK_PREFIX))
+    except ValueError:
+        product_id = None
+    product = await get_product(product_id) if product_id else None
+    if not product:
+        await message.answer("Товар не найден!")
+        return
+    await show_product(message, product)
+
+
+def build_inline_result(document: SearchDocument):
+    """Формирует результат инлайн-запроса для товара"""
+    caption = f"<b>{html.escape(document.name)}</b>\n\nЦена: {document.price} ₽"
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="🛍 Открыть в боте", url=product_link(document.id))]
+    ])
+    if document.image_file_id:
+        return InlineQueryResultCachedPhoto(
+            id=f"p{document.id}",
+            photo_file_id=document.image_file_id,
+            title=document.name,
+            description=document.description,
+            caption=caption,
+            parse_mode="HTML",
+            reply_markup=keyboard
+        )
+    return InlineQueryResultArticle(
+        id=f"p{document.id}",
+        title=document.name,
+        description=f"{document.price} ₽ · {document.description}",
+        input_message_content=InputTextMessageContent(message_text=caption, parse_mode="HTML"),
+        reply_markup=keyboard
+    )
+
+
+@router.inline_query(F.query.startswith(SEARCH_PREFIX))
+async def search_inline_query(inline_query: InlineQuery):
+    """Ищет товары по инлайн-запросу с префиксом #"""
+    query = inline_query.query[len(SEARCH_PREFIX):]
+    offset = int(inline_query.offset) if inline_query.offset.isdigit() else 0
+    try:
+        documents, total = await product_search.search(query, offset, INLINE_PAGE_SIZE)
+        next_offset = str(offset + INLINE_PAGE_SIZE) if offset + INLINE_PAGE_SIZE < total else ""
+        await inline_query.answer(
+            results=[build_inline_result(document) for document in documents],
+            cache_time=INLINE_CACHE_TIME,
+            is_personal=False,
+            next_offset=next_offset
+        )
+    except Exception as e:
+        logger.error("Ошибка при поиске товаров по инлайн-запросу: %s", e)
+        await inline_query.answer(results=[], cache_time=1)
@@ -0,0 +1,46 @@
+import hashlib
+import os
+from typing import BinaryIO, Optional, Union
+
+
+CHUNK_SIZE = 64 * 1024  # Размер блока при чтении файла
+
+
+def image_digest(source: Union[str, BinaryIO]) -> str:
+    """
+    Считает sha256 содержимого изображения
+
+    Args:
+        source: путь к файлу или открытый бинарный файл
+
+    Returns:
+        str: hex-дайджест содержимого
+    """
+    digest = hashlib.sha256()
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+    else:
+        source.seek(0)
+        for chunk in iter(lambda: source.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+        source.seek(0)
+    return digest.hexdigest()
+
+
+def get_image_path(product) -> Optional[str]:
+    """
+    Возвращает путь к изображению товара, если файл существует
+
+    Args:
+        product: объект товара
+
+    Returns:
+        Optional[str]: путь к файлу или None
+    """
+    if not product.image:
+        return None
+    image_path = os.path.join("", str(product.image))
+    return image_path if os.path.exists(image_path) else None
+
@@ -1,50 +1,58 @@
-from aiogram.filters.callback_data import CallbackData
-from aiogram.types import InlineKeyboardButton
+from typing import Awaitable, Callable
+
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
-from bot.database.catalog_db import Paginator
+from bot.cache import LRUCache
+from bot.config import KEYBOARD_WARMUP_PAGES
+from bot.database.catalog_cache import catalog_cache
+from bot.database.catalog_db import Page, get_category_page, get_product_page, get_subcategory_page
 from bot.handlers.callback import CategoryCallback, ProductCallback, SubcategoryCallback
+from bot.logging_config import logger
+
+
+KEYBOARD_CACHE_SIZE = 4096  # Количество готовых клавиатур в кэше процесса
+
+# Готовые клавиатуры страниц каталога. Ключ включает версию каталога, поэтому
+# после изменения каталога старые клавиатуры не читаются и вытесняются
+keyboard_cache = LRUCache(KEYBOARD_CACHE_SIZE)
+
 
+# Поле callback_data, в котором передаётся ID родительского элемента
+PARENT_FIELDS = {
+    SubcategoryCallback: "category_id",
+    ProductCallback: "subcategory_id",
+}
 
-def create_list_keyboard(items, page: int, callback_class, parent_id: int = None, 
-                        back_button_text: str = None, back_callback = None):
+
+def make_callback(callback_class, parent_id: int = None, **fields) -> str:
+    """Формирует callback_data с учётом поля родительского элемента"""
+    parent_field = PARENT_FIELDS.get(callback_class)
+    if parent_field:
+        fields[parent_field] = parent_id
+    return callback_class(**fields).pack()
+
+
+def create_list_keyboard(page: Page, callback_class, parent_id: int = None,
+                        back_button_text: str = None, back_callback = None, nav_fields: dict = None):
     """
-    Создает универсальную клавиатуру для списка элементов с пагинацией
+    Создает универсальную клавиатуру для страницы списка элементов
     
     Args:
-        items: Список элементов для отображения
-        page: Текущая страница
+        page: Страница элементов для отображения
         callback_class: Класс для создания callback_data
         parent_id: ID родительского элемента (если есть)
         back_button_text: Текст кнопки возврата (если нужна)
         back_callback: Callback для кнопки возврата
+        nav_fields: Дополнительные поля callback_data кнопок навигации по страницам
     """
-    paginator = Paginator(items, page)
     keyboard = InlineKeyboardBuilder()
     
     # Добавляем элементы списка
-    for item in paginator.get_page_items():
-        if callback_class == SubcategoryCallback:
-            callback_data = callback_class(
-                id=item.id,
-                page=1,
-                category_id=parent_id
-            ).pack()
-        elif callback_class == ProductCallback:
-            callback_data = callback_class(
-                id=item.id,
-                page=1,
-                subcategory_id=parent_id
-            ).pack()
-        else:
-            callback_data = callback_class(
-                id=item.id,
-                page=1
-            ).pack()
-            
+    for item in page.items:
         keyboard.add(InlineKeyboardButton(
             text=item.name,
-            callback_data=callback_data
+            callback_data=make_callback(callback_class, parent_id, id=item.id)
         ))
     
     # Устанавливаем по одной кнопке в ряд для элементов списка
@@ -52,52 +60,16 @@ def create_list_keyboard(items, page: int, callback_class, parent_id: int = None
     
     # Формируем ряд с кнопками навигации
     nav_buttons = []
-    if paginator.has_previous():
-        if callback_class == SubcategoryCallback:
-            nav_callback = callback_class(
-                id=None,
-                page=paginator.page-1,
-                category_id=parent_id
-            ).pack()
-        elif callback_class == ProductCallback:
-            nav_callback = callback_class(
-                id=None,
-                page=paginator.page-1,
-                subcategory_id=parent_id
-            ).pack()
-        else:
-            nav_callback = callback_class(
-                id=None,
-                page=paginator.page-1
-            ).pack()
-            
+    if page.has_previous:
         nav_buttons.append(InlineKeyboardButton(
             text="◀️ Назад",
-            callback_data=nav_callback
+            callback_data=make_callback(callback_class, parent_id, before=page.previous_cursor, **(nav_fields or {}))
         ))
         
-    if paginator.has_next():
-        if callback_class == SubcategoryCallback:
-            nav_callback = callback_class(
-                id=None,
-                page=paginator.page+1,
-                category_id=parent_id
-            ).pack()
-        elif callback_class == ProductCallback:
-            nav_callback = callback_class(
-                id=None,
-                page=paginator.page+1,
-                subcategory_id=parent_id
-            ).pack()
-        else:
-            nav_callback = callback_class(
-                id=None,
-                page=paginator.page+1
-            ).pack()
-            
+    if page.has_next:
         nav_buttons.append(InlineKeyboardButton(
             text="Вперед ▶️",
-            callback_data=nav_callback
+            callback_data=make_callback(callback_class, parent_id, after=page.next_cursor, **(nav_fields or {}))
         ))
     
     # Добавляем кнопки навигации в один ряд
@@ -114,35 +86,127 @@ def create_list_keyboard(items, page: int, callback_class, parent_id: int = None
     return keyboard.as_markup()
 
 
-def get_category_keyboard(categories, page: int):
-    """Создает клавиатуру для списка категорий"""
+def get_category_keyboard(page: Page):
+    """Создает клавиатуру для страницы категорий"""
     return create_list_keyboard(
-        items=categories,
         page=page,
         callback_class=CategoryCallback
     )
 
 
-def get_subcategory_keyboard(subcategories, page: int, category_id: int):
-    """Создает клавиатуру для списка подкатегорий"""
+def get_subcategory_keyboard(page: Page, category_id: int):
+    """Создает клавиатуру для страницы подкатегорий"""
     return create_list_keyboard(
-        items=subcategories,
         page=page,
         callback_class=SubcategoryCallback,
         parent_id=category_id,
         back_button_text="↩️ К категориям",
-        back_callback=CategoryCallback(id=None, page=1).pack()
+        back_callback=CategoryCallback(id=None).pack()
     )
 
 
-def get_product_keyboard(products, page: int, subcategory_id: int, category_id: int = None):
-    """Создает клавиатуру для списка товаров"""
+def get_product_keyboard(page: Page, subcategory_id: int, category_id: int = None):
+    """Создает клавиатуру для страницы товаров"""
     return create_list_keyboard(
-        items=products,
         page=page,
         callback_class=ProductCallback,
         parent_id=subcategory_id,
         back_button_text="↩️ К подкатегориям",
-        back_callback=SubcategoryCallback(id=None, page=1, category_id=category_id).pack()
+        back_callback=SubcategoryCallback(id=None, category_id=category_id).pack(),
+        nav_fields={"category_id": category_id}
     )
 
+
+async def get_cached_keyboard(
+    key: tuple,
+    load_page: Callable[[], Awaitable[Page]],
+    build: Callable[[Page], InlineKeyboardMarkup]
+) -> InlineKeyboardMarkup:
+    """
+    Возвращает готовую клавиатуру страницы или строит и запоминает её
+
+    Клавиатуры зависят только от версии каталога и параметров страницы,
+    поэтому при повторном переходе на страницу объекты не создаются заново.
+    Возвращаемую клавиатуру нельзя изменять.
+
+    Args:
+        key: уровень каталога и параметры страницы
+        load_page: загрузка страницы при промахе
+        build: построение клавиатуры по странице
+
+    Returns:
+        InlineKeyboardMarkup: клавиатура страницы
+    """
+    cache_key = (await catalog_cache.aget_version(), *key)
+    keyboard = keyboard_cache.get(cache_key)
+    if keyboard is None:
+        keyboard = build(await load_page())
+        keyboard_cache.set(cache_key, keyboard)
+    return keyboard
+
+
+async def category_page_keyboard(after: int = None, before: int = None) -> InlineKeyboardMarkup:
+    """Возвращает клавиатуру страницы категорий"""
+    return await get_cached_keyboard(
+        ("category", after, before),
+        lambda: get_category_page(after, before),
+        get_category_keyboard
+    )
+
+
+async def subcategory_page_keyboard(category_id: int, after: int = None, before: int = None) -> InlineKeyboardMarkup:
+    """Возвращает клавиатуру страницы подкатегорий"""
+    return await get_cached_keyboard(
+        ("subcategory", category_id, after, before),
+        lambda: get_subcategory_page(category_id, after, before),
+        lambda page: get_subcategory_keyboard(page, category_id)
+    )
+
+
+async def product_page_keyboard(
+    subcategory_id: int, category_id: int = None, after: int = None, before: int = None
+) -> InlineKeyboardMarkup:
+    """Возвращает клавиатуру страницы товаров"""
+    return await get_cached_keyboard(
+        ("product", subcategory_id, category_id, after, before),
+        lambda: get_product_page(subcategory_id, after, before),
+        lambda page: get_product_keyboard(page, subcategory_id, category_id)
+    )
+
+
+async def warm_keyboard_cache(pages: int = KEYBOARD_WARMUP_PAGES) -> None:
+    """
+    Заполняет кэш клавиатурами первых страниц каталога
+
+    Для каждого списка (категорий, подкатегорий каждой категории и товаров
+    каждой подкатегории) строятся клавиатуры первых pages страниц.
+
+    Args:
+        pages: количество страниц каждого списка (0 — не прогревать)
+    """
+    if pages <= 0:
+        return
+
+    count = 0
+    after = None
+    for _ in range(pages):
+        await category_page_keyboard(after=after)
+        count += 1
+        categories = await get_category_page(after)
+        for category in categories.items:
+            sub_after = None
+            for _ in range(pages):
+                await subcategory_page_keyboard(category.id, after=sub_after)
+                count += 1
+                subcategories = await get_subcategory_page(category.id, sub_after)
+                for subcategory in subcategories.items:
+                    await product_page_keyboard(subcategory.id, category.id)
+                    count += 1
+                if not subcategories.has_next:
+                    break
+                sub_after = subcategories.next_cursor
+        if not categories.has_next:
+            break
+        after = categories.next_cursor
+
+    logger.info("Кэш клавиатур каталога прогрет: %s клавиатур", count)
@@ -1,15 +1,243 @@
+import atexit
+import copy
+import json
 import logging
+import os
+import queue
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+from typing import Dict, List
 
-# Настройка логирования
-LOG_FILE = "project.log"
-
-logging.basicConfig(
-    level=logging.INFO,  # Уровень логов: DEBUG, INFO, WARNING, ERROR, CRITICAL
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",  # Формат логов
-    handlers=[
-        logging.FileHandler(LOG_FILE, mode="a", encoding="utf-8"),  # Запись в файл
-        logging.StreamHandler()  # Вывод в консоль (можно убрать, если не нужно)
-    ]
+from bot.config import (
+    LOG_FILE, LOG_LEVEL, LOG_LEVELS, LOG_FORMAT, LOG_MAX_BYTES, LOG_BACKUP_COUNT,
+    LOG_ROTATE_WHEN, LOG_QUEUE_SIZE
 )
 
-logger = logging.getLogger(__name__)
\ No newline at end of file
+# Настройка логирования
+#
+# Обработчики вызывают logger только для постановки записи в очередь, а
+# запись в файл и консоль выполняет отдельный поток QueueListener, поэтому
+# дисковый ввод-вывод не блокирует event loop. При переполнении очереди
+# записи отбрасываются, а не ждут освобождения места.
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Стандартные атрибуты LogRecord; всё остальное (extra=...) попадает в JSON
+RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+logger = logging.getLogger("bot")
+
+
+class JsonFormatter(logging.Formatter):
+    """Форматирует запись лога как одну строку JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "module": record.module,
+            "message": record.getMessage(),
+            "process": record.process,
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        for name, value in vars(record).items():
+            if name not in RECORD_ATTRIBUTES and not name.startswith("_"):
+                entry[name] = value
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def parse_levels(value: str) -> Dict[str, int]:
+    """
+    Разбирает уровни логирования по модулям
+
+    Args:
+        value: строка вида "aiogram.event=WARNING,bot.handlers.cart=DEBUG"
+
+    Returns:
+        Dict[str, int]: имя модуля или логгера -> уровень
+    """
+    levels = {}
+    for item in value.split(","):
+        name, _, level = item.strip().partition("=")
+        if name and level:
+            levels[name.strip()] = logging.getLevelName(level.strip().upper())
+    return {name: level for name, level in levels.items() if isinstance(level, int)}
+
+
+class ModuleLevelFilter(logging.Filter):
+    """
+    Отбрасывает записи ниже уровня, настроенного для их модуля
+
+    Модули бота пишут в общий логгер "bot", поэтому модуль определяется по
+    пути к файлу (bot/handlers/cart.py -> bot.handlers.cart). Для остальных
+    логгеров используется имя логгера. Применяется самая длинная подходящая
+    настройка, без неё — уровень по умолчанию.
+    """
+
+    def __init__(self, levels: Dict[str, int], default: int):
+        super().__init__()
+        self.levels = levels
+        self.default = default
+        self._modules: Dict[str, str] = {}
+        self._resolved: Dict[str, int] = {}
+
+    def _module_name(self, pathname: str) -> str:
+        """Возвращает имя модуля по пути к файлу"""
+        name = self._modules.get(pathname)
+        if name is None:
+            relative = os.path.relpath(os.path.splitext(pathname)[0], BASE_DIR)
+            name = self._modules[pathname] = relative.replace(os.sep, ".")
+        return name
+
+    def _level(self, name: str) -> int:
+        """Возвращает уровень для модуля или логгера"""
+        level = self._resolved.get(name)
+        if level is None:
+            level, prefix = self.default, name
+            while prefix:
+                if prefix in self.levels:
+                    level = self.levels[prefix]
+                    break
+                prefix = prefix.rpartition(".")[0]
+            self._resolved[name] = level
+        return level
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        name = self._module_name(record.pathname) if record.name == logger.name else record.name
+        return record.levelno >= self._level(name)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Ставит записи в очередь без ожидания
+
+    В очередь передаётся копия записи с уже подставленными аргументами и
+    отформатированным исключением: так её можно передать в другой процесс,
+    а изменение аргументов после вызова logger не влияет на текст.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def create_handlers() -> List[logging.Handler]:
+    """
+    Создаёт обработчики вывода: файл с ротацией и консоль
+
+    Файл ротируется по размеру (LOG_MAX_BYTES) или, если задан
+    LOG_ROTATE_WHEN (например, midnight), по времени.
+    """
+    if LOG_ROTATE_WHEN:
+        file_handler = TimedRotatingFileHandler(
+            LOG_FILE, when=LOG_ROTATE_WHEN, backupCount=LOG_BACKUP_COUNT, encoding="utf-8", delay=True
+        )
+    else:
+        file_handler = RotatingFileHandler(
+            LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8", delay=True
+        )
+    formatter = JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT)
+    handlers = [file_handler, logging.StreamHandler()]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    return handlers
+
+
+_handlers: List[logging.Handler] = []
+_listeners: List[QueueListener] = []
+
+
+def listen(log_queue) -> QueueListener:
+    """
+    Запускает поток, записывающий логи из очереди
+
+    Используется и для очереди текущего процесса, и для очередей
+    процессов-воркеров (см. Supervisor).
+
+    Args:
+        log_queue: очередь записей (queue.Queue или multiprocessing.Queue)
+
+    Returns:
+        QueueListener: запущенный слушатель
+    """
+    if not _handlers:
+        _handlers.extend(create_handlers())
+    listener = QueueListener(log_queue, *_handlers, respect_handler_level=True)
+    listener.start()
+    _listeners.append(listener)
+    return listener
+
+
+def stop_listener(listener: QueueListener) -> None:
+    """Записывает оставшиеся в очереди слушателя логи и останавливает его"""
+    if listener in _listeners:
+        _listeners.remove(listener)
+        listener.stop()
+
+
+def stop_logging() -> None:
+    """Записывает оставшиеся логи и останавливает потоки записи"""
+    while _listeners:
+        _listeners.pop().stop()
+    while _handlers:
+        _handlers.pop().close()
+
+
+def setup_logging(log_queue=None) -> None:
+    """
+    Настраивает логирование через очередь
+
+    Корневой логгер получает только NonBlockingQueueHandler. Без log_queue
+    создаётся очередь процесса и поток записи; процессы-воркеры передают
+    очередь супервизора, и их логи пишет его поток.
+
+    Args:
+        log_queue: внешняя очередь для записей (для процессов-воркеров)
+    """
+    stop_logging()
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+
+    default = logging.getLevelName(LOG_LEVEL)
+    if not isinstance(default, int):
+        default = logging.INFO
+    levels = parse_levels(LOG_LEVELS)
+
+    root.setLevel(default)
+    for name, level in levels.items():
+        logging.getLogger(name).setLevel(level)
+    # Модули бота пишут в общий логгер, точный уровень проверяет ModuleLevelFilter
+    logger.setLevel(min([default, *levels.values()]))
+
+    if log_queue is None:
+        log_queue = queue.Queue(LOG_QUEUE_SIZE)
+        listen(log_queue)
+    handler = NonBlockingQueueHandler(log_queue)
+    handler.addFilter(ModuleLevelFilter(levels, default))
+    root.addHandler(handler)
+
+
+setup_logging()
+atexit.register(stop_logging)
@@ -0,0 +1,85 @@
+import asyncio
+import json
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bot.benchmark import Benchmark
+from bot.logging_config import logger
+
+
+class Command(BaseCommand):
+    help = "Нагрузочный тест: синтетические пользователи проходят сценарий покупки без обращения к Telegram"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000, help="Количество синтетических пользователей")
+        parser.add_argument("--concurrency", type=int, default=50, help="Сколько пользователей работают одновременно")
+        parser.add_argument("--seed", type=int, default=0, help="Начальное значение генератора случайных чисел")
+        parser.add_argument("--latency", type=float, default=0, help="Задержка ответов Bot API в миллисекундах")
+        parser.add_argument("--max-products", type=int, default=3, help="Максимум товаров в корзине пользователя")
+        parser.add_argument(
+            "--rate-limit", action="store_true", help="Пропускать запросы к Bot API через ограничитель бота"
+        )
+        parser.add_argument(
+            "--flood", action="store_true", help="Отвечать 429 на запросы сверх лимитов RATE_LIMIT_*, как Telegram"
+        )
+        parser.add_argument("--flood-rate", type=float, default=0, help="Вероятность случайного ответа 429")
+        parser.add_argument("--json", dest="json_path", help="Сохранить результаты в JSON-файл")
+        parser.add_argument("--verbose", action="store_true", help="Не отключать INFO-логи бота во время теста")
+
+    def handle(self, *args, **options):
+        if options["users"] < 1 or options["concurrency"] < 1:
+            raise CommandError("--users и --concurrency должны быть положительными")
+        if not options["verbose"]:
+            logging.getLogger().setLevel(logging.WARNING)
+            logger.setLevel(logging.WARNING)
+
+        benchmark = Benchmark(
+            users=options["users"],
+            concurrency=options["concurrency"],
+            seed=options["seed"],
+            latency=options["latency"] / 1000,
+            max_products=options["max_products"],
+            rate_limit=options["rate_limit"],
+            flood=options["flood"],
+            flood_rate=options["flood_rate"],
+        )
+        result = asyncio.run(benchmark.run())
+
+        if options["json_path"]:
+            with open(options["json_path"], "w", encoding="utf-8") as f:
+                json.dump(result, f, ensure_ascii=False, indent=2)
+        self.write_report(result)
+
+    def write_report(self, result: dict):
+        self.stdout.write(self.style.SUCCESS(
+            f"Пользователей: {result['users']}, одновременно: {result['concurrency']}, "
+            f"время: {result['elapsed']:.2f} с"
+        ))
+        self.stdout.write(
+            f"Апдейтов: {result['updates']} ({result['updates_per_second']:.1f}/с), "
+            f"сценариев: {result['journeys_per_second']:.1f}/с, "
+            f"незавершённых сценариев: {result['failed_journeys']}, ошибок: {result['errors']}\n"
+        )
+
+        self.stdout.write(
+            f"{'Обработчик':<40} {'кол-во':>7} {'p50 мс':>8} {'p95 мс':>8} {'p99 мс':>8} {'макс мс':>8} {'БД ср.':>7}"
+        )
+        for name, row in sorted(result["handlers"].items(), key=lambda item: item[1]["p95"], reverse=True):
+            self.stdout.write(
+                f"{name:<40} {row['count']:>7} {row['p50'] * 1000:>8.2f} {row['p95'] * 1000:>8.2f} "
+                f"{row['p99'] * 1000:>8.2f} {row['max'] * 1000:>8.2f} {row['avg_queries']:>7.1f}"
+            )
+
+        journey = result["journey"]
+        self.stdout.write(
+            f"\nСценарий: p50 {journey['duration']['p50'] * 1000:.1f} мс, "
+            f"p95 {journey['duration']['p95'] * 1000:.1f} мс, p99 {journey['duration']['p99'] * 1000:.1f} мс"
+        )
+        self.stdout.write(
+            f"Запросов к БД на сценарий: среднее {journey['queries']['avg']:.1f}, "
+            f"p95 {journey['queries']['p95']:.0f}, максимум {journey['queries']['max']:.0f}"
+        )
+        self.stdout.write(f"Запросов к Bot API на сценарий: среднее {journey['api_calls']['avg']:.1f}")
+        if result["flood_errors"] or result["retries"]:
+            self.stdout.write(f"Ответов 429: {result['flood_errors']}, повторов запросов: {result['retries']}")
@@ -0,0 +1,65 @@
+import json
+from urllib.error import URLError
+from urllib.request import urlopen
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bot.config import METRICS_HOST, METRICS_PORT
+
+
+class Command(BaseCommand):
+    help = "Показывает метрики запущенного бота: время обработчиков, запросы к БД и к Bot API"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default=METRICS_HOST, help="Адрес сервера метрик бота")
+        parser.add_argument(
+            "--port", type=int, action="append",
+            help="Порт сервера метрик (можно указать несколько для процессов-воркеров)"
+        )
+        parser.add_argument("--raw", action="store_true", help="Вывести метрики в формате Prometheus")
+        parser.add_argument("--timeout", type=float, default=5, help="Таймаут запроса в секундах")
+
+    def fetch(self, url: str, timeout: float) -> bytes:
+        try:
+            with urlopen(url, timeout=timeout) as response:
+                return response.read()
+        except (URLError, OSError) as e:
+            raise CommandError(f"Не удалось получить метрики с {url}: {e}")
+
+    def handle(self, *args, **options):
+        for port in options["port"] or [METRICS_PORT]:
+            base_url = f"http://{options['host']}:{port}"
+            if options["raw"]:
+                self.stdout.write(self.fetch(f"{base_url}/metrics", options["timeout"]).decode())
+                continue
+
+            snapshot = json.loads(self.fetch(f"{base_url}/metrics.json", options["timeout"]))
+            self.stdout.write(self.style.SUCCESS(f"Метрики {base_url}"))
+            self.write_handlers(snapshot["handlers"])
+            self.write_api(snapshot["api"])
+            self.stdout.write(
+                f"Запросов к БД всего: {snapshot['db_queries']}, время {snapshot['db_time'] * 1000:.1f} мс\n"
+            )
+
+    def write_handlers(self, handlers: dict):
+        self.stdout.write(
+            f"{'Обработчик':<40} {'кол-во':>7} {'p50 мс':>8} {'p95 мс':>8} {'p99 мс':>8} "
+            f"{'БД ср.':>7} {'БД макс':>8} {'БД мс':>7} {'API мс':>7} {'ошибки':>7} {'бюджет':>7}"
+        )
+        for name, row in sorted(handlers.items(), key=lambda item: item[1]["p95"], reverse=True):
+            self.stdout.write(
+                f"{name:<40} {row['count']:>7} {row['p50'] * 1000:>8.1f} {row['p95'] * 1000:>8.1f} "
+                f"{row['p99'] * 1000:>8.1f} {row['avg_queries']:>7.1f} {row['max_queries']:>8} "
+                f"{row['avg_db_time'] * 1000:>7.1f} {row['avg_api_time'] * 1000:>7.1f} "
+                f"{row['errors']:>7} {row['budget_exceeded']:>7}"
+            )
+        self.stdout.write("")
+
+    def write_api(self, api: dict):
+        self.stdout.write(f"{'Метод Bot API':<40} {'кол-во':>7} {'p50 мс':>8} {'p95 мс':>8} {'p99 мс':>8} {'ошибки':>7} {'повторы':>7} {'ожид. p95':>9}")
+        for name, row in sorted(api.items(), key=lambda item: item[1]["count"], reverse=True):
+            self.stdout.write(
+                f"{name:<40} {row['count']:>7} {row['p50'] * 1000:>8.1f} {row['p95'] * 1000:>8.1f} "
+                f"{row['p99'] * 1000:>8.1f} {row['errors']:>7} {row['retries']:>7} {row['wait_p95'] * 1000:>9.1f}"
+            )
+        self.stdout.write("")
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from bot.database.query_plans import disable_seq_scans, explain, find_seq_scans, hot_queries, seed
+
+
+class Command(BaseCommand):
+    help = (
+        "Проверяет планы горячих запросов бота: создаёт тестовую БД, заполняет её "
+        "и завершается с ошибкой, если какой-то запрос читает таблицу целиком"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=5000, help="Количество товаров в тестовой БД")
+        parser.add_argument("--seed", type=int, default=0, help="Начальное значение генератора случайных чисел")
+        parser.add_argument("--keepdb", action="store_true", help="Не удалять тестовую БД после проверки")
+        parser.add_argument("--plans", action="store_true", help="Вывести планы всех запросов")
+
+    def handle(self, *args, **options):
+        if options["products"] < 1:
+            raise CommandError("--products должно быть положительным")
+
+        # Проверка идёт на отдельной тестовой БД (как у manage.py test), рабочие данные не затрагиваются
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options["keepdb"])
+        try:
+            ids = seed(options["products"], options["seed"])
+            failures = self.check_plans(ids, options["plans"])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options["keepdb"])
+
+        if failures:
+            raise CommandError(f"Полный просмотр таблиц в запросах: {', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS("Все запросы используют индексы"))
+
+    def check_plans(self, ids: dict, show_plans: bool) -> list:
+        """Выводит результат проверки каждого запроса и возвращает имена запросов с полным просмотром"""
+        disable_seq_scans()
+        failures = []
+        for name, query in hot_queries(ids):
+            plan = explain(query)
+            tables = find_seq_scans(plan)
+            if tables:
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(f"{name:<45} полный просмотр: {', '.join(tables)}"))
+            else:
+                self.stdout.write(f"{name:<45} ok")
+            if show_plans or tables:
+                self.stdout.write(f"    {plan}".replace("\n", "\n    "))
+        return failures
@@ -0,0 +1,27 @@
+from datetime import datetime, time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from bot.excel import export_orders
+
+
+class Command(BaseCommand):
+    help = "Выгружает заказы за период в CSV или XLSX"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="date_from", required=True, help="Начальная дата (YYYY-MM-DD)")
+        parser.add_argument("--to", dest="date_to", required=True, help="Конечная дата включительно (YYYY-MM-DD)")
+        parser.add_argument("--output", required=True, help="Файл выгрузки (.csv или .xlsx)")
+
+    def handle(self, *args, **options):
+        try:
+            date_from = datetime.strptime(options["date_from"], "%Y-%m-%d").date()
+            date_to = datetime.strptime(options["date_to"], "%Y-%m-%d").date()
+        except ValueError:
+            raise CommandError("Даты нужно указывать в формате YYYY-MM-DD")
+
+        start = timezone.make_aware(datetime.combine(date_from, time.min))
+        end = timezone.make_aware(datetime.combine(date_to + timedelta(days=1), time.min))
+        count = export_orders(start, end, options["output"])
+        self.stdout.write(self.style.SUCCESS(f"Выгружено заказов: {count} в {options['output']}"))
@@ -1,35 +1,118 @@
-import logging
 import asyncio
-from django.core.management.base import BaseCommand
-from aiogram import Bot, Dispatcher
+import secrets
+from django.core.management.base import BaseCommand, CommandError
 
-from bot.handlers.start import router as start_router
-from bot.handlers.catalog import router as catalog_router
-from bot.handlers.cart import router as cart_router
-from bot.handlers.order import router as order_router
-from bot.handlers.payment import router as payment_router
-from bot.handlers.faq import router as faq_router
-from bot.config import BOT_TOKEN
+from bot.dispatcher import create_dispatcher
+from bot.runtime import bot_runtime
+from bot.webhook import run_webhook
+from bot.supervisor import Supervisor, file_source, polling_source
+from bot.config import (
+    WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_HOST, WEBHOOK_PORT,
+    UPDATE_WORKERS, UPDATE_QUEUE_SIZE, BOT_PROCESSES
+)
 
 
 class Command(BaseCommand):
     help = "Запускает Telegram-бота"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--webhook", action="store_true",
+            help="Принимать апдейты через вебхук вместо polling"
+        )
+        parser.add_argument("--host", default=WEBHOOK_HOST, help="Адрес сервера вебхука")
+        parser.add_argument("--port", type=int, default=WEBHOOK_PORT, help="Порт сервера вебхука")
+        parser.add_argument("--path", default=WEBHOOK_PATH, help="Путь вебхука")
+        parser.add_argument(
+            "--url", default=WEBHOOK_URL,
+            help="Публичный адрес для регистрации вебхука в Telegram"
+        )
+        parser.add_argument(
+            "--no-set-webhook", action="store_true",
+            help="Не регистрировать вебхук в Telegram (для локальной проверки)"
+        )
+        parser.add_argument(
+            "--workers", type=int, default=UPDATE_WORKERS,
+            help="Количество воркеров обработки апдейтов"
+        )
+        parser.add_argument(
+            "--queue-size", type=int, default=UPDATE_QUEUE_SIZE,
+            help="Размер очереди апдейтов каждого воркера"
+        )
+        parser.add_argument(
+            "--processes", type=int, default=BOT_PROCESSES,
+            help="Количество процессов-воркеров; апдейты распределяются по chat_id"
+        )
+        parser.add_argument(
+            "--updates-file",
+            help="Читать апдейты из файла (JSON на строку) вместо Telegram"
+        )
+        parser.add_argument(
+            "--fake-api", action="store_true",
+            help="Отвечать на запросы к Bot API локально, без обращения к Telegram"
+        )
+
     def handle(self, *args, **options):
-        asyncio.run(self.start_bot())
+        if options["webhook"]:
+            asyncio.run(self.start_webhook(options))
+        elif options["processes"] > 1 or options["updates_file"]:
+            asyncio.run(self.start_supervisor(options))
+        else:
+            asyncio.run(self.start_bot())
 
     async def start_bot(self):
-        logging.basicConfig(level=logging.INFO)
-
-        bot = Bot(BOT_TOKEN)
-        dp = Dispatcher()
-        dp.include_router(start_router)
-        dp.include_router(catalog_router)
-        dp.include_router(cart_router)
-        dp.include_router(order_router)
-        dp.include_router(payment_router)
-        dp.include_router(faq_router)
-
-        self.stdout.write(self.style.SUCCESS("Бот запущен..."))
-        await bot.delete_webhook(drop_pending_updates=True)
-        await dp.start_polling(bot)
+        dp = create_dispatcher()
+
+        async with bot_runtime.running() as bot:
+            self.stdout.write(self.style.SUCCESS("Бот запущен..."))
+            await bot.delete_webhook(drop_pending_updates=True)
+            await dp.start_polling(bot, close_bot_session=False)
+
+    async def start_webhook(self, options):
+        url = None if options["no_set_webhook"] else options["url"]
+        if not url and not options["no_set_webhook"]:
+            raise CommandError("Укажите WEBHOOK_URL или --url, либо запустите с --no-set-webhook")
+
+        secret = WEBHOOK_SECRET
+        if not secret:
+            if not url:
+                raise CommandError("Для локального режима задайте WEBHOOK_SECRET")
+            secret = secrets.token_urlsafe(32)
+
+        dp = create_dispatcher()
+
+        async with bot_runtime.running() as bot:
+            self.stdout.write(self.style.SUCCESS(
+                f"Бот запущен в режиме вебхука на {options['host']}:{options['port']}{options['path']}"
+            ))
+            await run_webhook(
+                dp, bot,
+                host=options["host"],
+                port=options["port"],
+                path=options["path"],
+                secret=secret,
+                url=url,
+                workers=options["workers"],
+                queue_size=options["queue_size"]
+            )
+
+    async def start_supervisor(self, options):
+        supervisor = Supervisor(
+            processes=options["processes"],
+            tasks=options["workers"],
+            queue_size=options["queue_size"],
+            fake_api=options["fake_api"]
+        )
+
+        if options["updates_file"]:
+            self.stdout.write(self.style.SUCCESS(
+                f"Обработка апдейтов из {options['updates_file']} в {options['processes']} процессах..."
+            ))
+            await supervisor.run(file_source(options["updates_file"]))
+            return
+
+        allowed_updates = create_dispatcher().resolve_used_update_types()
+        async with bot_runtime.running() as bot:
+            self.stdout.write(self.style.SUCCESS(f"Бот запущен в {options['processes']} процессах..."))
+            await bot.delete_webhook(drop_pending_updates=True)
+            await supervisor.run(polling_source(bot, allowed_updates))
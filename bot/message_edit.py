@@ -0,0 +1,63 @@
+from typing import Optional
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import InlineKeyboardMarkup, Message
+
+from bot.logging_config import logger
+
+
+def _dump_markup(markup: Optional[InlineKeyboardMarkup]) -> Optional[dict]:
+    """Приводит клавиатуру к словарю для сравнения (пустые поля не учитываются)"""
+    return markup.model_dump(exclude_none=True) if markup is not None else None
+
+
+def _current_text(message: Message, parse_mode: Optional[str]) -> Optional[str]:
+    """Текст или подпись сообщения в той же разметке, в которой передаётся новый текст"""
+    if parse_mode == "HTML":
+        return message.html_text
+    return message.text if message.text is not None else message.caption
+
+
+async def edit_message(
+    message: Message,
+    text: Optional[str] = None,
+    reply_markup: Optional[InlineKeyboardMarkup] = None,
+    parse_mode: Optional[str] = None
+) -> bool:
+    """
+    Изменяет сообщение бота на месте, отправляя в Bot API только разницу
+
+    Новый текст и клавиатура сравниваются с тем, что уже показано в сообщении
+    (message из апдейта). Если ничего не изменилось, запрос не отправляется;
+    если изменилась только клавиатура — вызывается editMessageReplyMarkup.
+    Для сообщений с фото меняется подпись. Ответ "message is not modified"
+    (сообщение уже изменено параллельным нажатием) не считается ошибкой.
+
+    Args:
+        message: изменяемое сообщение
+        text: новый текст или подпись (None — не менять)
+        reply_markup: новая клавиатура (None — убрать клавиатуру)
+        parse_mode: режим разметки текста
+
+    Returns:
+        bool: было ли сообщение изменено
+    """
+    text_changed = text is not None and text != _current_text(message, parse_mode)
+    markup_changed = _dump_markup(reply_markup) != _dump_markup(message.reply_markup)
+    if not text_changed and not markup_changed:
+        logger.debug("Сообщение %s не изменилось, редактирование пропущено", message.message_id)
+        return False
+
+    try:
+        if not text_changed:
+            await message.edit_reply_markup(reply_markup=reply_markup)
+        elif message.text is None:
+            await message.edit_caption(caption=text, reply_markup=reply_markup, parse_mode=parse_mode)
+        else:
+            await message.edit_text(text, reply_markup=reply_markup, parse_mode=parse_mode)
+    except TelegramBadRequest as e:
+        if "message is not modified" not in str(e):
+            raise
+        logger.debug("Сообщение %s уже изменено: %s", message.message_id, e)
+        return False
+    return True
@@ -0,0 +1,298 @@
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+from aiohttp import web
+from django.db.backends.signals import connection_created
+
+from bot.config import METRICS_HOST, METRICS_PORT
+from bot.logging_config import logger
+
+
+# Границы корзин гистограмм
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    """Гистограмма значений с фиксированными корзинами (как в Prometheus)"""
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        """Добавляет значение"""
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        if value > self.max:
+            self.max = value
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """Возвращает накопленные количества по верхним границам корзин"""
+        result, total = [], 0
+        for bound, count in zip((*self.buckets, "+Inf"), self.counts):
+            total += count
+            result.append((str(bound), total))
+        return result
+
+    def quantile(self, q: float) -> float:
+        """
+        Оценивает квантиль по корзинам с линейной интерполяцией
+
+        Args:
+            q: квантиль от 0 до 1
+
+        Returns:
+            float: оценка значения (не больше максимального наблюдения)
+        """
+        if not self.count:
+            return 0.0
+        rank, total, lower = q * self.count, 0, 0.0
+        for bound, count in zip(self.buckets, self.counts):
+            if count and total + count >= rank:
+                return min(lower + (bound - lower) * (rank - total) / count, self.max)
+            total += count
+            lower = bound
+        return self.max
+
+
+class UpdateStats:
+    """Статистика одного апдейта: обработчик, запросы к БД и к Bot API"""
+
+    __slots__ = ("handler", "queries", "db_time", "api_calls", "api_time")
+
+    def __init__(self):
+        self.handler = "unhandled"
+        self.queries = 0
+        self.db_time = 0.0
+        self.api_calls = 0
+        self.api_time = 0.0
+
+
+# Статистика текущего апдейта; sync_to_async передаёт контекст в поток БД
+current_stats: ContextVar[Optional[UpdateStats]] = ContextVar("current_stats", default=None)
+
+
+class MetricsRegistry:
+    """
+    Метрики бота в памяти процесса
+
+    Гистограммы хранятся по паре (метрика, значение метки). Значения
+    добавляются и из event loop, и из потоков БД, поэтому изменения
+    защищены блокировкой.
+    """
+
+    # Метрика -> (описание, имя метки, корзины)
+    HISTOGRAMS = {
+        "bot_handler_duration_seconds": ("Время обработки апдейта", "handler", LATENCY_BUCKETS),
+        "bot_handler_db_queries": ("Количество запросов к БД за апдейт", "handler", QUERY_BUCKETS),
+        "bot_handler_db_duration_seconds": ("Время запросов к БД за апдейт", "handler", LATENCY_BUCKETS),
+        "bot_handler_api_duration_seconds": ("Время запросов к Bot API за апдейт", "handler", LATENCY_BUCKETS),
+        "bot_api_request_duration_seconds": ("Время запросов к Bot API", "method", LATENCY_BUCKETS),
+        "bot_api_wait_seconds": ("Время ожидания запросов к Bot API в ограничителе", "method", LATENCY_BUCKETS),
+    }
+    COUNTERS = {
+        "bot_handler_errors_total": ("Количество ошибок в обработчиках", "handler"),
+        "bot_api_errors_total": ("Количество ошибок запросов к Bot API", "method"),
+        "bot_api_retries_total": ("Количество повторов запросов к Bot API", "method"),
+        "bot_query_budget_exceeded_total": ("Количество превышений бюджета запросов к БД", "handler"),
+    }
+
+    def __init__(self):
+        self.histograms: Dict[Tuple[str, str], Histogram] = {}
+        self.counters: Dict[Tuple[str, str], int] = {}
+        self.db_queries = 0
+        self.db_time = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, label: str, value: float) -> None:
+        """Добавляет значение в гистограмму метрики name с меткой label"""
+        with self._lock:
+            histogram = self.histograms.get((name, label))
+            if histogram is None:
+                histogram = self.histograms[(name, label)] = Histogram(self.HISTOGRAMS[name][2])
+            histogram.observe(value)
+
+    def increment(self, name: str, label: str) -> None:
+        """Увеличивает счётчик метрики name с меткой label"""
+        with self._lock:
+            self.counters[(name, label)] = self.counters.get((name, label), 0) + 1
+
+    def record_query(self, duration: float) -> None:
+        """Учитывает запрос к БД"""
+        with self._lock:
+            self.db_queries += 1
+            self.db_time += duration
+
+    def record_update(self, stats: UpdateStats, duration: float) -> None:
+        """Учитывает обработанный апдейт"""
+        self.observe("bot_handler_duration_seconds", stats.handler, duration)
+        self.observe("bot_handler_db_queries", stats.handler, stats.queries)
+        self.observe("bot_handler_db_duration_seconds", stats.handler, stats.db_time)
+        self.observe("bot_handler_api_duration_seconds", stats.handler, stats.api_time)
+
+    def render(self) -> str:
+        """Возвращает метрики в текстовом формате Prometheus"""
+        lines = []
+        with self._lock:
+            for name, (description, label_name, _) in self.HISTOGRAMS.items():
+                lines += [f"# HELP {name} {description}", f"# TYPE {name} histogram"]
+                for (metric, label), histogram in sorted(self.histograms.items()):
+                    if metric != name:
+                        continue
+                    labels = f'{label_name}="{escape_label(label)}"'
+                    for bound, count in histogram.cumulative():
+                        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+                    lines.append(f"{name}_sum{{{labels}}} {histogram.sum}")
+                    lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+            for name, (description, label_name) in self.COUNTERS.items():
+                lines += [f"# HELP {name} {description}", f"# TYPE {name} counter"]
+                for (metric, label), value in sorted(self.counters.items()):
+                    if metric == name:
+                        lines.append(f'{name}{{{label_name}="{escape_label(label)}"}} {value}')
+            lines += [
+                "# HELP bot_db_queries_total Количество запросов к БД",
+                "# TYPE bot_db_queries_total counter",
+                f"bot_db_queries_total {self.db_queries}",
+                "# HELP bot_db_query_duration_seconds_total Суммарное время запросов к БД",
+                "# TYPE bot_db_query_duration_seconds_total counter",
+                f"bot_db_query_duration_seconds_total {self.db_time}",
+            ]
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Возвращает сводку метрик для manage.py botstats
+
+        Returns:
+            Dict[str, Any]: обработчики и методы Bot API с количеством,
+                квантилями времени и числом запросов к БД
+        """
+        handlers, api = {}, {}
+        with self._lock:
+            for (name, label), histogram in self.histograms.items():
+                if name == "bot_handler_duration_seconds":
+                    queries = self.histograms[("bot_handler_db_queries", label)]
+                    db_time = self.histograms[("bot_handler_db_duration_seconds", label)]
+                    api_time = self.histograms[("bot_handler_api_duration_seconds", label)]
+                    handlers[label] = {
+                        **summarize(histogram),
+                        "avg_queries": queries.sum / queries.count,
+                        "max_queries": int(queries.max),
+                        "avg_db_time": db_time.sum / db_time.count,
+                        "avg_api_time": api_time.sum / api_time.count,
+                        "errors": self.counters.get(("bot_handler_errors_total", label), 0),
+                        "budget_exceeded": self.counters.get(("bot_query_budget_exceeded_total", label), 0),
+                    }
+                elif name == "bot_api_request_duration_seconds":
+                    wait = self.histograms.get(("bot_api_wait_seconds", label))
+                    api[label] = {
+                        **summarize(histogram),
+                        "errors": self.counters.get(("bot_api_errors_total", label), 0),
+                        "retries": self.counters.get(("bot_api_retries_total", label), 0),
+                        "wait_p95": wait.quantile(0.95) if wait is not None else 0.0,
+                    }
+            return {"handlers": handlers, "api": api, "db_queries": self.db_queries, "db_time": self.db_time}
+
+
+def summarize(histogram: Histogram) -> Dict[str, float]:
+    """Количество, среднее, квантили и максимум гистограммы"""
+    return {
+        "count": histogram.count,
+        "avg": histogram.sum / histogram.count if histogram.count else 0.0,
+        "p50": histogram.quantile(0.5),
+        "p95": histogram.quantile(0.95),
+        "p99": histogram.quantile(0.99),
+        "max": histogram.max,
+    }
+
+
+def escape_label(value: str) -> str:
+    """Экранирует значение метки Prometheus"""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+metrics = MetricsRegistry()
+
+
+def query_wrapper(execute, sql, params, many, context):
+    """
+    Обёртка запросов Django (connection.execute_wrapper)
+
+    Считает количество и время запросов в целом по процессу и для
+    текущего апдейта.
+    """
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - start
+        metrics.record_query(duration)
+        stats = current_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_time += duration
+
+
+def install_query_wrapper(sender, connection, **kwargs) -> None:
+    """Подключает query_wrapper к новому подключению к БД"""
+    if query_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(query_wrapper)
+
+
+connection_created.connect(install_query_wrapper, dispatch_uid="bot.metrics.install_query_wrapper")
+
+
+class MetricsServer:
+    """
+    HTTP-сервер метрик на локальном порту
+
+    /metrics — текстовый формат Prometheus, /metrics.json — сводка для
+    manage.py botstats.
+    """
+
+    def __init__(self, registry: MetricsRegistry, host: str = METRICS_HOST, port: int = METRICS_PORT):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._runner: Optional[web.AppRunner] = None
+
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        return web.Response(text=self.registry.render(), content_type="text/plain", charset="utf-8")
+
+    async def handle_snapshot(self, request: web.Request) -> web.Response:
+        return web.json_response(self.registry.snapshot())
+
+    async def start(self) -> None:
+        """Запускает сервер, если задан порт"""
+        if not self.port or self._runner is not None:
+            return
+        app = web.Application()
+        app.router.add_get("/metrics", self.handle_metrics)
+        app.router.add_get("/metrics.json", self.handle_snapshot)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        try:
+            await web.TCPSite(runner, self.host, self.port).start()
+        except OSError as e:
+            logger.error("Не удалось запустить сервер метрик на %s:%s: %s", self.host, self.port, e)
+            await runner.cleanup()
+            return
+        self._runner = runner
+        logger.info("Метрики доступны на http://%s:%s/metrics", self.host, self.port)
+
+    async def stop(self) -> None:
+        """Останавливает сервер"""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+metrics_server = MetricsServer(metrics)
@@ -0,0 +1,24 @@
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import CallbackQuery
+
+from bot.handlers.callback import parse_callback_data
+
+
+class CallbackDataMiddleware(BaseMiddleware):
+    """
+    Разбирает callback_data один раз на апдейт
+
+    Префикс ищется в таблице CALLBACKS, результат передаётся фильтрам и
+    обработчикам в аргументе callback_data (None для неизвестных данных).
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[CallbackQuery, Dict[str, Any]], Awaitable[Any]],
+        event: CallbackQuery,
+        data: Dict[str, Any]
+    ) -> Any:
+        data["callback_data"] = parse_callback_data(event.data)
+        return await handler(event, data)
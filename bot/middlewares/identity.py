@@ -0,0 +1,25 @@
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from bot.database.identity_db import get_identity
+
+
+class IdentityMiddleware(BaseMiddleware):
+    """
+    Определяет ID клиента и корзины один раз на апдейт
+
+    Результат передаётся обработчикам в аргументе identity
+    (None, если пользователь ещё не зарегистрирован).
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        user = data.get("event_from_user")
+        data["identity"] = await get_identity(user.id) if user else None
+        return await handler(event, data)
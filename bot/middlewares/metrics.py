@@ -0,0 +1,110 @@
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.middlewares.base import (
+    BaseRequestMiddleware, NextRequestMiddlewareType, Response, TelegramMethod, TelegramType
+)
+from aiogram.types import TelegramObject
+
+from bot.config import QUERY_BUDGET
+from bot.logging_config import logger
+from bot.metrics import MetricsRegistry, UpdateStats, current_stats, metrics
+
+
+def get_handler_name(data: Dict[str, Any]) -> str:
+    """Возвращает имя обработчика вида "order.process_address" """
+    callback = data["handler"].callback
+    module = getattr(callback, "__module__", "") or ""
+    return f"{module.rpartition('.')[2]}.{getattr(callback, '__name__', type(callback).__name__)}"
+
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """
+    Измеряет время обработки апдейта и запросы к БД за апдейт
+
+    Подключается первым outer middleware на dp.update, чтобы учесть и
+    запросы остальных middleware. Если обработчик выполнил больше
+    query_budget запросов к БД, пишется предупреждение — так сразу видны
+    N+1 запросы.
+    """
+
+    def __init__(self, registry: MetricsRegistry, query_budget: int = QUERY_BUDGET):
+        self.registry = registry
+        self.query_budget = query_budget
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        stats = UpdateStats()
+        token = current_stats.set(stats)
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            self.registry.increment("bot_handler_errors_total", stats.handler)
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            current_stats.reset(token)
+            self.registry.record_update(stats, duration)
+            if self.query_budget and stats.queries > self.query_budget:
+                self.registry.increment("bot_query_budget_exceeded_total", stats.handler)
+                logger.warning(
+                    "Обработчик %s выполнил %s запросов к БД (бюджет %s) за %.1f мс: БД %.1f мс, "
+                    "Bot API %s запросов %.1f мс",
+                    stats.handler, stats.queries, self.query_budget, duration * 1000, stats.db_time * 1000,
+                    stats.api_calls, stats.api_time * 1000
+                )
+
+
+class HandlerNameMiddleware(BaseMiddleware):
+    """Запоминает в статистике апдейта имя выбранного обработчика"""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        stats = current_stats.get()
+        if stats is not None and "handler" in data:
+            stats.handler = get_handler_name(data)
+        return await handler(event, data)
+
+
+class ApiMetricsMiddleware(BaseRequestMiddleware):
+    """Измеряет время запросов к Bot API (middleware сессии бота)"""
+
+    def __init__(self, registry: MetricsRegistry):
+        self.registry = registry
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        name = method.__api_method__
+        start = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception:
+            self.registry.increment("bot_api_errors_total", name)
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            self.registry.observe("bot_api_request_duration_seconds", name, duration)
+            stats = current_stats.get()
+            if stats is not None:
+                stats.api_calls += 1
+                stats.api_time += duration
+
+
+async def install_api_metrics(bot: Bot) -> None:
+    """Подключает ApiMetricsMiddleware к сессии бота (вызывается при запуске диспетчера)"""
+    if not any(isinstance(middleware, ApiMetricsMiddleware) for middleware in bot.session.middleware):
+        bot.session.middleware(ApiMetricsMiddleware(metrics))
@@ -0,0 +1,105 @@
+import asyncio
+import random
+import time
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import (
+    BaseRequestMiddleware, NextRequestMiddlewareType, Response, TelegramMethod, TelegramType
+)
+from aiogram.exceptions import TelegramRetryAfter, TelegramServerError
+
+from bot.config import RATE_LIMIT_MAX_WAIT, RATE_LIMIT_RETRIES
+from bot.logging_config import logger
+from bot.metrics import MetricsRegistry, metrics
+from bot.rate_limit import RateLimiter, classify_request, rate_limiter
+
+
+BACKOFF_BASE = 0.5  # Первая пауза перед повтором после ошибки сервера, секунды
+BACKOFF_MAX = 10.0
+
+
+class RateLimitMiddleware(BaseRequestMiddleware):
+    """
+    Ограничивает частоту запросов к Bot API и повторяет их при флуд-контроле (middleware сессии бота)
+
+    Перед отправкой запрос ждёт токены в RateLimiter. На ответ 429 чат
+    приостанавливается на retry_after секунд (плюс случайная добавка, чтобы
+    отложенные запросы не ушли одной пачкой), и запрос повторяется. Ошибки
+    сервера Telegram (5xx) повторяются с экспоненциальной паузой со случайным
+    разбросом. Сетевые ошибки не повторяются: запрос мог дойти, и повтор
+    отправил бы сообщение дважды.
+    """
+
+    def __init__(
+        self,
+        limiter: RateLimiter,
+        retries: int = RATE_LIMIT_RETRIES,
+        max_wait: float = RATE_LIMIT_MAX_WAIT,
+        registry: MetricsRegistry = metrics
+    ):
+        """
+        Инициализация
+
+        Args:
+            limiter: ограничитель частоты запросов
+            retries: сколько раз повторять запрос
+            max_wait: если Telegram просит ждать дольше, ошибка возвращается сразу
+            registry: реестр метрик
+        """
+        self.limiter = limiter
+        self.retries = retries
+        self.max_wait = max_wait
+        self.registry = registry
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        name = method.__api_method__
+        if name == "getUpdates":
+            # У polling свой цикл повторов
+            return await make_request(bot, method)
+
+        chat_id, priority = classify_request(method)
+        attempt = 0
+        while True:
+            if priority is not None:
+                start = time.perf_counter()
+                await self.limiter.acquire(chat_id, priority)
+                self.registry.observe("bot_api_wait_seconds", name, time.perf_counter() - start)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                if attempt >= self.retries or e.retry_after > self.max_wait:
+                    raise
+                delay = e.retry_after + random.uniform(0, BACKOFF_BASE)
+                logger.warning("Флуд-контроль Bot API: %s в чате %s, повтор через %.1f с", name, chat_id, delay)
+                if chat_id is not None:
+                    # Следующие запросы в этот чат тоже подождут
+                    self.limiter.pause(chat_id, delay)
+                else:
+                    await asyncio.sleep(delay)
+            except TelegramServerError as e:
+                if attempt >= self.retries:
+                    raise
+                delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+                logger.warning("Ошибка сервера Bot API в %s: %s, повтор через %.1f с", name, e, delay)
+                await asyncio.sleep(delay)
+            attempt += 1
+            self.registry.increment("bot_api_retries_total", name)
+
+
+async def install_rate_limiter(bot: Bot) -> None:
+    """
+    Подключает RateLimitMiddleware к сессии бота (вызывается при запуске диспетчера)
+
+    Регистрируется раньше install_api_metrics: middleware сессии вызываются
+    в порядке подключения, поэтому в метрики запросов попадает каждая попытка
+    без времени ожидания в очереди.
+    """
+    if not rate_limiter.enabled:
+        return
+    if not any(isinstance(middleware, RateLimitMiddleware) for middleware in bot.session.middleware):
+        bot.session.middleware(RateLimitMiddleware(rate_limiter))
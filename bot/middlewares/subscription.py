@@ -0,0 +1,43 @@
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import CallbackQuery, Message, TelegramObject
+
+from bot.logging_config import logger
+from bot.subscription import MembershipChecker, subscription_keyboard
+
+
+SUBSCRIPTION_TEXT = "Для использования бота нужно подписаться на канал и группу:"
+
+
+class SubscriptionMiddleware(BaseMiddleware):
+    """
+    Пропускает к обработчикам только пользователей, подписанных на обязательные чаты
+
+    Подключается к любому роутеру или наблюдателю (message, callback_query).
+    Неподписанному пользователю отправляются ссылки на чаты. Сообщения об
+    успешной оплате пропускаются всегда.
+    """
+
+    def __init__(self, checker: MembershipChecker):
+        self.checker = checker
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        user = data.get("event_from_user")
+        if user is None or (isinstance(event, Message) and event.successful_payment):
+            return await handler(event, data)
+
+        if await self.checker.check(data["bot"], user.id):
+            return await handler(event, data)
+
+        logger.info("Пользователь %s не подписан на канал или группу", user.id)
+        if isinstance(event, CallbackQuery):
+            await event.answer(SUBSCRIPTION_TEXT, show_alert=True)
+        elif isinstance(event, Message):
+            await event.answer(SUBSCRIPTION_TEXT, reply_markup=subscription_keyboard())
+        return None
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.7 on 2026-10-18 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0002_faqentry'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='faqentry',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['position', 'id', 'updated_at'], name='faq_active_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+from django.db import models
+
+
+class FSMRecord(models.Model):
+    """Сохранённое состояние FSM бота (например, незавершённое оформление заказа)"""
+    key = models.CharField(max_length=255, primary_key=True)
+    payload = models.BinaryField()
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return self.key
+
+
+class DeletedProduct(models.Model):
+    """Запись об удалённом товаре: по ней поисковый индекс бота убирает товар, не перечитывая все ID"""
+    product_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return str(self.product_id)
+
+
+class FAQEntry(models.Model):
+    """Вопрос и ответ для FAQ бота"""
+    question = models.CharField(max_length=255, unique=True)
+    answer = models.TextField()
+    position = models.PositiveIntegerField(default=0)
+    is_active = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["position", "id"]
+        indexes = [
+            # Частичный индекс только по активным вопросам: их читает бот. updated_at
+            # в индексе, чтобы отпечаток FAQ (COUNT, MAX(updated_at)) считался по индексу
+            models.Index(
+                fields=["position", "id", "updated_at"], condition=models.Q(is_active=True), name="faq_active_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return self.question
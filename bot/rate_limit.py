@@ -0,0 +1,262 @@
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Iterator, List, Optional, Tuple, Union
+
+from aiogram.methods import TelegramMethod
+
+from bot.cache import LRUCache
+from bot.config import (
+    RATE_LIMIT, RATE_LIMIT_CHAT, RATE_LIMIT_CHAT_BURST, RATE_LIMIT_GLOBAL, RATE_LIMIT_GROUP_PER_MINUTE
+)
+
+
+ChatId = Union[int, str]
+
+CHAT_BUCKETS = 100_000  # Количество чатов, для которых хранятся счётчики
+TOKEN_EPSILON = 1e-6  # Погрешность округления при пополнении токенов
+# Ответы на запросы пользователя: Telegram ждёт их ограниченное время
+ANSWER_METHODS = {"answerCallbackQuery", "answerPreCheckoutQuery", "answerShippingQuery", "answerInlineQuery"}
+# Методы, которые отправляют или изменяют сообщения и попадают под лимиты чатов
+CHAT_METHOD_PREFIXES = ("send", "edit", "copy", "forward")
+
+
+class Priority(IntEnum):
+    """Приоритет запроса в очереди ограничителя (меньше — раньше)"""
+    ANSWER = 0  # ответы на callback, pre_checkout и инлайн-запросы
+    CHAT = 1  # сообщения в личных чатах
+    GROUP = 2  # сообщения в группах и каналах
+    BROADCAST = 3  # рассылки
+
+
+request_priority: ContextVar[Optional[Priority]] = ContextVar("request_priority", default=None)
+
+
+@contextmanager
+def api_priority(priority: Priority) -> Iterator[None]:
+    """
+    Задаёт приоритет запросов к Bot API внутри блока
+
+    Пример: рассылка отправляется с Priority.BROADCAST, чтобы не задерживать
+    ответы пользователям.
+    """
+    token = request_priority.set(priority)
+    try:
+        yield
+    finally:
+        request_priority.reset(token)
+
+
+def chat_key(chat_id: ChatId) -> ChatId:
+    """Приводит ID чата к одному виду (числовые ID, переданные строкой, — к int)"""
+    try:
+        return int(chat_id)
+    except (TypeError, ValueError):
+        return chat_id
+
+
+def is_group(chat_id: ChatId) -> bool:
+    """Группы и каналы имеют отрицательные ID или адресуются по @username"""
+    return isinstance(chat_id, str) or chat_id < 0
+
+
+def classify_request(method: TelegramMethod) -> Tuple[Optional[ChatId], Optional[Priority]]:
+    """
+    Определяет чат и приоритет запроса к Bot API
+
+    Args:
+        method: запрос к Bot API
+
+    Returns:
+        Tuple[Optional[ChatId], Optional[Priority]]: чат, в который отправляется
+            сообщение (None — запрос учитывается только в общем лимите), и
+            приоритет (None — запрос не ограничивается: getUpdates, getChatMember и т.п.)
+    """
+    name = method.__api_method__
+    if name in ANSWER_METHODS:
+        return None, Priority.ANSWER
+    if not name.startswith(CHAT_METHOD_PREFIXES):
+        return None, None
+
+    chat_id = getattr(method, "chat_id", None)
+    chat_id = chat_key(chat_id) if chat_id is not None else None
+    priority = request_priority.get()
+    if priority is None:
+        priority = Priority.GROUP if chat_id is not None and is_group(chat_id) else Priority.CHAT
+    return chat_id, priority
+
+
+class TokenBucket:
+    """
+    Token bucket: rate токенов в секунду, не больше capacity в запасе
+
+    Токены можно брать в долг (reserve): запас уходит в минус, а вызывающий
+    ждёт, пока долг не восстановится. Так несколько одновременных запросов
+    в один чат выстраиваются друг за другом без отдельной очереди.
+    """
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Время до появления свободного токена"""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 - TOKEN_EPSILON else (1 - self.tokens) / self.rate
+
+    def reserve(self, now: float) -> float:
+        """Берёт токен (возможно, в долг) и возвращает время, которое нужно подождать"""
+        wait = self.wait_time(now)
+        self.tokens -= 1
+        return wait
+
+    def pause(self, now: float, delay: float) -> None:
+        """Откладывает выдачу следующего токена минимум на delay секунд"""
+        self._refill(now)
+        self.tokens = min(self.tokens, 1 - delay * self.rate)
+
+
+class RateLimiter:
+    """
+    Ограничитель частоты запросов к Bot API
+
+    Лимиты Telegram: около global_rate сообщений в секунду на бота, chat_rate
+    в секунду в личный чат (с запасом chat_burst на короткие всплески) и
+    group_per_minute в минуту в группу или канал. Общий лимит раздаётся по
+    приоритету: при перегрузке ответы на нажатия кнопок уходят раньше
+    сообщений, а рассылки — последними.
+    """
+
+    def __init__(
+        self,
+        global_rate: float = RATE_LIMIT_GLOBAL,
+        chat_rate: float = RATE_LIMIT_CHAT,
+        chat_burst: int = RATE_LIMIT_CHAT_BURST,
+        group_per_minute: float = RATE_LIMIT_GROUP_PER_MINUTE,
+        enabled: bool = RATE_LIMIT
+    ):
+        """
+        Инициализация
+
+        Args:
+            global_rate: запросов в секунду на бота
+            chat_rate: сообщений в секунду в личный чат
+            chat_burst: сколько сообщений в чат можно отправить подряд без ожидания
+            group_per_minute: сообщений в минуту в группу или канал
+            enabled: подключать ли ограничитель к сессии бота при запуске
+        """
+        self.global_rate = global_rate
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_per_minute / 60
+        self.enabled = enabled
+        self.global_bucket = TokenBucket(global_rate, max(1.0, global_rate), time.monotonic())
+        self.chats = LRUCache(CHAT_BUCKETS)
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._pump_task: Optional[asyncio.Task] = None
+
+    def set_global_rate(self, rate: float) -> None:
+        """Меняет общий лимит (например, когда бот работает в нескольких процессах)"""
+        self.global_rate = rate
+        self.global_bucket = TokenBucket(rate, max(1.0, rate), time.monotonic())
+
+    def chat_bucket(self, chat_id: ChatId, now: float) -> TokenBucket:
+        """Возвращает счётчик чата, создавая его при первом сообщении"""
+        bucket = self.chats.get(chat_id)
+        if bucket is None:
+            rate = self.group_rate if is_group(chat_id) else self.chat_rate
+            bucket = TokenBucket(rate, self.chat_burst, now)
+            self.chats.set(chat_id, bucket)
+        return bucket
+
+    async def acquire(self, chat_id: Optional[ChatId], priority: Priority) -> None:
+        """
+        Ждёт, пока запрос можно будет отправить
+
+        Токен чата берётся после токена общего лимита, непосредственно перед
+        отправкой: если взять его раньше, пока запрос стоит в общей очереди,
+        запас чата у бота и у Telegram разойдётся, и Telegram ответит 429.
+
+        Args:
+            chat_id: чат сообщения (None — только общий лимит)
+            priority: приоритет в очереди общего лимита
+        """
+        bucket = self.chat_bucket(chat_id, time.monotonic()) if chat_id is not None else None
+        if bucket is not None:
+            # Пока чат исчерпал лимит, запрос не занимает место в общей очереди
+            delay = bucket.wait_time(time.monotonic())
+            if delay:
+                await asyncio.sleep(delay)
+
+        await self._acquire_global(priority)
+
+        if bucket is not None:
+            delay = bucket.reserve(time.monotonic())
+            if delay:
+                # Одновременные запросы в один чат: токен взят в долг, ждём его
+                await asyncio.sleep(delay)
+
+    async def _acquire_global(self, priority: Priority) -> None:
+        """Ждёт токен общего лимита в очереди по приоритету"""
+        now = time.monotonic()
+        if not self._waiters and not self.global_bucket.wait_time(now):
+            self.global_bucket.reserve(now)
+            return
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        if self._pump_task is None or self._pump_task.done() or self._pump_task.get_loop() is not loop:
+            self._pump_task = loop.create_task(self._pump())
+        await future
+
+    def try_acquire(self, chat_id: Optional[ChatId]) -> float:
+        """
+        Берёт токены без ожидания (так лимиты проверяет сервер)
+
+        Returns:
+            float: 0, если токены выданы, иначе время до их появления
+        """
+        now = time.monotonic()
+        bucket = self.chat_bucket(chat_id, now) if chat_id is not None else None
+        wait = max(self.global_bucket.wait_time(now), bucket.wait_time(now) if bucket else 0.0)
+        if not wait:
+            self.global_bucket.reserve(now)
+            if bucket is not None:
+                bucket.reserve(now)
+        return wait
+
+    def pause(self, chat_id: Optional[ChatId], delay: float) -> None:
+        """Приостанавливает отправку в чат (или всех запросов, если чат не указан) на delay секунд"""
+        now = time.monotonic()
+        bucket = self.chat_bucket(chat_id, now) if chat_id is not None else self.global_bucket
+        bucket.pause(now, delay)
+
+    async def _pump(self) -> None:
+        """Выдаёт токены общего лимита ожидающим запросам в порядке приоритета"""
+        while self._waiters:
+            delay = self.global_bucket.wait_time(time.monotonic())
+            if delay:
+                await asyncio.sleep(delay)
+                continue
+            _, _, future = heapq.heappop(self._waiters)
+            # Запрос, отменённый во время ожидания, токен не расходует
+            if not future.done():
+                self.global_bucket.reserve(time.monotonic())
+                future.set_result(None)
+
+
+rate_limiter = RateLimiter()
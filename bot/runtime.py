@@ -0,0 +1,136 @@
+import asyncio
+import ssl
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+import certifi
+from aiogram import Bot, __version__ as aiogram_version
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiohttp import ClientSession, TCPConnector
+from aiohttp.hdrs import USER_AGENT
+from aiohttp.http import SERVER_SOFTWARE
+from aiogram.client.session.base import BaseSession
+
+from bot.config import BOT_API_CONNECTIONS, BOT_API_DNS_TTL, BOT_API_KEEPALIVE, BOT_API_TIMEOUT, BOT_TOKEN
+from bot.logging_config import logger
+
+
+class ApiSession(AiohttpSession):
+    """
+    HTTP-сессия Bot API с настроенным пулом соединений
+
+    Соединения с api.telegram.org держатся открытыми keepalive_timeout секунд,
+    поэтому запросы одного апдейта и соседних апдейтов не повторяют TCP и TLS
+    рукопожатия. Адрес API кэшируется на dns_cache_ttl секунд.
+
+    ClientSession создаётся в create_session (через него AiohttpSession
+    получает сессию для каждого запроса), а не через внутренние настройки
+    коннектора aiogram, которые меняются между версиями.
+    """
+
+    def __init__(
+        self,
+        limit: int = BOT_API_CONNECTIONS,
+        keepalive_timeout: float = BOT_API_KEEPALIVE,
+        dns_cache_ttl: int = BOT_API_DNS_TTL,
+        timeout: float = BOT_API_TIMEOUT
+    ):
+        """
+        Инициализация
+
+        Args:
+            limit: максимальное количество одновременных соединений
+            keepalive_timeout: сколько секунд держать простаивающее соединение
+            dns_cache_ttl: время жизни DNS-кэша в секундах
+            timeout: таймаут запроса в секундах
+        """
+        super().__init__(limit=limit, timeout=timeout)
+        self.limit = limit
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self._client: Optional[ClientSession] = None
+
+    async def create_session(self) -> ClientSession:
+        """Возвращает HTTP-сессию, создавая её при первом запросе или после закрытия"""
+        if self._client is None or self._client.closed:
+            connector = TCPConnector(
+                # Сертификаты certifi, как у AiohttpSession: системного набора может не быть
+                ssl=ssl.create_default_context(cafile=certifi.where()),
+                limit=self.limit,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=self.dns_cache_ttl
+            )
+            self._client = ClientSession(
+                connector=connector,
+                headers={USER_AGENT: f"{SERVER_SOFTWARE} aiogram/{aiogram_version}"}
+            )
+        return self._client
+
+    async def close(self) -> None:
+        """Закрывает HTTP-сессию"""
+        if self._client is not None and not self._client.closed:
+            await self._client.close()
+            # Даём SSL-соединениям закрыться (рекомендация aiohttp для корректной остановки)
+            await asyncio.sleep(0.25)
+
+
+class BotRuntime:
+    """
+    Единственный объект Bot процесса и его HTTP-сессия
+
+    Bot создаётся при запуске (runbot, воркер супервизора), а не при импорте
+    модулей. Обработчики получают его от aiogram аргументом bot, код вне
+    обработчиков — через bot_runtime.bot. При остановке сессия закрывается
+    один раз, в running().
+    """
+
+    def __init__(self):
+        self._bot: Optional[Bot] = None
+
+    @property
+    def bot(self) -> Bot:
+        """Запущенный бот"""
+        if self._bot is None:
+            raise RuntimeError("Бот не запущен: используйте bot_runtime.running()")
+        return self._bot
+
+    def start(self, token: str = BOT_TOKEN, session: Optional[BaseSession] = None) -> Bot:
+        """
+        Создаёт бота, если он ещё не создан
+
+        Args:
+            token: токен бота
+            session: HTTP-сессия (по умолчанию ApiSession)
+
+        Returns:
+            Bot: бот процесса
+        """
+        if self._bot is None:
+            self._bot = Bot(token, session=session or ApiSession())
+        return self._bot
+
+    async def close(self) -> None:
+        """Закрывает HTTP-сессию бота"""
+        if self._bot is None:
+            return
+        bot, self._bot = self._bot, None
+        await bot.session.close()
+        logger.info("Сессия Bot API закрыта")
+
+    @asynccontextmanager
+    async def running(self, token: str = BOT_TOKEN, session: Optional[BaseSession] = None) -> AsyncIterator[Bot]:
+        """
+        Создаёт бота на время блока и закрывает его сессию при выходе
+
+        Args:
+            token: токен бота
+            session: HTTP-сессия (по умолчанию ApiSession)
+        """
+        bot = self.start(token, session)
+        try:
+            yield bot
+        finally:
+            await self.close()
+
+
+bot_runtime = BotRuntime()
@@ -0,0 +1,109 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from django_app.clients.models import Cart, CartItem, Client
+from django_app.products.models import Category, Product, Subcategory
+from bot.database.cart_db import refresh_product_carts
+from bot.database.catalog_cache import catalog_cache
+from bot.database.identity_db import identity_cache
+from bot.images import image_digest
+from bot.logging_config import logger
+from bot.models import DeletedProduct
+
+
+@receiver(pre_save, sender=Product)
+def reset_product_file_id(sender, instance: Product, **kwargs) -> None:
+    """
+    Сбрасывает сохранённый file_id, если администратор заменил изображение товара
+
+    Если новое изображение совпадает по содержимому с тем, для которого получен
+    file_id, он сохраняется.
+    """
+    if not instance.pk or not instance.image_file_id:
+        return
+
+    old_image = (
+        Product.objects.filter(pk=instance.pk)
+        .values_list("image", flat=True)
+        .first()
+    )
+    image = instance.image
+    if (old_image or "") == (image.name or "") and getattr(image, "_committed", True):
+        return
+
+    new_hash = ""
+    if image:
+        try:
+            new_hash = image_digest(image.file)
+        except (OSError, ValueError) as e:
+            logger.warning("Не удалось посчитать хэш изображения товара %s: %s", instance.pk, e)
+
+    if new_hash and new_hash == instance.image_file_hash:
+        return
+
+    instance.image_file_id = ""
+    instance.image_file_hash = ""
+    logger.info("Изображение товара %s изменено, file_id сброшен", instance.pk)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Subcategory)
+@receiver(post_delete, sender=Subcategory)
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_catalog_cache(sender, **kwargs) -> None:
+    """
+    Инвалидирует кэш каталога при любом изменении категорий, подкатегорий и товаров
+
+    Версия увеличивается после фиксации транзакции (админка сохраняет объект
+    внутри transaction.atomic): иначе бот успел бы прочитать старую строку и
+    сохранить её в кэш под новой версией.
+    """
+    transaction.on_commit(catalog_cache.bump_version)
+
+
+@receiver(post_delete, sender=Product)
+def record_deleted_product(sender, instance: Product, **kwargs) -> None:
+    """Запоминает удалённый товар: так поисковый индекс узнаёт об удалении без полного списка ID"""
+    DeletedProduct.objects.create(product_id=instance.pk, deleted_at=timezone.now())
+
+
+@receiver(pre_delete, sender=Subcategory)
+def touch_subcategory_products(sender, instance: Subcategory, **kwargs) -> None:
+    """
+    Отмечает товары удаляемой подкатегории изменёнными
+
+    При удалении подкатегории у товаров обнуляется category (SET_NULL) без
+    сигналов и без обновления updated_at. Новый updated_at сообщает
+    поисковому индексу, что товары ушли из каталога.
+    """
+    Product.objects.filter(category_id=instance.pk).update(updated_at=timezone.now())
+
+
+@receiver(post_delete, sender=Client)
+@receiver(post_delete, sender=Cart)
+def reset_identity_cache(sender, **kwargs) -> None:
+    """Сбрасывает кэш идентификаторов пользователей при удалении клиента или корзины"""
+    identity_cache.clear()
+
+
+@receiver(pre_delete, sender=Product)
+def remember_product_carts(sender, instance: Product, **kwargs) -> None:
+    """Запоминает корзины с удаляемым товаром: после удаления их позиций уже не найти"""
+    instance._cart_ids = list(
+        CartItem.objects.filter(product_id=instance.pk).values_list("cart_id", flat=True)
+    )
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def refresh_cart_snapshots(sender, instance: Product, **kwargs) -> None:
+    """Пересчитывает снимки корзин, в которых лежит изменённый или удалённый товар"""
+    if kwargs.get("created"):
+        return
+    updated = refresh_product_carts([instance.pk], getattr(instance, "_cart_ids", ()))
+    if updated:
+        logger.info("Товар %s изменён, обновлено корзин: %s", instance.pk, updated)
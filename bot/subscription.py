@@ -0,0 +1,162 @@
+import asyncio
+from typing import Dict, Iterable, List, Optional, Union
+
+from aiogram.types import InlineKeyboardMarkup
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+
+from bot.cache import LRUCache
+from bot.config import (
+    CHANNEL_ID, CHANNEL_URL, GROUP_ID, GROUP_URL,
+    SUBSCRIPTION_NEGATIVE_TTL, SUBSCRIPTION_TTL
+)
+from bot.logging_config import logger
+
+
+MEMBER_STATUSES = {"member", "administrator", "creator"}  # Статусы подписанного пользователя
+CACHE_SIZE = 100_000  # Количество пар (чат, пользователь) в кэше
+
+
+def format_chat_id(chat_id: str) -> str:
+    """
+    Форматирует ID канала/группы для корректной работы с API Telegram
+    
+    Args:
+        chat_id: ID канала/группы
+        
+    Returns:
+        str: отформатированный ID
+    """
+    # Убираем все минусы для начала
+    clean_id = chat_id.replace('-', '')
+    
+    # Если ID не начинается с -100, добавляем его
+    if not clean_id.startswith('100'):
+        return f"-100{clean_id}"
+    return f"-{clean_id}"
+
+
+def is_member_status(member) -> bool:
+    """Проверяет, считается ли участник чата подписанным"""
+    return member.status in MEMBER_STATUSES or (
+        member.status == "restricted" and getattr(member, "is_member", False)
+    )
+
+
+class MembershipChecker:
+    """
+    Проверка подписки пользователей на обязательные чаты
+
+    ID чатов определяются через getChat один раз (при запуске или первой
+    проверке), статус участника кэшируется на ttl секунд, отрицательный
+    результат и ошибки — на negative_ttl секунд. Чаты проверяются
+    параллельно, одновременные проверки одной пары (чат, пользователь)
+    выполняют один запрос.
+
+    Объекту бота достаточно методов get_chat и get_chat_member, поэтому
+    проверку можно запускать с FakeTelegramSession.
+    """
+
+    def __init__(
+        self,
+        chat_ids: Iterable[Union[str, int]],
+        ttl: float = SUBSCRIPTION_TTL,
+        negative_ttl: float = SUBSCRIPTION_NEGATIVE_TTL,
+        max_entries: int = CACHE_SIZE
+    ):
+        """
+        Инициализация
+
+        Args:
+            chat_ids: ID или @username обязательных чатов (пустые значения пропускаются)
+            ttl: время жизни положительного результата в секундах
+            negative_ttl: время жизни отрицательного результата в секундах
+            max_entries: размер кэша результатов
+        """
+        self.chat_ids: List[str] = [str(chat_id) for chat_id in chat_ids if chat_id]
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.cache = LRUCache(max_entries)
+        self._resolved: Dict[str, int] = {}
+        self._pending: Dict[tuple, asyncio.Task] = {}
+
+    async def resolve(self, bot) -> None:
+        """Определяет числовые ID обязательных чатов"""
+        await asyncio.gather(*(self._resolve_chat(bot, chat_id) for chat_id in self.chat_ids))
+
+    async def _resolve_chat(self, bot, chat_id: str) -> Optional[int]:
+        """Возвращает числовой ID чата, запрашивая его один раз"""
+        resolved = self._resolved.get(chat_id)
+        if resolved is not None:
+            return resolved
+        formatted = chat_id if chat_id.startswith("@") else format_chat_id(chat_id)
+        try:
+            chat = await bot.get_chat(formatted)
+        except Exception as e:
+            logger.error("Не удалось получить чат %s: %s", chat_id, e)
+            return None
+        self._resolved[chat_id] = chat.id
+        logger.info("Чат %s определён: id=%s, title=%s", chat_id, chat.id, chat.title)
+        return chat.id
+
+    async def is_member(self, bot, chat_id: str, user_id: int) -> bool:
+        """
+        Проверяет подписку пользователя на чат с учётом кэша
+
+        Args:
+            bot: объект бота
+            chat_id: ID чата из настроек
+            user_id: ID пользователя
+
+        Returns:
+            bool: True, если пользователь подписан
+        """
+        key = (chat_id, user_id)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        task = self._pending.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch_member(bot, chat_id, user_id))
+            self._pending[key] = task
+            task.add_done_callback(lambda _: self._pending.pop(key, None))
+        return await task
+
+    async def _fetch_member(self, bot, chat_id: str, user_id: int) -> bool:
+        """Запрашивает статус пользователя в чате и сохраняет результат в кэш"""
+        resolved = await self._resolve_chat(bot, chat_id)
+        subscribed = False
+        if resolved is not None:
+            try:
+                subscribed = is_member_status(await bot.get_chat_member(resolved, user_id))
+            except Exception as e:
+                logger.error("Ошибка проверки подписки пользователя %s на чат %s: %s", user_id, chat_id, e)
+        self.cache.set((chat_id, user_id), subscribed, self.ttl if subscribed else self.negative_ttl)
+        return subscribed
+
+    async def check(self, bot, user_id: int) -> bool:
+        """
+        Проверяет подписку пользователя на все обязательные чаты
+
+        Returns:
+            bool: True, если пользователь подписан на все чаты
+        """
+        results = await asyncio.gather(*(self.is_member(bot, chat_id, user_id) for chat_id in self.chat_ids))
+        return all(results)
+
+    def forget(self, user_id: int) -> None:
+        """Удаляет результаты проверок пользователя из кэша"""
+        for chat_id in self.chat_ids:
+            self.cache.delete((chat_id, user_id))
+
+
+def subscription_keyboard() -> InlineKeyboardMarkup:
+    """Клавиатура со ссылками на обязательные канал и группу"""
+    keyboard = InlineKeyboardBuilder()
+    keyboard.button(text="📢 Подписаться на канал", url=CHANNEL_URL)
+    keyboard.button(text="👥 Вступить в группу", url=GROUP_URL)
+    keyboard.adjust(1)
+    return keyboard.as_markup()
+
+
+membership_checker = MembershipChecker([CHANNEL_ID, GROUP_ID])
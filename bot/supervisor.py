@@ -0,0 +1,240 @@
+import asyncio
+import multiprocessing
+import signal
+from contextlib import suppress
+from typing import AsyncIterator, List, Optional
+
+from aiogram import Bot
+from aiogram.types import Update
+
+from bot.config import LOG_QUEUE_SIZE
+from bot.logging_config import listen, logger, setup_logging, stop_listener
+from bot.webhook import UpdateWorkerPool, get_shard_key
+
+
+RESTART_CHECK_INTERVAL = 1  # Период проверки воркеров в секундах
+STOP_TIMEOUT = 30  # Сколько ждать завершения воркера при остановке
+
+
+async def polling_source(bot: Bot, allowed_updates: Optional[List[str]] = None) -> AsyncIterator[str]:
+    """
+    Получает апдейты от Telegram через getUpdates
+
+    Telegram удаляет апдейты, только когда следующий getUpdates передаёт
+    offset больше их ID. offset сдвигается после того, как потребитель
+    вернул управление генератору, то есть поставил апдейт в очередь воркера:
+    если супервизор упадёт раньше, Telegram пришлёт апдейт повторно.
+
+    Args:
+        bot: объект бота
+        allowed_updates: типы апдейтов, которые нужно получать
+
+    Yields:
+        str: апдейт в формате JSON
+    """
+    offset = None
+    while True:
+        try:
+            updates = await bot.get_updates(offset=offset, timeout=30, allowed_updates=allowed_updates)
+        except Exception as e:
+            logger.error("Ошибка получения апдейтов: %s", e)
+            await asyncio.sleep(1)
+            continue
+        for update in updates:
+            yield update.model_dump_json(by_alias=True, exclude_unset=True)
+            offset = update.update_id + 1
+
+
+async def file_source(path: str) -> AsyncIterator[str]:
+    """
+    Читает искусственные апдейты из файла (по одному JSON на строку)
+
+    Args:
+        path: путь к файлу
+
+    Yields:
+        str: апдейт в формате JSON
+    """
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield line
+
+
+def run_worker(index: int, queue, log_queue, tasks: int, fake_api: bool, processes: int = 1) -> None:
+    """
+    Точка входа процесса-воркера
+
+    Каждый процесс заново инициализирует Django и поэтому работает со своими
+    подключениями к БД. Логи передаются в очередь супервизора, и в файл их
+    пишет один процесс.
+
+    Args:
+        index: номер воркера
+        queue: очередь апдейтов этого воркера
+        log_queue: очередь записей лога супервизора
+        tasks: количество параллельных обработчиков внутри процесса
+        fake_api: отвечать на запросы к Bot API локально
+        processes: общее количество воркеров
+    """
+    setup_logging(log_queue)
+
+    import django
+    django.setup()
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(_serve_shard(index, queue, tasks, fake_api, processes))
+
+
+async def _serve_shard(index: int, queue, tasks: int, fake_api: bool, processes: int = 1) -> None:
+    """Обрабатывает апдейты из очереди воркера до получения None"""
+    from bot.config import METRICS_PORT, RATE_LIMIT_GLOBAL
+    from bot.dispatcher import create_dispatcher
+    from bot.fake_api import FakeTelegramSession
+    from bot.metrics import metrics_server
+    from bot.rate_limit import rate_limiter
+    from bot.runtime import bot_runtime
+
+    # Каждый воркер отдаёт метрики на своём порту: METRICS_PORT + номер + 1
+    metrics_server.port = METRICS_PORT + index + 1 if METRICS_PORT else 0
+    # Общий лимит Bot API делится между воркерами; лимиты чатов — нет, каждый чат обслуживает один воркер
+    rate_limiter.set_global_rate(RATE_LIMIT_GLOBAL / processes)
+
+    dp = create_dispatcher()
+    async with bot_runtime.running(session=FakeTelegramSession() if fake_api else None) as bot:
+        workflow_data = {"dispatcher": dp, "bots": [bot], **dp.workflow_data}
+        pool = UpdateWorkerPool(dp, bot, tasks, **workflow_data)
+
+        await dp.emit_startup(bot=bot, **workflow_data)
+        pool.start()
+        logger.info("Воркер %s запущен", index)
+
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                raw = await loop.run_in_executor(None, queue.get)
+                if raw is None:
+                    break
+                try:
+                    update = Update.model_validate_json(raw, context={"bot": bot})
+                except ValueError as e:
+                    logger.warning("Воркер %s получил некорректный апдейт: %s", index, e)
+                    continue
+                await pool.submit(update, timeout=None)
+        finally:
+            await pool.stop()
+            await dp.emit_shutdown(bot=bot, **workflow_data)
+            logger.info("Воркер %s остановлен", index)
+
+
+class Supervisor:
+    """
+    Запускает несколько процессов-воркеров и распределяет между ними апдейты
+
+    Апдейт попадает в воркер с номером chat_id % N, поэтому все апдейты одного
+    чата (и его состояние FSM) обрабатываются одним процессом по порядку.
+    Упавшие воркеры перезапускаются с той же очередью.
+
+    Доставка апдейтов — не более одного раза: очереди воркеров хранятся в
+    памяти, и апдейты, которые ждали в очереди или обрабатывались в момент
+    падения супервизора или процесса-воркера, теряются. Перезапуск воркера
+    восстанавливает обработку следующих апдейтов, а не потерянных.
+    """
+
+    def __init__(self, processes: int, tasks: int = 4, queue_size: int = 1000, fake_api: bool = False):
+        """
+        Инициализация супервизора
+
+        Args:
+            processes: количество процессов-воркеров
+            tasks: количество параллельных обработчиков в каждом процессе
+            queue_size: размер очереди каждого процесса
+            fake_api: отвечать на запросы к Bot API локально, без Telegram
+        """
+        self.ctx = multiprocessing.get_context("spawn")
+        self.tasks = tasks
+        self.fake_api = fake_api
+        self.queues = [self.ctx.Queue(queue_size) for _ in range(processes)]
+        self.log_queue = self.ctx.Queue(LOG_QUEUE_SIZE)
+        self.processes: List[Optional[multiprocessing.Process]] = [None] * processes
+        self._running = False
+
+    def _spawn(self, index: int) -> None:
+        """Запускает процесс-воркер с указанным номером"""
+        process = self.ctx.Process(
+            target=run_worker,
+            args=(index, self.queues[index], self.log_queue, self.tasks, self.fake_api, len(self.processes)),
+            name=f"bot-worker-{index}",
+            daemon=True
+        )
+        process.start()
+        self.processes[index] = process
+        logger.info("Процесс воркера %s запущен, pid=%s", index, process.pid)
+
+    async def _watch(self) -> None:
+        """Перезапускает упавшие воркеры"""
+        while self._running:
+            for index, process in enumerate(self.processes):
+                if self._running and process is not None and not process.is_alive():
+                    logger.error("Воркер %s завершился с кодом %s, перезапуск", index, process.exitcode)
+                    self._spawn(index)
+            await asyncio.sleep(RESTART_CHECK_INTERVAL)
+
+    async def _dispatch(self, source: AsyncIterator[str]) -> None:
+        """Распределяет апдейты источника по очередям воркеров"""
+        loop = asyncio.get_running_loop()
+        async for raw in source:
+            try:
+                update = Update.model_validate_json(raw)
+            except ValueError as e:
+                logger.warning("Некорректный апдейт от источника: %s", e)
+                continue
+            queue = self.queues[get_shard_key(update) % len(self.queues)]
+            await loop.run_in_executor(None, queue.put, raw)
+
+    async def run(self, source: AsyncIterator[str]) -> None:
+        """
+        Запускает воркеры и обрабатывает апдейты источника
+
+        Завершается, когда источник исчерпан или получен SIGINT/SIGTERM.
+
+        Args:
+            source: асинхронный источник апдейтов в формате JSON
+        """
+        self._running = True
+        log_listener = listen(self.log_queue)
+        for index in range(len(self.processes)):
+            self._spawn(index)
+
+        loop = asyncio.get_running_loop()
+        dispatch = asyncio.create_task(self._dispatch(source))
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            with suppress(NotImplementedError):
+                loop.add_signal_handler(sig, dispatch.cancel)
+        watcher = asyncio.create_task(self._watch())
+
+        try:
+            with suppress(asyncio.CancelledError):
+                await dispatch
+        finally:
+            await self.stop()
+            watcher.cancel()
+            with suppress(asyncio.CancelledError):
+                await watcher
+            stop_listener(log_listener)
+
+    async def stop(self) -> None:
+        """Дожидается обработки очередей и останавливает воркеры"""
+        self._running = False
+        loop = asyncio.get_running_loop()
+        for queue in self.queues:
+            await loop.run_in_executor(None, queue.put, None)
+        for index, process in enumerate(self.processes):
+            if process is None:
+                continue
+            await loop.run_in_executor(None, process.join, STOP_TIMEOUT)
+            if process.is_alive():
+                logger.warning("Воркер %s не завершился вовремя, принудительная остановка", index)
+                process.terminate()
+        logger.info("Все воркеры остановлены")
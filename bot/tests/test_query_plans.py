@@ -0,0 +1,75 @@
+from contextlib import contextmanager
+from typing import Iterator, List
+
+from django.db import connection
+from django.test import TestCase
+
+from bot.database.cart_db import (
+    _upsert_cart_item, cart_item_upsert_sql, cart_upsert_sql, product_carts_queryset, product_row_sql,
+    refresh_product_carts
+)
+from bot.database.identity_db import Identity
+from bot.database.order_db import _checkout, checkout_cart_queryset
+from bot.database.query_plans import (
+    PlanQuery, _first, disable_seq_scans, explain, find_seq_scans, hot_queries, seed
+)
+
+
+SEED_PRODUCTS = 1000  # Размер тестового каталога
+
+
+def sql_of(query: PlanQuery) -> str:
+    """SQL запроса без подстановки параметров"""
+    if isinstance(query, tuple):
+        return query[0]
+    return query.query.get_compiler(connection=connection).as_sql()[0]
+
+
+@contextmanager
+def capture_sql() -> Iterator[List[str]]:
+    """Собирает SQL выполненных запросов до подстановки параметров"""
+    statements = []
+
+    def wrapper(execute, sql, params, many, context):
+        statements.append(sql)
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(wrapper):
+        yield statements
+
+
+class QueryPlansTest(TestCase):
+    """Горячие запросы бота читают таблицы по индексам"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ids = seed(SEED_PRODUCTS)
+
+    def test_hot_queries_use_indexes(self):
+        disable_seq_scans()
+        for name, query in hot_queries(self.ids):
+            with self.subTest(name):
+                plan = explain(query)
+                self.assertEqual(find_seq_scans(plan), [], plan)
+
+    def test_checkout_runs_checked_query(self):
+        with capture_sql() as statements:
+            _checkout(self.ids["client_id"], "Иван Иванов", "+79990000000", "Москва")
+        self.assertIn(sql_of(_first(checkout_cart_queryset(self.ids["client_id"]))), statements)
+
+    def test_add_to_cart_runs_checked_queries(self):
+        tg_id, product_id = self.ids["tg_id"], self.ids["product_id"]
+        for identity in (None, Identity(self.ids["client_id"], self.ids["cart_id"])):
+            with self.subTest(identity=identity), capture_sql() as statements:
+                _upsert_cart_item(tg_id, product_id, 1, identity)
+            for query in (
+                product_row_sql(product_id),
+                cart_upsert_sql(tg_id, identity),
+                cart_item_upsert_sql(self.ids["cart_id"], product_id, 1),
+            ):
+                self.assertIn(sql_of(query), statements)
+
+    def test_refresh_product_carts_runs_checked_query(self):
+        with capture_sql() as statements:
+            refresh_product_carts([self.ids["product_id"]], [self.ids["cart_id"]])
+        self.assertIn(sql_of(product_carts_queryset([self.ids["product_id"]], [self.ids["cart_id"]])), statements)
@@ -0,0 +1,87 @@
+import asyncio
+import time
+from typing import List, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
+from django.test import SimpleTestCase
+
+from bot.config import RATE_LIMIT_RETRIES
+from bot.fake_api import FakeTelegramSession
+from bot.metrics import MetricsRegistry
+from bot.middlewares.rate_limit import RateLimitMiddleware
+from bot.rate_limit import Priority, RateLimiter, api_priority
+
+
+CHAT_ID = 1001  # Личный чат пользователя
+BROADCAST_CHAT_ID = 1002  # Чат, в который уходит рассылка
+
+
+def make_bot(session: FakeTelegramSession, limiter: RateLimiter, **kwargs) -> Tuple[Bot, MetricsRegistry]:
+    """Создаёт бота на локальной сессии с RateLimitMiddleware"""
+    registry = MetricsRegistry()
+    session.middleware(RateLimitMiddleware(limiter, registry=registry, **kwargs))
+    return Bot("1:test", session=session), registry
+
+
+class RateLimitMiddlewareTest(SimpleTestCase):
+    """Повторы и очередь запросов к Bot API при флуд-контроле"""
+
+    async def test_retries_after_retry_after(self):
+        # Telegram пропускает одно сообщение в секунду в чат, бот об этом не знает
+        flood_limiter = RateLimiter(global_rate=1000, chat_rate=1, chat_burst=1)
+        session = FakeTelegramSession(flood_limiter=flood_limiter)
+        bot, registry = make_bot(session, RateLimiter(global_rate=1000, chat_rate=1000, chat_burst=100))
+
+        await bot.send_message(CHAT_ID, "первое")
+        start = time.monotonic()
+        message = await bot.send_message(CHAT_ID, "второе")
+
+        self.assertEqual(message.text, "второе")
+        self.assertGreaterEqual(time.monotonic() - start, 1.0)
+        self.assertEqual(session.flood_errors, 1)
+        self.assertEqual(session.calls["sendMessage"], 3)
+        self.assertEqual(registry.counters[("bot_api_retries_total", "sendMessage")], 1)
+
+    async def test_gives_up_after_retries(self):
+        session = FakeTelegramSession(flood_rate=1.0, seed=0)
+        bot, registry = make_bot(session, RateLimiter(global_rate=1000))
+
+        with self.assertRaises(TelegramRetryAfter):
+            await bot.answer_callback_query("1")
+
+        self.assertEqual(session.calls["answerCallbackQuery"], RATE_LIMIT_RETRIES + 1)
+        self.assertEqual(session.flood_errors, RATE_LIMIT_RETRIES + 1)
+        self.assertEqual(registry.counters[("bot_api_retries_total", "answerCallbackQuery")], RATE_LIMIT_RETRIES)
+
+    async def test_does_not_wait_longer_than_max_wait(self):
+        session = FakeTelegramSession(flood_rate=1.0, retry_after=30, seed=0)
+        bot, _ = make_bot(session, RateLimiter(global_rate=1000), max_wait=1)
+
+        with self.assertRaises(TelegramRetryAfter):
+            await bot.send_message(CHAT_ID, "текст")
+        self.assertEqual(session.calls["sendMessage"], 1)
+
+    async def test_answers_go_before_messages_and_broadcasts(self):
+        sent: List[str] = []
+
+        async def record(make_request, bot, method):
+            # Подключается после RateLimitMiddleware: видит запросы в порядке отправки
+            chat_id = getattr(method, "chat_id", None)
+            sent.append("broadcast" if chat_id == BROADCAST_CHAT_ID else method.__api_method__)
+            return await make_request(bot, method)
+
+        limiter = RateLimiter(global_rate=20, chat_rate=1000, chat_burst=100)
+        session = FakeTelegramSession()
+        bot, _ = make_bot(session, limiter)
+        session.middleware(record)
+
+        # Общий лимит исчерпан: запросы встают в очередь в порядке создания
+        limiter.pause(None, 0.2)
+        with api_priority(Priority.BROADCAST):
+            broadcast = asyncio.create_task(bot.send_message(BROADCAST_CHAT_ID, "рассылка"))
+        message = asyncio.create_task(bot.send_message(CHAT_ID, "сообщение"))
+        answer = asyncio.create_task(bot.answer_callback_query("1"))
+        await asyncio.gather(broadcast, message, answer)
+
+        self.assertEqual(sent, ["answerCallbackQuery", "sendMessage", "broadcast"])
@@ -0,0 +1,288 @@
+import heapq
+import re
+from bisect import bisect_left
+from collections import defaultdict
+from operator import itemgetter
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from bot.cache import LRUCache
+
+
+TOKEN_RE = re.compile(r"\w+")
+CYRILLIC_RE = re.compile(r"[а-я]")
+
+MIN_STEM_LENGTH = 2  # Минимальная длина основы после отсечения окончания
+MIN_FUZZY_LENGTH = 3  # Минимальная длина слова для поиска с опечатками
+MAX_PREFIX_TERMS = 50  # Сколько терминов подставлять для незаконченного слова
+MAX_FUZZY_TERMS = 10  # Сколько похожих терминов подставлять для слова с опечаткой
+FUZZY_THRESHOLD = 0.4  # Минимальное сходство по триграммам для слова с опечаткой
+RANKED_RESULTS = 200  # Сколько лучших результатов запроса хранить в кэше
+RESULT_CACHE_SIZE = 1024  # Количество запросов в кэше результатов
+
+# Окончания русских слов
+RUSSIAN_ENDINGS = frozenset([
+    "иями", "ями", "ами", "ией", "иям", "ием", "иях", "ого", "его", "ому", "ему",
+    "ыми", "ими", "ешь", "ете", "ишь", "ите", "ает", "яет", "ует", "ают", "яют",
+    "ить", "ать", "ять", "еть",
+    "ая", "яя", "ое", "ее", "ие", "ые", "ой", "ей", "ий", "ый", "ом", "ем",
+    "ам", "ям", "ах", "ях", "ую", "юю", "ов", "ев", "ия", "ья", "ью", "ию",
+    "а", "я", "о", "е", "ы", "и", "у", "ю", "ь", "й",
+])
+ENDING_LENGTHS = sorted({len(ending) for ending in RUSSIAN_ENDINGS}, reverse=True)
+
+
+def tokenize(text: str) -> List[str]:
+    """Разбивает текст на слова в нижнем регистре (ё заменяется на е)"""
+    return TOKEN_RE.findall(text.lower().replace("ё", "е"))
+
+
+def stem(token: str) -> str:
+    """
+    Отсекает окончание русского слова
+
+    Упрощённый стеммер: снимается самое длинное подходящее окончание, если
+    остаётся не меньше MIN_STEM_LENGTH букв. Слова без кириллицы не меняются.
+    """
+    if not CYRILLIC_RE.search(token):
+        return token
+    for length in ENDING_LENGTHS:
+        if len(token) - length >= MIN_STEM_LENGTH and token[-length:] in RUSSIAN_ENDINGS:
+            return token[:-length]
+    return token
+
+
+def trigrams(term: str) -> Set[str]:
+    """Возвращает триграммы термина с границами слова"""
+    padded = f"_{term}_"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchDocument(NamedTuple):
+    """Документ поискового индекса: всё, что нужно для показа результата"""
+    id: int
+    name: str
+    description: str
+    price: str
+    image_file_id: str
+
+
+class TextIndex:
+    """
+    Инвертированный индекс документов в памяти
+
+    Слова названия и описания приводятся к основам, для каждой основы
+    хранятся документы с весами (слова названия весят больше). Для
+    незаконченного последнего слова запроса подставляются термины с таким
+    префиксом, а для слов с опечатками — похожие термины по триграммам.
+    По умолчанию документ попадает в результаты, если совпали все слова
+    запроса.
+
+    Слова запроса проверяются начиная с самого редкого, поэтому стоимость
+    запроса определяется самым избирательным словом. Ранжированные результаты
+    последних запросов кэшируются до следующего изменения индекса.
+
+    Индекс не потокобезопасен: изменения и поиск должны выполняться в одном
+    потоке (в боте — в потоке event loop).
+    """
+
+    NAME_WEIGHT = 3.0
+    DESCRIPTION_WEIGHT = 1.0
+
+    def __init__(self):
+        self.documents: Dict[int, SearchDocument] = {}
+        self._postings: Dict[str, Dict[int, float]] = {}
+        self._document_terms: Dict[int, Dict[str, float]] = {}
+        self._trigrams: Dict[str, Set[str]] = defaultdict(set)
+        self._sorted_terms: Optional[List[str]] = None
+        self._results = LRUCache(RESULT_CACHE_SIZE)
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def add(self, document: SearchDocument, text: Optional[str] = None) -> None:
+        """
+        Добавляет или заменяет документ
+
+        Args:
+            document: документ
+            text: полный текст описания для индексации (по умолчанию document.description)
+        """
+        self.remove(document.id)
+        self._results.clear()
+
+        terms: Dict[str, float] = {}
+        for token in tokenize(text if text is not None else document.description):
+            term = stem(token)
+            terms[term] = max(terms.get(term, 0.0), self.DESCRIPTION_WEIGHT)
+        for token in tokenize(document.name):
+            term = stem(token)
+            terms[term] = max(terms.get(term, 0.0), self.NAME_WEIGHT)
+
+        for term, weight in terms.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                for trigram in trigrams(term):
+                    self._trigrams[trigram].add(term)
+                self._sorted_terms = None
+            postings[document.id] = weight
+
+        self.documents[document.id] = document
+        self._document_terms[document.id] = terms
+
+    def remove(self, document_id: int) -> None:
+        """Удаляет документ из индекса"""
+        terms = self._document_terms.pop(document_id, None)
+        if terms is None:
+            return
+        self._results.clear()
+        del self.documents[document_id]
+        for term in terms:
+            postings = self._postings[term]
+            del postings[document_id]
+            if not postings:
+                del self._postings[term]
+                for trigram in trigrams(term):
+                    self._trigrams[trigram].discard(term)
+                    if not self._trigrams[trigram]:
+                        del self._trigrams[trigram]
+                self._sorted_terms = None
+
+    def ids(self) -> Set[int]:
+        """Возвращает ID всех документов индекса"""
+        return set(self.documents)
+
+    def _prefix_terms(self, prefix: str) -> List[str]:
+        """Возвращает термины, начинающиеся с prefix"""
+        if self._sorted_terms is None:
+            self._sorted_terms = sorted(self._postings)
+        terms = []
+        position = bisect_left(self._sorted_terms, prefix)
+        while position < len(self._sorted_terms) and len(terms) < MAX_PREFIX_TERMS:
+            term = self._sorted_terms[position]
+            if not term.startswith(prefix):
+                break
+            terms.append(term)
+            position += 1
+        return terms
+
+    def _fuzzy_terms(self, term: str) -> List[Tuple[str, float]]:
+        """Возвращает похожие термины и их сходство по триграммам"""
+        query_trigrams = trigrams(term)
+        shared: Dict[str, int] = defaultdict(int)
+        for trigram in query_trigrams:
+            for candidate in self._trigrams.get(trigram, ()):
+                shared[candidate] += 1
+
+        similar = []
+        for candidate, count in shared.items():
+            similarity = count / (len(query_trigrams) + len(candidate) - count)
+            if similarity >= FUZZY_THRESHOLD:
+                similar.append((candidate, similarity))
+        return heapq.nlargest(MAX_FUZZY_TERMS, similar, key=lambda item: item[1])
+
+    def _match_terms(self, token: str, is_prefix: bool) -> List[Tuple[str, float]]:
+        """Возвращает термины, подходящие под слово запроса, и их сходство со словом"""
+        term = stem(token)
+        matches: List[Tuple[str, float]] = []
+        if term in self._postings:
+            matches.append((term, 1.0))
+        if is_prefix:
+            matches.extend((candidate, 0.8) for candidate in self._prefix_terms(token) if candidate != term)
+        if not matches and len(term) >= MIN_FUZZY_LENGTH:
+            matches = self._fuzzy_terms(term)
+        return matches
+
+    def _rank(
+        self, tokens: Tuple[str, ...], prefix_index: int, limit: int, match_all: bool
+    ) -> Tuple[List[int], int]:
+        """Возвращает ID лучших документов и общее количество найденных"""
+        matches = [self._match_terms(token, position == prefix_index) for position, token in enumerate(tokens)]
+        if not match_all:
+            return self._rank_any([terms for terms in matches if terms], limit)
+        if not all(matches):
+            return [], 0
+        matches.sort(key=lambda terms: sum(len(self._postings[term]) for term, _ in terms))
+
+        # Оценки считаются по самому редкому слову, остальные слова только проверяются
+        scores: Dict[int, float] = {}
+        for term, similarity in matches[0]:
+            for document_id, weight in self._postings[term].items():
+                score = weight * similarity
+                if score > scores.get(document_id, 0.0):
+                    scores[document_id] = score
+
+        for terms in matches[1:]:
+            postings = [(self._postings[term], similarity) for term, similarity in terms]
+            narrowed = {}
+            for document_id, score in scores.items():
+                best = 0.0
+                for term_postings, similarity in postings:
+                    weight = term_postings.get(document_id)
+                    if weight is not None and weight * similarity > best:
+                        best = weight * similarity
+                if best:
+                    narrowed[document_id] = score + best
+            scores = narrowed
+            if not scores:
+                return [], 0
+
+        best = heapq.nlargest(limit, scores.items(), key=itemgetter(1))
+        return [document_id for document_id, _ in best], len(scores)
+
+    def _rank_any(self, matches: List[List[Tuple[str, float]]], limit: int) -> Tuple[List[int], int]:
+        """Ранжирует документы, в которых совпало хотя бы одно слово запроса"""
+        scores: Dict[int, float] = defaultdict(float)
+        for terms in matches:
+            token_scores: Dict[int, float] = {}
+            for term, similarity in terms:
+                for document_id, weight in self._postings[term].items():
+                    score = weight * similarity
+                    if score > token_scores.get(document_id, 0.0):
+                        token_scores[document_id] = score
+            for document_id, score in token_scores.items():
+                scores[document_id] += score
+
+        best = heapq.nlargest(limit, scores.items(), key=itemgetter(1))
+        return [document_id for document_id, _ in best], len(scores)
+
+    def search(
+        self, query: str, offset: int = 0, limit: int = 10, match_all: bool = True
+    ) -> Tuple[List[SearchDocument], int]:
+        """
+        Ищет документы по запросу
+
+        Args:
+            query: текст запроса
+            offset: сколько лучших результатов пропустить
+            limit: количество результатов
+            match_all: True — документ должен содержать все слова запроса,
+                False — хотя бы одно (чем больше совпадений, тем выше документ)
+
+        Returns:
+            Tuple[List[SearchDocument], int]: документы страницы и общее количество найденных
+        """
+        tokens = tuple(tokenize(query))
+        if not tokens:
+            return [], 0
+
+        # Последнее слово считается незаконченным, если после него нет пробела
+        prefix_index = len(tokens) - 1 if not query[-1:].isspace() else -1
+        depth = max(RANKED_RESULTS, offset + limit)
+        key = (tokens, prefix_index, match_all)
+        cached = self._results.get(key)
+        if cached is None or (len(cached[0]) < depth < cached[1]):
+            cached = self._rank(tokens, prefix_index, depth, match_all)
+            self._results.set(key, cached)
+
+        ranked, total = cached
+        return [self.documents[document_id] for document_id in ranked[offset:offset + limit]], total
+
+    def clear(self) -> None:
+        """Удаляет все документы"""
+        self.__init__()
+
+    def extend(self, documents: Iterable[Tuple[SearchDocument, str]]) -> None:
+        """Добавляет документы вместе с полными текстами описаний"""
+        for document, text in documents:
+            self.add(document, text)
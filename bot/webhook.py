@@ -0,0 +1,205 @@
+import asyncio
+import hmac
+from typing import Any, List, Optional
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+
+from bot.logging_config import logger
+
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"  # Заголовок с секретом вебхука
+SUBMIT_TIMEOUT = 5  # Сколько ждать места в очереди, прежде чем ответить 503
+MAX_CONNECTIONS = 100  # Верхняя граница max_connections в setWebhook
+
+
+def get_shard_key(update: Update) -> int:
+    """
+    Возвращает ключ, определяющий воркер для апдейта
+
+    Апдейты одного чата (или одного пользователя, если чата нет) всегда
+    получают один и тот же ключ, поэтому обрабатываются по порядку.
+
+    Args:
+        update: апдейт Telegram
+
+    Returns:
+        int: ID чата, ID пользователя или ID апдейта
+    """
+    try:
+        event = update.event
+    except LookupError:
+        return update.update_id
+
+    chat = getattr(event, "chat", None)
+    if chat is not None:
+        return chat.id
+    user = getattr(event, "from_user", None)
+    if user is not None:
+        return user.id
+    return update.update_id
+
+
+class UpdateWorkerPool:
+    """
+    Пул воркеров, обрабатывающих апдейты параллельно
+
+    У каждого воркера своя ограниченная очередь, а апдейты распределяются по
+    воркерам по ключу чата, поэтому порядок в пределах одного чата сохраняется.
+    """
+
+    def __init__(self, dp: Dispatcher, bot: Bot, workers: int = 4, queue_size: int = 1000, **kwargs: Any):
+        """
+        Инициализация пула
+
+        Args:
+            dp: диспетчер
+            bot: объект бота
+            workers: количество воркеров
+            queue_size: размер очереди каждого воркера
+            kwargs: дополнительные данные для обработчиков
+        """
+        self.dp = dp
+        self.bot = bot
+        self.kwargs = kwargs
+        self.queues: List[asyncio.Queue] = [asyncio.Queue(maxsize=queue_size) for _ in range(workers)]
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        """Запускает воркеры"""
+        self._tasks = [
+            asyncio.create_task(self._worker(index, queue))
+            for index, queue in enumerate(self.queues)
+        ]
+        logger.info("Запущено %s воркеров обработки апдейтов", len(self._tasks))
+
+    async def stop(self) -> None:
+        """Дожидается обработки очередей и останавливает воркеры"""
+        for queue in self.queues:
+            await queue.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, update: Update, timeout: Optional[float] = SUBMIT_TIMEOUT) -> bool:
+        """
+        Ставит апдейт в очередь воркера его чата
+
+        Args:
+            update: апдейт Telegram
+            timeout: время ожидания места в очереди
+
+        Returns:
+            bool: True, если апдейт принят, False, если очередь переполнена
+        """
+        queue = self.queues[get_shard_key(update) % len(self.queues)]
+        try:
+            await asyncio.wait_for(queue.put(update), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Очередь переполнена, апдейт %s отклонён", update.update_id)
+            return False
+        return True
+
+    async def _worker(self, index: int, queue: asyncio.Queue) -> None:
+        """Последовательно обрабатывает апдейты из своей очереди"""
+        while True:
+            update = await queue.get()
+            try:
+                await self.dp.feed_update(self.bot, update, **self.kwargs)
+            except Exception as e:
+                logger.error("Ошибка обработки апдейта %s в воркере %s: %s", update.update_id, index, e)
+            finally:
+                queue.task_done()
+
+
+def create_webhook_app(bot: Bot, pool: UpdateWorkerPool, path: str, secret: str) -> web.Application:
+    """
+    Создаёт aiohttp-приложение, принимающее апдейты от Telegram
+
+    Args:
+        bot: объект бота
+        pool: пул воркеров
+        path: путь вебхука
+        secret: секретный токен, который Telegram передаёт в заголовке
+
+    Returns:
+        web.Application: приложение aiohttp
+    """
+    async def handle_update(request: web.Request) -> web.Response:
+        token = request.headers.get(SECRET_HEADER, "")
+        # Сравнение байтов: compare_digest не принимает строки с не-ASCII символами,
+        # а aiohttp декодирует некорректный UTF-8 в заголовках через surrogateescape
+        if not hmac.compare_digest(token.encode(errors="surrogateescape"), secret.encode()):
+            logger.warning("Запрос к вебхуку с неверным секретом от %s", request.remote)
+            return web.Response(status=401)
+
+        try:
+            update = Update.model_validate(await request.json(), context={"bot": bot})
+        except ValueError as e:
+            logger.warning("Некорректный апдейт в вебхуке: %s", e)
+            return web.Response(status=400)
+
+        accepted = await pool.submit(update)
+        return web.Response(status=200 if accepted else 503)
+
+    app = web.Application()
+    app.router.add_post(path, handle_update)
+    return app
+
+
+async def run_webhook(
+    dp: Dispatcher,
+    bot: Bot,
+    host: str,
+    port: int,
+    path: str,
+    secret: str,
+    url: Optional[str] = None,
+    workers: int = 4,
+    queue_size: int = 1000
+) -> None:
+    """
+    Запускает бота в режиме вебхука
+
+    Сессию бота закрывает тот, кто его создал (bot_runtime.running()).
+
+    Args:
+        dp: диспетчер
+        bot: объект бота
+        host: адрес, на котором слушает сервер
+        port: порт сервера
+        path: путь вебхука
+        secret: секретный токен вебхука
+        url: публичный адрес вебхука; если не указан, вебхук в Telegram не регистрируется
+            (режим для локальной проверки отправкой апдейтов вручную)
+        workers: количество воркеров
+        queue_size: размер очереди каждого воркера
+    """
+    workflow_data = {"dispatcher": dp, "bots": [bot], **dp.workflow_data}
+    pool = UpdateWorkerPool(dp, bot, workers, queue_size, **workflow_data)
+    runner = web.AppRunner(create_webhook_app(bot, pool, path, secret))
+
+    await dp.emit_startup(bot=bot, **workflow_data)
+    pool.start()
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info("Вебхук слушает http://%s:%s%s", host, port, path)
+
+    if url:
+        await bot.set_webhook(
+            url=url.rstrip("/") + path,
+            secret_token=secret,
+            max_connections=min(max(workers, 1), MAX_CONNECTIONS),
+            allowed_updates=dp.resolve_used_update_types(),
+            drop_pending_updates=True
+        )
+        logger.info("Вебхук зарегистрирован в Telegram: %s", url)
+
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+        await pool.stop()
+        await dp.emit_shutdown(bot=bot, **workflow_data)
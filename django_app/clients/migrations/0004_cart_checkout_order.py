@@ -0,0 +1,19 @@
+# Generated by Django 5.1.7 on 2026-10-18 10:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0003_cart_order_orderitem_cartitem'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='checkout_order',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='clients.order'),
+        ),
+    ]
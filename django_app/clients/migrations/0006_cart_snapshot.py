@@ -0,0 +1,56 @@
+# Generated by Django 5.1.7 on 2026-10-18 11:40
+
+from django.db import migrations, models
+
+
+def fill_snapshots(apps, schema_editor):
+    """Заполняет снимки существующих корзин"""
+    Cart = apps.get_model("clients", "Cart")
+    CartItem = apps.get_model("clients", "CartItem")
+
+    snapshots = {}
+    rows = (
+        CartItem.objects.order_by("cart_id", "id")
+        .values_list("cart_id", "id", "product_id", "product__name", "product__price", "quantity")
+    )
+    for cart_id, item_id, product_id, name, price, quantity in rows.iterator(chunk_size=2000):
+        item_count, total_price, lines = snapshots.get(cart_id, (0, 0, []))
+        lines.append({"id": item_id, "product_id": product_id, "name": name, "price": str(price), "quantity": quantity})
+        snapshots[cart_id] = (item_count + quantity, total_price + price * quantity, lines)
+
+    for cart_id, (item_count, total_price, lines) in snapshots.items():
+        Cart.objects.filter(id=cart_id).update(
+            item_count=item_count, total_price=total_price, snapshot=lines, version=1
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0005_cart_order_indexes'),
+        ('products', '0004_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='cart',
+            name='snapshot',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='cart',
+            name='total_price',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='cart',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_snapshots, migrations.RunPython.noop),
+    ]
@@ -16,6 +16,18 @@ class Cart(models.Model):
     """Одна корзина на одного пользователя"""
     client = models.OneToOneField(Client, on_delete=models.CASCADE, related_name="cart")
     created_at = models.DateTimeField(auto_now_add=True)
+    # Заказ, оформленный из текущего содержимого корзины (сбрасывается при изменении корзины)
+    checkout_order = models.ForeignKey(
+        "Order", on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    # Денормализованное содержимое корзины, обновляется в транзакции при каждом
+    # изменении позиций (bot/database/cart_db.py) и цен товаров (bot/signals.py).
+    # snapshot — список {"id", "product_id", "name", "price", "quantity"},
+    # version увеличивается при каждом изменении содержимого
+    item_count = models.PositiveIntegerField(default=0)
+    total_price = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    snapshot = models.JSONField(default=list, blank=True)
+    version = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         return f"Корзина {self.client.username}"
@@ -23,7 +35,8 @@ class Cart(models.Model):
 
 class CartItem(models.Model):
     """Товары в корзине"""
-    cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name="items")
+    # Позиции корзины ищутся по индексу уникальности (cart, product)
+    cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name="items", db_index=False)
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="cart_items")
     quantity = models.PositiveIntegerField(default=1)
 
@@ -36,13 +49,21 @@ class CartItem(models.Model):
 
 class Order(models.Model):
     """Модель заказа"""
-    client = models.ForeignKey(Client, on_delete=models.CASCADE, related_name="orders")
+    client = models.ForeignKey(Client, on_delete=models.CASCADE, related_name="orders", db_index=False)
     created_at = models.DateTimeField(auto_now_add=True)
     full_name = models.CharField(max_length=255)
     phone = models.CharField(max_length=20)
     address = models.TextField()
     total_price = models.DecimalField(max_digits=10, decimal_places=2, default=0)
 
+    class Meta:
+        indexes = [
+            # История заказов клиента, новые сначала (заменяет индекс по client)
+            models.Index(fields=["client", "-created_at"], name="order_client_created_idx"),
+            # Выгрузка заказов за период (iter_orders)
+            models.Index(fields=["created_at", "id"], name="order_created_idx"),
+        ]
+
     def __str__(self):
         return f"Заказ #{self.id} от {self.client.username}"
 
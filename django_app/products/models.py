@@ -10,7 +10,16 @@ class Category(models.Model):
 
 class Subcategory(models.Model):
     name = models.CharField(max_length=255, unique=True)
-    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name="subcategories")
+    # Отдельный индекс по category не нужен: его заменяет subcategory_listing_idx
+    category = models.ForeignKey(
+        Category, on_delete=models.CASCADE, related_name="subcategories", db_index=False
+    )
+
+    class Meta:
+        indexes = [
+            # Список подкатегорий категории с keyset-пагинацией по (name, id)
+            models.Index(fields=["category", "name", "id"], name="subcategory_listing_idx"),
+        ]
 
     def __str__(self):
         return f"{self.category.name} → {self.name}"
@@ -20,9 +29,22 @@ class Product(models.Model):
     name = models.CharField(max_length=255)
     description = models.TextField(blank=True, null=True)
     price = models.DecimalField(max_digits=10, decimal_places=2)
-    category = models.ForeignKey(Subcategory, on_delete=models.SET_NULL, null=True, related_name="products")
+    category = models.ForeignKey(
+        Subcategory, on_delete=models.SET_NULL, null=True, related_name="products", db_index=False
+    )
     image = models.ImageField(upload_to="product_images/", blank=True, null=True)
+    # file_id фото на серверах Telegram и хэш содержимого, для которого он получен
+    image_file_id = models.CharField(max_length=255, blank=True, default="")
+    image_file_hash = models.CharField(max_length=64, blank=True, default="")
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            # Список товаров подкатегории с keyset-пагинацией по (name, id);
+            # индекс покрывает запрос целиком (values_list("id", "name"))
+            models.Index(fields=["category", "name", "id"], name="product_listing_idx"),
+        ]
 
     def __str__(self):
         return self.name
@@ -83,6 +83,14 @@ ASGI_APPLICATION = "django_app.asgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# Бот работает с БД из пула потоков (DB_THREADS, см. bot/database/executor.py).
+# По умолчанию подключения берутся из пула psycopg, размер которого должен
+# быть не меньше DB_THREADS + 2 (поток sync_to_async и служебные задачи).
+# С DB_POOL=false каждый поток держит постоянное подключение DB_CONN_MAX_AGE
+# секунд. Перед повторным использованием подключение проверяется.
+DB_POOL = os.getenv("DB_POOL", "true").lower() in ("1", "true", "yes")
+DB_CONN_MAX_AGE = int(os.getenv("DB_CONN_MAX_AGE", "600"))
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.postgresql",
@@ -91,7 +99,60 @@ DATABASES = {
         "PASSWORD": os.getenv("POSTGRES_PASSWORD", "password"),
         "HOST": os.getenv("POSTGRES_HOST", "db"),
         "PORT": os.getenv("POSTGRES_PORT", "5432"),
+        "CONN_MAX_AGE": 0 if DB_POOL else DB_CONN_MAX_AGE,
+        "CONN_HEALTH_CHECKS": True,
+    }
+}
+
+if DB_POOL:
+    # С CONN_HEALTH_CHECKS пул проверяет подключение при каждой выдаче
+    DATABASES["default"]["OPTIONS"] = {
+        "pool": {
+            "min_size": int(os.getenv("DB_POOL_MIN_SIZE", "2")),
+            "max_size": int(os.getenv("DB_POOL_MAX_SIZE", "10")),
+            "timeout": int(os.getenv("DB_POOL_TIMEOUT", "10")),
+            "max_idle": int(os.getenv("DB_POOL_MAX_IDLE", "600")),
+        }
+    }
+
+# Локальная SQLite вместо Postgres (разработка и нагрузочный тест manage.py botbench)
+if os.getenv("DB_ENGINE") == "sqlite":
+    DATABASES["default"] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": os.getenv("SQLITE_PATH", str(BASE_DIR / "db.sqlite3")),
+        "CONN_MAX_AGE": DB_CONN_MAX_AGE,
+        "CONN_HEALTH_CHECKS": True,
+        # Потоки пишут параллельно: транзакции сразу берут блокировку записи
+        # и ждут её, а не падают с "database is locked"
+        "OPTIONS": {
+            "transaction_mode": "IMMEDIATE",
+            "timeout": 20,
+            "init_command": "PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;",
+        },
     }
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Локальный LRU в каждом процессе перед общим кэшем (Redis или замена на чистом Python)
+
+REDIS_URL = os.getenv("REDIS_URL")
+
+CACHES = {
+    "default": {
+        "BACKEND": "bot.cache.TwoTierCache",
+        "LOCATION": "shared",
+        "OPTIONS": {
+            "L1_MAX_ENTRIES": int(os.getenv("CACHE_L1_MAX_ENTRIES", "2048")),
+            "L1_TIMEOUT": int(os.getenv("CACHE_L1_TIMEOUT", "60")),
+        },
+    },
+    "shared": {
+        "BACKEND": "bot.cache.RedisPubSubCache",
+        "LOCATION": REDIS_URL,
+    } if REDIS_URL else {
+        "BACKEND": "bot.cache.InProcessCache",
+        "LOCATION": "client-bot",
+    },
 }
 
 # Password validation